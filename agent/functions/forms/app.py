@@ -6,8 +6,11 @@ from tarfile import version
 
 import boto3
 from aws_lambda_powertools import Metrics, Logger, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
 
-from model import start_form_version, submit_form_version, write_form_field, get_form_fields
+from model import start_form_version, submit_form_version, write_form_field, get_form_fields, get_form_template_schema
+from idempotency import idempotency_request, idempotent_tool
+from rate_limiter import ToolRateLimiter, citizen_for_call
 
 
 logger = Logger()
@@ -19,6 +22,25 @@ table = boto3.resource('dynamodb').Table(table_name)
 
 forms_bucket = os.environ['FORMS_INGEST_BUCKET']
 
+idempotent, idempotency_config = idempotent_tool()
+rate_limiter = ToolRateLimiter(table=table)
+
+
+@idempotent
+def start_new_form(request):
+    """
+    Starts a form version once per session and arguments, so a retried call returns the
+    version it already created instead of leaving an orphaned one behind.
+    """
+    arguments = request['arguments']
+    version_id = start_form_version(
+        form_template_id=arguments['form_template_id'],
+        citizen_id=arguments['citizen_id'],
+        table=table
+    )
+    return {'version_id': version_id}
+
+
 @metrics.log_metrics(capture_cold_start_metric=True)
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context(log_event=True)
@@ -34,10 +56,12 @@ def lambda_handler(event, context):
     response (dict): The response for the tool
     """
     logger.info(event)
+    idempotency_config.register_lambda_context(context)
 
     agent = event['agent']
     actionGroup = event['actionGroup']
     function = event['function']
+    session_id = event.get('sessionId')
 
     parameters = event.get('parameters', [])
     citizen_id = None
@@ -58,14 +82,28 @@ def lambda_handler(event, context):
         elif param["name"] == "form_field_value":
             form_field_value = param["value"]
 
+    throttled = rate_limiter.check(session_id, citizen_for_call(parameters, event.get('sessionAttributes', {})))
+
+    start_request = None
     if function == 'start_new_form':
         if not (form_template_id and citizen_id):
             raise Exception("Missing required citizen_id or form_template_id")
-        version_id = start_form_version(
+        start_request = idempotency_request(
+            session_id, function,
             form_template_id=form_template_id,
-            citizen_id=citizen_id,
-            table=table
+            citizen_id=citizen_id
         )
+        # a retry of a start that went through gets its stored version, whatever the limit
+        if throttled is not None and start_new_form.has_stored_result(start_request):
+            logger.info(f"Replaying {function} in session {session_id} despite the rate limit")
+            throttled = None
+
+    if throttled is not None:
+        logger.warning(f"Rate limited {function} for {throttled.scope} in session {session_id}")
+        metrics.add_metric(name="ToolCallThrottled", unit=MetricUnit.Count, value=1)
+        response_body = throttled.response_body(function)
+    elif function == 'start_new_form':
+        version_id = start_new_form(request=start_request)['version_id']
         logger.info(f"Created  version {version_id} of form {form_template_id} for {citizen_id} on table {table}")
 
         response_body = {
@@ -76,15 +114,24 @@ def lambda_handler(event, context):
     elif function == 'get_form_fields':
         if not (form_template_id):
             raise Exception("Missing required form_template_id")
-        fields = get_form_fields(
+        schema = get_form_template_schema(
             form_template_id=form_template_id,
             table=table
         )
-        logger.info(fields)
+        if schema is not None:
+            # compact JSON schema written at ingestion, passed through as is
+            body = schema['data']
+        else:
+            fields = get_form_fields(
+                form_template_id=form_template_id,
+                table=table
+            )
+            body = str(fields)
+        logger.info(body)
 
         response_body = {
             'TEXT': {
-                "body": str(fields)
+                "body": body
             }
         }
     elif function == 'submit_form':
@@ -106,6 +153,7 @@ def lambda_handler(event, context):
     elif function == 'update_form_field':
         if not (form_template_id and citizen_id and version_id and form_field_id and form_field_value):
             raise Exception("Missing required citizen_id or form_template_id or version_id or field_id or field_value")
+        # a put of the same value, so a retry rewrites it and needs no idempotency record
         write_form_field(
             form_template_id=form_template_id,
             citizen_id=citizen_id,
@@ -114,9 +162,13 @@ def lambda_handler(event, context):
             data=form_field_value,
             table=table
         )
+        logger.info(f"Updated field {form_field_id} of version {version_id} of form {form_template_id} for {citizen_id}")
 
-
-
+        response_body = {
+            'TEXT': {
+                "body": f"Updated field {form_field_id} of version {version_id} of form {form_template_id} for {citizen_id}"
+            }
+        }
 
     action_response = {
         'actionGroup': actionGroup,
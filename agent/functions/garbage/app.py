@@ -1,11 +1,18 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
+import json
 import os
 import boto3
 from aws_lambda_powertools import Metrics, Logger, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
 
-from model import get_garbage_route_by_district_id, write_bulk_waste_request
+from model import get_garbage_route_by_district_id
+from pickup_scheduler import AlreadyScheduled, BulkPickupScheduler, PickupValidationError, RouteDayFull
+from idempotency import idempotency_request, idempotent_tool
+from rate_limiter import ToolRateLimiter, citizen_for_call
+from route_schedule import RouteSchedule
+from session_cache import SessionToolCache
 
 
 logger = Logger()
@@ -15,6 +22,57 @@ metrics = Metrics()
 table_name = os.environ['DDB_TABLE']
 table = boto3.resource('dynamodb').Table(table_name)
 
+tool_cache = SessionToolCache()
+route_schedule = RouteSchedule()
+pickup_scheduler = BulkPickupScheduler(table, route_schedule=route_schedule)
+rate_limiter = ToolRateLimiter(table=table)
+idempotent, idempotency_config = idempotent_tool()
+
+
+def lookup_route(district_id):
+    return get_garbage_route_by_district_id(district_id, table).get('Item', {}).get('data')
+
+
+@idempotent
+def schedule_bulk_pickup(request):
+    """
+    Books a bulk pickup once per session and arguments, retries get the first booking back.
+    A request that is rejected raises and is not recorded, so it can be tried again.
+    """
+    arguments = request['arguments']
+    return pickup_scheduler.schedule(arguments['garbage_route'], arguments['pickup_date'], arguments['citizen_id'])
+
+
+def bulk_pickup_request(session_id, parameters, session_attributes):
+    """
+    The idempotency payload of a schedule_bulk_pickup call, after the session attribute override.
+    """
+    citizen_id = None
+    pickup_date = None
+    garbage_route = None
+
+    for param in parameters:
+        if param["name"] == "citizen_id":
+            citizen_id = param["value"]
+        elif param["name"] == "pickup_date":
+            pickup_date = param["value"]
+        elif param["name"] == "garbage_route":
+            garbage_route = param["value"]
+
+    session_citizen_id = session_attributes.get('citizenID', '')
+    if not session_citizen_id == '':
+        citizen_id = session_citizen_id  # override with the session attributes if available
+
+    if not all([citizen_id, pickup_date, garbage_route]):
+        raise Exception("Missing mandatory parameters: citizen_id, pickup_date, garbage_route")
+
+    return idempotency_request(
+        session_id, 'schedule_bulk_pickup',
+        citizen_id=citizen_id,
+        pickup_date=pickup_date,
+        garbage_route=garbage_route
+    )
+
 
 @metrics.log_metrics(capture_cold_start_metric=True)
 @tracer.capture_lambda_handler
@@ -31,11 +89,13 @@ def lambda_handler(event, context):
     response (dict): The response for the tool
     """
     logger.info(event)
+    idempotency_config.register_lambda_context(context)
 
     agent = event['agent']
     actionGroup = event['actionGroup']
     function = event['function']
     parameters = event.get('parameters', [])
+    session_id = event.get('sessionId')
     session_attributes = event.get('sessionAttributes', {})
     responseBody = {
         "TEXT": {
@@ -43,7 +103,30 @@ def lambda_handler(event, context):
         }
     }
 
+    cached_response = None
     if function == 'get_garbage_pickup_day':
+        cached_response = tool_cache.get(session_id, function, parameters, session_attributes)
+
+    throttled = None
+    if cached_response is None:
+        throttled = rate_limiter.check(session_id, citizen_for_call(parameters, session_attributes))
+
+    pickup_request = None
+    if function == 'schedule_bulk_pickup':
+        pickup_request = bulk_pickup_request(session_id, parameters, session_attributes)
+        # a retry of a booking that went through gets its stored result, whatever the limit
+        if throttled is not None and schedule_bulk_pickup.has_stored_result(pickup_request):
+            logger.info(f"Replaying {function} in session {session_id} despite the rate limit")
+            throttled = None
+
+    if cached_response is not None:
+        logger.info(f"Returning cached response for {function} in session {session_id}")
+        responseBody = cached_response
+    elif throttled is not None:
+        logger.warning(f"Rate limited {function} for {throttled.scope} in session {session_id}")
+        metrics.add_metric(name="ToolCallThrottled", unit=MetricUnit.Count, value=1)
+        responseBody = throttled.response_body(function)
+    elif function == 'get_garbage_pickup_day':
         district_id = None
         for param in parameters:
             if param["name"] == "district_id":
@@ -57,40 +140,38 @@ def lambda_handler(event, context):
         if not district_id:
             raise Exception("Missing mandatory parameter: district_id")
 
-        route = get_garbage_route_by_district_id(district_id, table)
+        route = route_schedule.route_for_district(district_id, lookup_route)
+        payload = route_schedule.payload(district_id, route) if route else None
+        if payload is not None:
+            body = json.dumps(payload, separators=(',', ':'))
+        elif route:
+            body = f"Garbage pickup route for district ID {district_id}: {route}"
+        else:
+            body = f"No garbage route found for district ID {district_id}"
         responseBody = {
             'TEXT': {
-                "body": f"Garbage pickup route for district ID {district_id}: {route}"
+                "body": body
             }
         }
+        tool_cache.put(session_id, function, parameters, responseBody, session_attributes)
     elif function == 'schedule_bulk_pickup':
-        citizen_id = None
-        pickup_date = None
-        garbage_route = None
-
-        for param in parameters:
-            if param["name"] == "citizen_id":
-                citizen_id = param["value"]
-            elif param["name"] == "pickup_date":
-                pickup_date = param["value"]
-            elif param["name"] == "garbage_route":
-                garbage_route = param["value"]
-
-        session_citizen_id = session_attributes.get('citizenID', '')
-        if not session_citizen_id == '':
-            citizen_id = session_citizen_id  # override with the session attributes if available
-
-        response = write_bulk_waste_request(
-            citizen_id=citizen_id,
-            pickup_date=pickup_date,
-            garbage_route=garbage_route,
-            table=table
-        )
-        logger.info(response)
+        try:
+            booking = schedule_bulk_pickup(request=pickup_request)
+            logger.info(booking)
+            tool_cache.invalidate(session_id, session_attributes)
+            body = f"Bulk waste pickup requested for {pickup_request['arguments']['citizen_id']} {booking['pickup_date']} {booking['route']}"
+        except RouteDayFull as e:
+            metrics.add_metric(name="BulkPickupDayFull", unit=MetricUnit.Count, value=1)
+            if e.suggestions:
+                body = f"{e} The next days with capacity are: {e.suggestions}"
+            else:
+                body = f"{e} and none of the next collection days has capacity either"
+        except (AlreadyScheduled, PickupValidationError) as e:
+            body = str(e)
 
         responseBody = {
             'TEXT': {
-                "body": f"Bulk waste pickup requested for {citizen_id} {pickup_date} {garbage_route}"
+                "body": body
             }
         }
 
@@ -103,6 +184,8 @@ def lambda_handler(event, context):
     }
 
     function_response = {'response': action_response, 'messageVersion': event['messageVersion']}
+    if tool_cache.use_session_attributes:
+        function_response['sessionAttributes'] = session_attributes
     logger.info("Response: {}".format(function_response))
 
     return function_response
\ No newline at end of file
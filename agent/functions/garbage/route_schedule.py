@@ -0,0 +1,154 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+from itertools import islice, takewhile
+
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# weekday: 0 is Monday; interval_weeks: 2 for biweekly routes, counted from anchor
+DEFAULT_RULES = {
+    "Yellow": {"weekday": 0, "interval_weeks": 1, "anchor": "2024-01-01"},
+    "Blue": {"weekday": 1, "interval_weeks": 1, "anchor": "2024-01-01"},
+    "Orange": {"weekday": 2, "interval_weeks": 1, "anchor": "2024-01-01"},
+    "Green": {"weekday": 3, "interval_weeks": 1, "anchor": "2024-01-01"},
+    "Red": {"weekday": 4, "interval_weeks": 1, "anchor": "2024-01-01"},
+}
+
+
+def load_rules():
+    """
+    Reads the route rules from the ROUTE_SCHEDULE_RULES JSON environment variable, falling back to the defaults.
+    """
+    rules = os.environ.get("ROUTE_SCHEDULE_RULES", "")
+    return json.loads(rules) if rules else DEFAULT_RULES
+
+
+def nth_weekday(year, month, weekday, n):
+    """
+    The n-th given weekday of a month, counting from the end when n is negative.
+    """
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7 + 7 * (-n - 1))
+
+
+@lru_cache(maxsize=8)
+def holidays(year):
+    """
+    Holidays on which there is no collection.
+    """
+    return frozenset([
+        date(year, 1, 1),
+        nth_weekday(year, 5, 0, -1),  # Memorial Day
+        date(year, 7, 4),
+        nth_weekday(year, 9, 0, 1),  # Labor Day
+        nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        date(year, 12, 25),
+    ])
+
+
+def holiday_shift(day):
+    """
+    A collection that falls on a holiday moves to the next day that is not one.
+    """
+    while day in holidays(day.year):
+        day += timedelta(days=1)
+    return day
+
+
+def iter_pickups(rule, today):
+    """
+    Yields the pickup dates of a route on or after today, with the regular date each was shifted from.
+    """
+    anchor = date.fromisoformat(rule["anchor"])
+    interval = 7 * rule.get("interval_weeks", 1)
+    first = anchor + timedelta(days=(rule["weekday"] - anchor.weekday()) % 7)
+    # start one interval back so a collection shifted onto or past today is not missed
+    start = max(first, today - timedelta(days=interval))
+    regular = first + timedelta(days=-(-(start - first).days // interval) * interval)
+
+    while True:
+        pickup = holiday_shift(regular)
+        if pickup >= today:
+            yield pickup, regular
+        regular += timedelta(days=interval)
+
+
+def next_pickups(rule, today, count):
+    """
+    Computes the next pickup dates of a route, on or after today.
+
+    Returns:
+    [(date, date)]: The pickup dates and the regular date they were shifted from
+    """
+    return list(islice(iter_pickups(rule, today), count))
+
+
+def describe(rule):
+    weekday = WEEKDAYS[rule["weekday"]]
+    interval = rule.get("interval_weeks", 1)
+    if interval == 1:
+        return f"every {weekday}"
+    if interval == 2:
+        return f"every other {weekday}"
+    return f"every {interval} weeks on {weekday}"
+
+
+class RouteSchedule:
+    """
+    Turns a district's route colour into its upcoming pickup dates.
+
+    District to route lookups and computed schedules are kept in the warm container;
+    schedules are keyed by day so they roll over at midnight.
+    """
+
+    def __init__(self, rules=None, count=None):
+        self.rules = rules or load_rules()
+        self.count = int(count or os.environ.get("ROUTE_SCHEDULE_PICKUPS", "3"))
+        self.district_routes = {}
+        self._schedule = lru_cache(maxsize=64)(self._compute)
+
+    def route_for_district(self, district_id, lookup):
+        """
+        Returns the route of a district, calling lookup(district_id) only on a cache miss.
+        Unknown districts are not cached.
+        """
+        if district_id not in self.district_routes:
+            route = lookup(district_id)
+            if route is None:
+                return None
+            self.district_routes[district_id] = route
+        return self.district_routes[district_id]
+
+    def _compute(self, route, today):
+        rule = self.rules[route]
+        pickups = []
+        for pickup, regular in next_pickups(rule, today, self.count):
+            entry = {"date": pickup.isoformat(), "day": WEEKDAYS[pickup.weekday()]}
+            if pickup != regular:
+                entry["shifted_from"] = regular.isoformat()
+            pickups.append(entry)
+        return {"route": route, "schedule": describe(rule), "next_pickups": pickups}
+
+    def collection_days(self, route, start, end):
+        """
+        The pickup dates of a route from start through end, or None when the route has no rule.
+        """
+        if route not in self.rules:
+            return None
+        return [pickup for pickup, _ in takewhile(lambda entry: entry[0] <= end, iter_pickups(self.rules[route], start))]
+
+    def payload(self, district_id, route, today=None):
+        """
+        Compact description of a district's upcoming pickups, or None when the route has no rule.
+        """
+        if route not in self.rules:
+            return None
+        return {"district_id": district_id, **self._schedule(route, today or date.today())}
@@ -6,9 +6,15 @@ import os
 
 import boto3
 from aws_lambda_powertools import Metrics, Logger, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
 from datetime import datetime, timedelta
 
 from model import get_park_reservations, write_park_reservation
+from keys import ParkReservation, decode_many
+from session_cache import SessionToolCache
+from demand_model import DemandModel, DemandModelLoader
+from idempotency import idempotency_request, idempotent_tool
+from rate_limiter import ToolRateLimiter, citizen_for_call
 
 
 logger = Logger()
@@ -18,9 +24,17 @@ metrics = Metrics()
 table_name = os.environ['DDB_TABLE']
 table = boto3.resource('dynamodb').Table(table_name)
 
+tool_cache = SessionToolCache()
+rate_limiter = ToolRateLimiter(table=table)
+idempotent, idempotency_config = idempotent_tool()
+
+# precomputed demand model kept warm across invocations, see analytics/occupancy_export.py
+occupancy_model_uri = os.environ.get('OCCUPANCY_MODEL_S3_URI', '')
+demand_loader = DemandModelLoader(occupancy_model_uri) if occupancy_model_uri else None
+
 
 @tracer.capture_method
-def get_available_park_days(park_id, start_date, end_date):
+def get_available_park_days(park_id, start_date, end_date, recommend_top_n=None):
     """
         This queries the datastore to find available park days within a date range.
 
@@ -28,6 +42,7 @@ def get_available_park_days(park_id, start_date, end_date):
         park_id (str): The id of the park you want to check for availability
         start_date (str): The start date for the date range to query
         start_date (str): The end date of the range to query
+        recommend_top_n (int): When set, only the n free days most in demand historically are returned
 
         Returns:
         [str]: List of dates that the park is available
@@ -38,7 +53,7 @@ def get_available_park_days(park_id, start_date, end_date):
         end_date = datetime.strptime(end_date, '%Y-%m-%d')
 
         response = get_park_reservations(park_id, start_date, end_date, table)
-        reservations = [reservation['sk'].replace('R', '').replace('#', '') for reservation in response]
+        reservations = [entity.date for entity in decode_many(response) if isinstance(entity, ParkReservation)]
         logger.info(reservations)
 
         all_days = set((start_date + timedelta(days=x)).strftime("%Y-%m-%d") for x in range((end_date - start_date).days + 1))
@@ -51,11 +66,84 @@ def get_available_park_days(park_id, start_date, end_date):
 
         available_days = sorted(list(all_days))
 
+        if recommend_top_n:
+            model = get_demand_model(park_id, reservations)
+            recommended = model.recommend(park_id, available_days, recommend_top_n)
+            logger.info(f"Recommended days for park {park_id}: {recommended}")
+            available_days = [date for date, _ in recommended]
+
         return available_days
     except Exception as e:
         raise Exception(f"Error occurred: {e}")
 
 
+def get_demand_model(park_id, reservations):
+    """
+    Returns the precomputed demand model when one is configured, otherwise a model
+    built from the park's reservation history that was just queried.
+    """
+    if demand_loader is not None:
+        try:
+            return demand_loader.get()
+        except Exception as e:
+            logger.warning(f"Could not load demand model from {occupancy_model_uri}: {e}")
+    return DemandModel.from_reservation_dates(park_id, reservations)
+
+
+@idempotent
+def book_park(request):
+    """
+    Writes a park reservation once per session and arguments, retries get the first result back.
+    """
+    arguments = request['arguments']
+    response = write_park_reservation(
+        park_id=arguments['park_id'],
+        reservation_date=arguments['reservation_date'],
+        citizen_id=arguments['citizen_id'],
+        table=table
+    )
+    logger.info(response)
+    if demand_loader is not None and demand_loader.model is not None:
+        demand_loader.model.record_booking(arguments['park_id'], arguments['reservation_date'])
+
+    return {
+        'TEXT': {
+            "body": f"Created reservation for customer_id: {arguments['citizen_id']} at park_id: {arguments['park_id']} on {arguments['reservation_date']}"
+        }
+    }
+
+
+def book_park_request(session_id, parameters, session_attributes):
+    """
+    The idempotency payload of a book_park call, after the session attribute override.
+    """
+    citizen_id = None
+    park_id = None
+    reservation_date = None
+    for param in parameters:
+        if param["name"] == "citizen_id":
+            citizen_id = param["value"]
+        if param["name"] == "park_id":
+            park_id = param["value"]
+        if param["name"] == "reservation_date":
+            reservation_date = param["value"]
+
+    if 'citizenID' in session_attributes.keys():
+        session_citizen_id = session_attributes.get('citizenID', '')
+        if not session_citizen_id == '':
+            citizen_id = session_citizen_id # override with the session attributes if available
+
+    if not all([citizen_id, park_id, reservation_date]):
+        raise Exception("Missing mandatory parameters: citizen_id, park_id, reservation_date")
+
+    return idempotency_request(
+        session_id, 'book_park',
+        citizen_id=citizen_id,
+        park_id=park_id,
+        reservation_date=reservation_date
+    )
+
+
 @metrics.log_metrics(capture_cold_start_metric=True)
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context(log_event=True)
@@ -71,11 +159,13 @@ def lambda_handler(event, context):
     response (dict): The response for the tool
     """
     logger.info(event)
+    idempotency_config.register_lambda_context(context)
 
     # agent = event['agent']
     actionGroup = event['actionGroup']
     function = event['function']
     parameters = event.get('parameters', [])
+    session_id = event.get('sessionId')
     session_attributes = event.get('sessionAttributes', {})
     responseBody = {
         "TEXT": {
@@ -83,10 +173,34 @@ def lambda_handler(event, context):
         }
     }
 
+    cached_response = None
     if function == 'get_available_park_days':
+        cached_response = tool_cache.get(session_id, function, parameters, session_attributes)
+
+    throttled = None
+    if cached_response is None:
+        throttled = rate_limiter.check(session_id, citizen_for_call(parameters, session_attributes))
+
+    booking_request = None
+    if function == 'book_park':
+        booking_request = book_park_request(session_id, parameters, session_attributes)
+        # a retry of a booking that went through gets its stored result, whatever the limit
+        if throttled is not None and book_park.has_stored_result(booking_request):
+            logger.info(f"Replaying {function} in session {session_id} despite the rate limit")
+            throttled = None
+
+    if cached_response is not None:
+        logger.info(f"Returning cached response for {function} in session {session_id}")
+        responseBody = cached_response
+    elif throttled is not None:
+        logger.warning(f"Rate limited {function} for {throttled.scope} in session {session_id}")
+        metrics.add_metric(name="ToolCallThrottled", unit=MetricUnit.Count, value=1)
+        responseBody = throttled.response_body(function)
+    elif function == 'get_available_park_days':
         park_id = None
         start_date = None
         end_date = None
+        recommend_top_n = None
         for param in parameters:
             if param["name"] == "park_id":
                 park_id = param["value"]
@@ -94,50 +208,26 @@ def lambda_handler(event, context):
                 start_date = param["value"]
             if param["name"] == "end_date":
                 end_date = param["value"]
+            if param["name"] == "recommend_top_n":
+                recommend_top_n = int(param["value"])
 
         if not all([park_id, start_date, end_date]):
             raise Exception("Missing mandatory parameters: park_id, start_date, end_date")
 
-        available_days = get_available_park_days(park_id, start_date, end_date)
+        available_days = get_available_park_days(park_id, start_date, end_date, recommend_top_n)
+        if recommend_top_n:
+            body = f"Recommended available days for park ID {park_id} between {start_date} and {end_date}, most popular first: {available_days}"
+        else:
+            body = f"Available days for park ID {park_id} between {start_date} and {end_date}: {available_days}"
         responseBody = {
             'TEXT': {
-                "body": f"Available days for park ID {park_id} between {start_date} and {end_date}: {available_days}"
+                "body": body
             }
         }
+        tool_cache.put(session_id, function, parameters, responseBody, session_attributes)
     elif function == 'book_park':
-        citizen_id = None
-        park_id = None
-        reservation_date = None
-        for param in parameters:
-            if param["name"] == "citizen_id":
-                citizen_id = param["value"]
-            if param["name"] == "park_id":
-                park_id = param["value"]
-            if param["name"] == "reservation_date":
-                reservation_date = param["value"]
-
-        if 'citizenID' in session_attributes.keys():
-            session_citizen_id = session_attributes.get('citizenID', '')
-            if not session_citizen_id == '':
-                citizen_id = session_citizen_id # override with the session attributes if available
-
-        if not all([citizen_id, park_id, reservation_date]):
-            raise Exception("Missing mandatory parameters: citizen_id, park_id, reservation_date")
-
-        response = write_park_reservation(
-            park_id=park_id,
-            reservation_date=reservation_date,
-            citizen_id=citizen_id,
-            table=table
-        )
-
-        logger.info(response)
-
-        responseBody = {
-            'TEXT': {
-                "body": f"Created reservation for customer_id: {citizen_id} at park_id: {park_id} on {reservation_date}"
-            }
-        }
+        responseBody = book_park(request=booking_request)
+        tool_cache.invalidate(session_id, session_attributes)
 
     action_response = {
         'actionGroup': actionGroup,
@@ -148,6 +238,8 @@ def lambda_handler(event, context):
     }
 
     function_response = {'response': action_response, 'messageVersion': event['messageVersion']}
+    if tool_cache.use_session_attributes:
+        function_response['sessionAttributes'] = session_attributes
     logger.info("Response: {}".format(function_response))
 
     return function_response
\ No newline at end of file
@@ -0,0 +1,123 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import time
+from datetime import datetime
+
+import boto3
+
+
+# pseudo counts that pull sparse weekday/month cells towards the park's overall rate
+PRIOR_WEIGHT = 4.0
+REFRESH_SECONDS = 300
+
+
+class DemandModel:
+    """
+    Historical demand per park, weekday and month, as reserved and observed day counts.
+
+    The counts are precomputed offline by analytics/occupancy_export.py --model-output
+    and kept in the warm container; bookings made through this container are added
+    as they happen, so the model stays current between refreshes.
+    """
+
+    def __init__(self, parks=None):
+        # {park_id: {"reserved": [[int] * 12] * 7, "observed": [[int] * 12] * 7}}
+        self.parks = parks or {}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(parks=data.get("parks", {}))
+
+    @classmethod
+    def from_reservation_dates(cls, park_id, dates):
+        """
+        Builds a model for one park from its reservation dates, used when no precomputed model is configured.
+        """
+        model = cls()
+        if not dates:
+            return model
+        days = sorted(datetime.strptime(date, '%Y-%m-%d') for date in dates)
+        counts = model._counts(park_id)
+        for date in days:
+            counts["reserved"][date.weekday()][date.month - 1] += 1
+        first, last = days[0], days[-1]
+        for ordinal in range(first.toordinal(), last.toordinal() + 1):
+            date = datetime.fromordinal(ordinal)
+            counts["observed"][date.weekday()][date.month - 1] += 1
+        return model
+
+    def _counts(self, park_id):
+        if park_id not in self.parks:
+            self.parks[park_id] = {
+                "reserved": [[0] * 12 for _ in range(7)],
+                "observed": [[0] * 12 for _ in range(7)],
+            }
+        return self.parks[park_id]
+
+    def record_booking(self, park_id, date):
+        """
+        Adds a booking made since the model was computed.
+        """
+        day = datetime.strptime(date, '%Y-%m-%d')
+        counts = self._counts(park_id)
+        counts["reserved"][day.weekday()][day.month - 1] += 1
+        counts["observed"][day.weekday()][day.month - 1] = max(
+            counts["observed"][day.weekday()][day.month - 1],
+            counts["reserved"][day.weekday()][day.month - 1]
+        )
+
+    def score(self, park_id, date):
+        """
+        Smoothed historical share of days like this one that were booked at this park.
+        """
+        counts = self.parks.get(park_id)
+        if counts is None:
+            return 0.0
+        total_reserved = sum(map(sum, counts["reserved"]))
+        total_observed = sum(map(sum, counts["observed"]))
+        prior = total_reserved / total_observed if total_observed else 0.0
+        day = datetime.strptime(date, '%Y-%m-%d')
+        reserved = counts["reserved"][day.weekday()][day.month - 1]
+        observed = counts["observed"][day.weekday()][day.month - 1]
+        return (reserved + PRIOR_WEIGHT * prior) / (observed + PRIOR_WEIGHT)
+
+    def recommend(self, park_id, available_days, top_n):
+        """
+        Ranks free days by historical demand, most sought after first, earlier dates breaking ties.
+
+        Returns:
+        [(str, float)]: The top dates with their scores
+        """
+        scored = [(date, round(self.score(park_id, date), 3)) for date in available_days]
+        scored.sort(key=lambda entry: (-entry[1], entry[0]))
+        return scored[:top_n]
+
+
+class DemandModelLoader:
+    """
+    Loads the precomputed model from S3 once per container and re-checks the object's
+    ETag at most every REFRESH_SECONDS, downloading it again only when it changed.
+    """
+
+    def __init__(self, s3_uri, s3_client=None, refresh_seconds=REFRESH_SECONDS):
+        bucket, _, key = s3_uri.replace("s3://", "", 1).partition("/")
+        self.bucket = bucket
+        self.key = key
+        self.s3_client = s3_client or boto3.client('s3')
+        self.refresh_seconds = refresh_seconds
+        self.model = None
+        self._etag = None
+        self._checked_at = 0
+
+    def get(self):
+        if self.model is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return self.model
+        self._checked_at = time.monotonic()
+        etag = self.s3_client.head_object(Bucket=self.bucket, Key=self.key)['ETag']
+        if etag != self._etag or self.model is None:
+            body = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)['Body'].read()
+            self.model = DemandModel.from_dict(json.loads(body))
+            self._etag = etag
+        return self.model
@@ -0,0 +1,115 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import os
+
+import boto3
+from aws_lambda_powertools import Metrics, Logger, Tracer
+
+from opensearch_client import get_client
+from retrieval import FILTER_FIELDS, EmbeddingCache, OpenSearchBackend, ResultCache, hybrid_search, parse_top_k
+
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+embedding_model_id = os.environ.get('EMBEDDING_MODEL_ID', 'amazon.titan-embed-text-v1')
+embedding_dimension = int(os.environ.get('EMBEDDING_DIMENSION', '1536'))
+bedrock_runtime = boto3.client('bedrock-runtime')
+
+backend = OpenSearchBackend(
+    client=get_client(os.environ['OPENSEARCH_ENDPOINT']),
+    index_name=os.environ['OPENSEARCH_INDEX']
+)
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('RETRIEVAL_CACHE_SIZE', '512')),
+    ttl_seconds=int(os.environ.get('RETRIEVAL_CACHE_TTL_SECONDS', '300'))
+)
+
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 10
+
+
+def embed_text(text):
+    body = {"inputText": text}
+    # titan v2 emits the dimension the knowledgebase was configured with, v1 always 1536
+    if embedding_model_id.startswith('amazon.titan-embed-text-v2'):
+        body["dimensions"] = embedding_dimension
+    response = bedrock_runtime.invoke_model(
+        modelId=embedding_model_id,
+        body=json.dumps(body),
+        accept="application/json",
+        contentType="application/json"
+    )
+    return json.loads(response['body'].read())['embedding']
+
+
+embedder = EmbeddingCache(embed_text)
+
+
+@metrics.log_metrics(capture_cold_start_metric=True)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context(log_event=True)
+def lambda_handler(event, context):
+    """
+    This function handles requests for the document search tool.
+
+    Parameters:
+    event (dict): The details and metadata for the request
+    context (dict): additional context for the request
+
+    Returns:
+    response (dict): The response for the tool
+    """
+    logger.info(event)
+
+    actionGroup = event['actionGroup']
+    function = event['function']
+    parameters = event.get('parameters', [])
+    responseBody = {
+        "TEXT": {
+            "body": "Error, no function was called"
+        }
+    }
+
+    if function == 'search_documents':
+        query = None
+        top_k = DEFAULT_TOP_K
+        filters = {}
+        for param in parameters:
+            if param["name"] == "query":
+                query = param["value"]
+            elif param["name"] == "top_k":
+                top_k = parse_top_k(param["value"], DEFAULT_TOP_K, MAX_TOP_K)
+            elif param["name"] in FILTER_FIELDS:
+                filters[param["name"]] = param["value"]
+
+        if not query:
+            raise Exception("Missing mandatory parameter: query")
+
+        passages = hybrid_search(backend, embedder, query, filters=filters, k=top_k, cache=result_cache)
+        logger.info(f"Found {len(passages)} passages for {query} with filters {filters}")
+
+        responseBody = {
+            'TEXT': {
+                "body": json.dumps([
+                    {"score": passage['score'], "text": passage['text'], "metadata": passage['metadata']}
+                    for passage in passages
+                ])
+            }
+        }
+
+    action_response = {
+        'actionGroup': actionGroup,
+        'function': function,
+        'functionResponse': {
+            'responseBody': responseBody
+        }
+    }
+
+    function_response = {'response': action_response, 'messageVersion': event['messageVersion']}
+    logger.info("Response: {}".format(function_response))
+
+    return function_response
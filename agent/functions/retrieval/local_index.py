@@ -0,0 +1,93 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class NumpyIndex:
+    """
+    In memory stand in for the knowledge base index, for local runs and tests.
+
+    Exposes the same search method as OpenSearchBackend: BM25 for the lexical half,
+    exact inner product for the vector half, with metadata filters applied as a mask
+    before either is scored.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = []
+        self.vectors = None
+        self._term_counts = []
+        self._document_frequency = Counter()
+
+    def add(self, documents):
+        """
+        Parameters:
+        documents ([dict]): Documents with id, text, vector and optional metadata fields
+        """
+        vectors = []
+        for document in documents:
+            terms = Counter(tokenize(document['text']))
+            self._term_counts.append(terms)
+            self._document_frequency.update(terms.keys())
+            self.documents.append(document)
+            vectors.append(document['vector'])
+        new_vectors = np.asarray(vectors, dtype=np.float32)
+        self.vectors = new_vectors if self.vectors is None else np.vstack([self.vectors, new_vectors])
+        self._lengths = np.array([sum(terms.values()) for terms in self._term_counts], dtype=np.float32)
+
+    def _mask(self, filters):
+        mask = np.ones(len(self.documents), dtype=bool)
+        for field, value in (filters or {}).items():
+            if value:
+                mask &= np.array([document.get(field) == value for document in self.documents])
+        return mask
+
+    def _bm25(self, query_text, mask):
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        average_length = self._lengths.mean() if len(self._lengths) else 0.0
+        total = len(self.documents)
+        for term in set(tokenize(query_text)):
+            frequency = self._document_frequency.get(term)
+            if not frequency:
+                continue
+            idf = math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            term_frequency = np.array([terms.get(term, 0) for terms in self._term_counts], dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self._lengths / average_length)
+            scores += idf * term_frequency * (self.k1 + 1) / (term_frequency + norm)
+        scores[~mask] = 0.0
+        return scores
+
+    def _top_k(self, scores, candidates, k):
+        order = candidates[np.argsort(-scores[candidates], kind='stable')][:k]
+        return [
+            {
+                "id": self.documents[i]['id'],
+                "score": float(scores[i]),
+                "text": self.documents[i]['text'],
+                "metadata": self.documents[i].get('metadata', ''),
+            }
+            for i in order
+        ]
+
+    def search(self, query_text, query_vector, filters, k):
+        if not self.documents:
+            return [], []
+        mask = self._mask(filters)
+        lexical_scores = self._bm25(query_text, mask)
+        lexical = self._top_k(lexical_scores, np.flatnonzero(lexical_scores > 0), k)
+        vector_scores = self.vectors @ np.asarray(query_vector, dtype=np.float32)
+        vector = self._top_k(vector_scores, np.flatnonzero(mask), k)
+        return lexical, vector
@@ -0,0 +1,198 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+FILTER_FIELDS = ("department", "document_type")
+
+
+class ResultCache:
+    """
+    Small LRU cache with a time to live, shared by the warm container.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class EmbeddingCache:
+    """
+    Embeds query texts, answering repeated queries of the warm container from the cache.
+    """
+
+    def __init__(self, embed_fn, cache_size=1024):
+        self.embed_fn = embed_fn
+        self.cache = ResultCache(max_entries=cache_size, ttl_seconds=24 * 3600)
+
+    def embed(self, text):
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.embed_fn(text)
+            self.cache.put(text, vector)
+        return vector
+
+
+def parse_top_k(value, default=5, maximum=10):
+    """
+    Reads the top_k parameter of the agent, which arrives as a string.
+
+    Returns:
+    int: The value clamped to 1..maximum, default when it is not an integer
+    """
+    try:
+        top_k = int(str(value).strip())
+    except ValueError:
+        return default
+    return min(max(top_k, 1), maximum)
+
+
+def build_filter_clauses(filters):
+    """
+    Turns {"department": "Parks"} into term clauses on the keyword sub fields the index
+    maps for the filter fields, ignoring empty values.
+    """
+    return [{"term": {f"{field}.keyword": value}} for field, value in sorted((filters or {}).items()) if value]
+
+
+class OpenSearchBackend:
+    """
+    Runs the lexical and vector halves of a hybrid query in a single msearch round trip,
+    with the metadata filters applied inside both queries so they prune before scoring.
+    """
+
+    def __init__(self, client, index_name, text_field="text", vector_field="vector", metadata_field="metadata"):
+        self.client = client
+        self.index_name = index_name
+        self.text_field = text_field
+        self.vector_field = vector_field
+        self.metadata_field = metadata_field
+
+    def search(self, query_text, query_vector, filters, k):
+        filter_clauses = build_filter_clauses(filters)
+        source = {"excludes": [self.vector_field]}
+        lexical = {
+            "size": k,
+            "_source": source,
+            "query": {
+                "bool": {
+                    "must": [{"match": {self.text_field: query_text}}],
+                    "filter": filter_clauses
+                }
+            }
+        }
+        knn = {"vector": query_vector, "k": k}
+        if filter_clauses:
+            knn["filter"] = {"bool": {"filter": filter_clauses}}
+        vector = {
+            "size": k,
+            "_source": source,
+            "query": {"knn": {self.vector_field: knn}}
+        }
+        body = []
+        for query in (lexical, vector):
+            body.append({"index": self.index_name})
+            body.append(query)
+        responses = self.client.msearch(body=body)['responses']
+        return tuple(self._hits(response) for response in responses)
+
+    def _hits(self, response):
+        if 'error' in response:
+            raise Exception(f"Search failed: {response['error']}")
+        return [
+            {
+                "id": hit['_id'],
+                "score": hit['_score'],
+                "text": hit['_source'].get(self.text_field, ''),
+                "metadata": hit['_source'].get(self.metadata_field, ''),
+            }
+            for hit in response['hits']['hits']
+        ]
+
+
+def _normalize(hits):
+    if not hits:
+        return {}
+    scores = [hit['score'] for hit in hits]
+    low, high = min(scores), max(scores)
+    span = high - low
+    return {hit['id']: (hit['score'] - low) / span if span else 1.0 for hit in hits}
+
+
+def fuse(lexical_hits, vector_hits, k, alpha=0.5):
+    """
+    Combines both result lists with min-max normalized scores,
+    alpha * vector + (1 - alpha) * lexical.
+
+    Returns:
+    [dict]: The top k passages with their fused score
+    """
+    lexical_scores = _normalize(lexical_hits)
+    vector_scores = _normalize(vector_hits)
+    passages = {hit['id']: hit for hit in lexical_hits + vector_hits}
+    fused = [
+        {
+            **passages[doc_id],
+            "score": round(alpha * vector_scores.get(doc_id, 0.0) + (1 - alpha) * lexical_scores.get(doc_id, 0.0), 6)
+        }
+        for doc_id in passages
+    ]
+    fused.sort(key=lambda passage: (-passage['score'], passage['id']))
+    return fused[:k]
+
+
+def hybrid_search(backend, embedder, query, filters=None, k=5, alpha=0.5, cache=None):
+    """
+    Runs a filtered hybrid BM25 + kNN search.
+
+    Parameters:
+    backend: OpenSearchBackend or a local index with the same search method
+    embedder (EmbeddingCache): Embeds the query
+    query (str): The query text
+    filters (dict): Metadata filters, e.g. {"department": "Parks"}
+    k (int): The number of passages to return
+    alpha (float): Weight of the vector score against the lexical score
+    cache (ResultCache): Optional result cache
+
+    Returns:
+    [dict]: The passages with id, score, text and metadata
+    """
+    cache_key = json.dumps([query, sorted((filters or {}).items()), k, alpha])
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    # over fetch each half so that fusion has candidates to rank
+    candidates = max(k * 3, 10)
+    lexical_hits, vector_hits = backend.search(query, embedder.embed(query), filters, candidates)
+    passages = fuse(lexical_hits, vector_hits, k, alpha)
+
+    if cache is not None:
+        cache.put(cache_key, passages)
+    return passages
@@ -0,0 +1,266 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Exports park reservations into a parks x days occupancy matrix for planners, so
+ad-hoc analysis no longer scans the live table.
+
+Reservations (pk P{park}#, sk R{date}#) are read either with a parallel segmented
+scan of the table or from a DynamoDB export to S3 (DynamoDB JSON, gzipped or not).
+The matrix is saved as a compressed .npz and, when pyarrow is installed, a Parquet
+file, and utilization statistics are printed. With --model-output, the per park
+weekday x month demand counts used by the park reservation tool to recommend days
+are also written as JSON, ready to upload to the bucket the agent stack points at.
+
+    python analytics/occupancy_export.py --table my-table --segments 8 --output occupancy
+    python analytics/occupancy_export.py --export-dir ./AWSDynamoDB/0001/data --output occupancy
+    python analytics/occupancy_export.py --table my-table --model-output occupancy_model.json
+"""
+
+import argparse
+import datetime
+import glob
+import gzip
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'model'))
+
+from keys import KeyFormatError, ParkReservation, decode  # noqa: E402
+
+
+def parse_reservation(pk, sk, data):
+    """
+    Returns (park_id, date, citizen_id) for a reservation item, None for any other item.
+    """
+    try:
+        entity = decode(pk, sk)
+    except KeyFormatError:
+        return None
+    if not isinstance(entity, ParkReservation):
+        return None
+    try:
+        day = datetime.date.fromisoformat(entity.date)
+    except ValueError:
+        return None
+    return entity.park_id, day, data
+
+
+def scan_segment(table, segment, total_segments):
+    reservations = []
+    kwargs = {
+        "Segment": segment,
+        "TotalSegments": total_segments,
+        "ProjectionExpression": "pk, sk, #d",
+        "ExpressionAttributeNames": {"#d": "data"},
+    }
+    while True:
+        response = table.scan(**kwargs)
+        for item in response["Items"]:
+            reservation = parse_reservation(item["pk"], item["sk"], item.get("data", ""))
+            if reservation:
+                reservations.append(reservation)
+        if "LastEvaluatedKey" not in response:
+            return reservations
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def scan_reservations(table_name, segments=8):
+    """
+    Reads every reservation with a parallel segmented scan.
+    """
+    import boto3
+
+    table = boto3.resource("dynamodb").Table(table_name)
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        parts = executor.map(lambda segment: scan_segment(table, segment, segments), range(segments))
+        return [reservation for part in parts for reservation in part]
+
+
+def read_export(export_dir):
+    """
+    Reads reservations from the data files of a DynamoDB export in DynamoDB JSON format.
+    """
+    reservations = []
+    for path in sorted(glob.glob(os.path.join(export_dir, "*.json*"))):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)["Item"]
+                reservation = parse_reservation(
+                    item["pk"]["S"], item["sk"]["S"], item.get("data", {}).get("S", "")
+                )
+                if reservation:
+                    reservations.append(reservation)
+    return reservations
+
+
+def materialize(reservations):
+    """
+    Builds the occupancy matrices.
+
+    Returns:
+    dict: parks (sorted ids), start (first day), days (count), occupied (uint8 parks x days)
+          and holders (int32 parks x days, index into citizens + 1, 0 when free), citizens
+    """
+    if not reservations:
+        return {
+            "parks": np.array([], dtype=str), "start": None, "days": 0,
+            "occupied": np.zeros((0, 0), dtype=np.uint8), "holders": np.zeros((0, 0), dtype=np.int32),
+            "citizens": np.array([], dtype=str),
+        }
+    park_ids, dates, citizen_ids = zip(*reservations)
+    parks, park_index = np.unique(np.array(park_ids), return_inverse=True)
+    citizens, citizen_index = np.unique(np.array(citizen_ids), return_inverse=True)
+    ordinals = np.array([day.toordinal() for day in dates])
+    start = ordinals.min()
+    day_index = ordinals - start
+    days = int(day_index.max()) + 1
+
+    occupied = np.zeros((len(parks), days), dtype=np.uint8)
+    occupied[park_index, day_index] = 1
+    holders = np.zeros((len(parks), days), dtype=np.int32)
+    holders[park_index, day_index] = citizen_index + 1
+    return {
+        "parks": parks,
+        "start": datetime.date.fromordinal(int(start)),
+        "days": days,
+        "occupied": occupied,
+        "holders": holders,
+        "citizens": citizens,
+    }
+
+
+def utilization_stats(matrix, top=10, no_show_threshold=5):
+    """
+    Vectorized utilization statistics over the occupancy matrix.
+
+    No-show candidates are citizens holding an unusually large number of days, the
+    usual sign of speculative bookings that go unused.
+
+    Returns:
+    dict: peak_days, park_load and no_show_candidates
+    """
+    occupied = matrix["occupied"]
+    if occupied.size == 0:
+        return {"peak_days": [], "park_load": {}, "no_show_candidates": []}
+    start = matrix["start"]
+
+    daily = occupied.sum(axis=0, dtype=np.int64)
+    peak = np.argsort(-daily, kind="stable")[:top]
+    park_load = occupied.mean(axis=1)
+
+    held = np.bincount(matrix["holders"].ravel(), minlength=len(matrix["citizens"]) + 1)[1:]
+    heavy = np.flatnonzero(held >= no_show_threshold)
+    heavy = heavy[np.argsort(-held[heavy], kind="stable")]
+
+    return {
+        "peak_days": [
+            ((start + datetime.timedelta(days=int(day))).isoformat(), int(daily[day])) for day in peak if daily[day]
+        ],
+        "park_load": {str(park): round(float(load), 4) for park, load in zip(matrix["parks"], park_load)},
+        "no_show_candidates": [(str(matrix["citizens"][i]), int(held[i])) for i in heavy],
+    }
+
+
+def demand_model(matrix):
+    """
+    Vectorized reserved and observed day counts per park, weekday and month.
+
+    Returns:
+    dict: {"start", "days", "parks": {park_id: {"reserved": [[int] * 12] * 7, "observed": [[int] * 12] * 7}}}
+    """
+    model = {"start": matrix["start"].isoformat() if matrix["start"] else None, "days": matrix["days"], "parks": {}}
+    if matrix["days"] == 0:
+        return model
+    dates = np.datetime64(matrix["start"]) + np.arange(matrix["days"])
+    # numpy counts weekdays from Thursday 1970-01-01, shift so Monday is 0 like datetime.weekday
+    weekday = (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7
+    month = dates.astype("datetime64[M]").astype(np.int64) % 12
+    cell = weekday * 12 + month
+
+    observed = np.bincount(cell, minlength=84).reshape(7, 12)
+    reserved = np.zeros((len(matrix["parks"]), 84), dtype=np.int64)
+    np.add.at(reserved, (slice(None), cell), matrix["occupied"])
+    for park, counts in zip(matrix["parks"], reserved.reshape(-1, 7, 12)):
+        model["parks"][str(park)] = {"reserved": counts.tolist(), "observed": observed.tolist()}
+    return model
+
+
+def save(matrix, output):
+    """
+    Writes <output>.npz and, when pyarrow is available, <output>.parquet with one row per park.
+
+    Returns:
+    [str]: The files written
+    """
+    start = matrix["start"].isoformat() if matrix["start"] else ""
+    np.savez_compressed(
+        f"{output}.npz",
+        parks=matrix["parks"], citizens=matrix["citizens"],
+        occupied=matrix["occupied"], holders=matrix["holders"], start=np.array(start),
+    )
+    written = [f"{output}.npz"]
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return written
+
+    columns = {"park_id": pa.array(matrix["parks"].tolist())}
+    for day in range(matrix["days"]):
+        label = (matrix["start"] + datetime.timedelta(days=day)).isoformat()
+        columns[label] = pa.array(matrix["occupied"][:, day])
+    pq.write_table(pa.table(columns), f"{output}.parquet", compression="zstd")
+    written.append(f"{output}.parquet")
+    return written
+
+
+def load(path):
+    """
+    Loads a matrix written by save from a .npz file.
+    """
+    with np.load(path) as data:
+        start = str(data["start"])
+        occupied = data["occupied"]
+        return {
+            "parks": data["parks"],
+            "start": datetime.date.fromisoformat(start) if start else None,
+            "days": occupied.shape[1],
+            "occupied": occupied,
+            "holders": data["holders"],
+            "citizens": data["citizens"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--table", help="scan this DynamoDB table")
+    source.add_argument("--export-dir", help="read the data files of a DynamoDB export")
+    parser.add_argument("--segments", type=int, default=8, help="parallel scan segments")
+    parser.add_argument("--output", default="occupancy")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--no-show-threshold", type=int, default=5)
+    parser.add_argument("--model-output", help="also write the demand model used to recommend park days")
+    args = parser.parse_args()
+
+    reservations = scan_reservations(args.table, args.segments) if args.table else read_export(args.export_dir)
+    matrix = materialize(reservations)
+    print(f"{len(reservations)} reservations, {len(matrix['parks'])} parks x {matrix['days']} days from {matrix['start']}")
+    print(f"Wrote {save(matrix, args.output)}")
+    if args.model_output:
+        with open(args.model_output, "w") as f:
+            json.dump(demand_model(matrix), f)
+        print(f"Wrote {args.model_output}")
+    print(json.dumps(utilization_stats(matrix, args.top, args.no_show_threshold), indent=2))
+
+
+if __name__ == "__main__":
+    main()
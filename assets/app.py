@@ -3,33 +3,26 @@
 
 import os
 import streamlit as st
-import boto3
 import json
 import datetime
 import logging
+import time
 import uuid
 from contextlib import contextmanager
 
+from bedrock_client import agent_runtime_client, client_settings, connection_metrics
+from citizens import citizen_data
+from trace_store import TraceStore, page_of_messages
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize the Bedrock Agent Runtime client
-bedrock_agent_runtime_client = boto3.client(
-    "bedrock-agent-runtime", region_name="us-west-2"
-)
-
-# # Initialize the Bedrock Agent Runtime client
-# bedrock_agent_runtime_client = boto3.client(
-#     "bedrock-agent-runtime", region_name="us-east-1"
-# )
+# Number of chat messages rendered per page of history
+MESSAGES_PAGE_SIZE = 20
 
-# Dictionary mapping names to their data
-citizen_data = {
-    "Tom": {"district_id": 4, "citizen_id": 2, "name": "Tom"},
-    "Heather": {"district_id": 1, "citizen_id": 8, "name": "Heather"},
-    "Frank": {"district_id": 3, "citizen_id": 3, "name": "Frank"},
-}
+# Number of agent invocations kept for the timing metrics
+INVOKE_TIMINGS_KEPT = 50
 
 # Page configuration
 st.set_page_config(
@@ -91,8 +84,15 @@ if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
 if "show_traces" not in st.session_state:
     st.session_state.show_traces = False
-if "trace_data" not in st.session_state:
-    st.session_state.trace_data = []
+if "trace_store" not in st.session_state:
+    st.session_state.trace_store = TraceStore()
+if "visible_messages" not in st.session_state:
+    st.session_state.visible_messages = MESSAGES_PAGE_SIZE
+if "invoke_timings" not in st.session_state:
+    st.session_state.invoke_timings = []
+
+# Initialize the shared Bedrock Agent Runtime client, built and warmed once per process
+bedrock_agent_runtime_client = agent_runtime_client()
 
 # Sidebar configuration
 with st.sidebar:
@@ -146,6 +146,26 @@ with st.sidebar:
         st.session_state.show_traces = show_traces
         st.rerun()
 
+    with st.expander("📶 Connection Metrics"):
+        st.caption(f"Region: {client_settings()['region']}")
+        if connection_metrics["warm_up_ms"] is not None:
+            st.caption(f"Warm up: {connection_metrics['warm_up_ms']:.0f} ms")
+        if st.session_state.invoke_timings:
+            last = st.session_state.invoke_timings[-1]
+            st.caption(
+                f"Last request: {last['time_to_response_ms']:.0f} ms to response, "
+                f"{last['streaming_ms']:.0f} ms streaming"
+            )
+
+    if st.session_state.trace_store.size_bytes:
+        st.download_button(
+            "💾 Download Traces",
+            data=st.session_state.trace_store.to_jsonl(st.session_state.session_id),
+            file_name=f"traces-{st.session_state.session_id}.jsonl",
+            mime="application/jsonl",
+            help="Analyze offline with: python assets/trace_analyzer.py <file>",
+        )
+
     # Clear Chat with Session End
     st.markdown("---")
     if st.button("🗑️ Clear Chat & End Session"):
@@ -164,7 +184,8 @@ with st.sidebar:
         # Clear all session data
         st.session_state.messages = []
         st.session_state.session_id = str(uuid.uuid4())
-        st.session_state.trace_data = []
+        st.session_state.trace_store.clear()
+        st.session_state.visible_messages = MESSAGES_PAGE_SIZE
         st.success("Chat cleared and new session started!")
 
 
@@ -176,6 +197,7 @@ def simple_agent_invoke(
     Invoke the Bedrock agent and handle the response stream
     """
     try:
+        started = time.perf_counter()
         agent_response = bedrock_agent_runtime_client.invoke_agent(
             inputText=input_text,
             agentId=agent_id,
@@ -185,6 +207,8 @@ def simple_agent_invoke(
             endSession=end_session,
         )
 
+        # time until the response headers arrive, including any connection setup
+        responded = time.perf_counter()
         event_stream = agent_response["completion"]
         response_content = []
         trace_content = []
@@ -199,7 +223,10 @@ def simple_agent_invoke(
             elif "trace" in event:
                 trace_data = event["trace"]
                 trace_content.append(trace_data)
-                logger.info(f"Trace data received: {json.dumps(trace_data, indent=2)}")
+                logger.debug("Trace data received: %s", trace_data)
+
+        finished = time.perf_counter()
+        record_invoke_timing((responded - started) * 1000, (finished - responded) * 1000)
 
         return "".join(response_content), trace_content
 
@@ -208,6 +235,13 @@ def simple_agent_invoke(
         raise e
 
 
+def record_invoke_timing(time_to_response_ms, streaming_ms):
+    timings = st.session_state.invoke_timings
+    timings.append({"time_to_response_ms": time_to_response_ms, "streaming_ms": streaming_ms})
+    del timings[:-INVOKE_TIMINGS_KEPT]
+    logger.info(f"Agent invocation: {time_to_response_ms:.0f} ms to response, {streaming_ms:.0f} ms streaming")
+
+
 # Display chat messages
 def display_message(message):
     role = message["role"]
@@ -220,14 +254,30 @@ def display_message(message):
         st.markdown(f"*{timestamp}*")
         st.markdown(content)
 
-        # Display traces if they exist and traces are enabled
+        # Display the trace summary if it exists and traces are enabled, raw traces load on demand
         if (
             role == "assistant"
             and st.session_state.show_traces
-            and "trace_data" in message
+            and "trace_summary" in message
         ):
-            with st.expander("View Agent Traces"):
-                for trace in message["trace_data"]:
+            display_trace_summary(message)
+
+
+def display_trace_summary(message):
+    summary = message["trace_summary"]
+    timing = f"{summary['elapsed_ms']} ms" if summary["elapsed_ms"] is not None else "n/a"
+    st.caption(
+        f"🔍 {summary['events']} trace events · {len(summary['tool_calls'])} tool calls · "
+        f"{summary['kb_lookups']} KB lookups · {timing}"
+    )
+    with st.expander("View Agent Traces"):
+        st.json(summary)
+        if st.toggle("Show raw traces", key=f"raw_traces_{message['turn_id']}"):
+            raw_traces = st.session_state.trace_store.get(message["turn_id"])
+            if raw_traces is None:
+                st.info("Raw traces for this turn were dropped to bound memory, only the summary is kept.")
+            else:
+                for trace in raw_traces:
                     st.code(json.dumps(trace, indent=2))
 
 
@@ -249,8 +299,14 @@ if not agent_id or not agent_alias_id:
     )
     st.stop()
 
-# Display chat history
-for message in st.session_state.messages:
+# Display the most recent page of chat history
+visible_messages, hidden_messages = page_of_messages(
+    st.session_state.messages, st.session_state.visible_messages
+)
+if hidden_messages and st.button(f"⬆️ Show earlier messages ({hidden_messages} hidden)"):
+    st.session_state.visible_messages += MESSAGES_PAGE_SIZE
+    st.rerun()
+for message in visible_messages:
     display_message(message)
 
 # Chat input
@@ -273,12 +329,14 @@ if user_input := st.chat_input("How can I help you with AnyCity services today?"
             session_id=st.session_state.session_id,
         )
 
-        # Add assistant message to chat with trace data
+        # Add assistant message to chat with a summary of the traces, the raw traces go to the bounded store
+        turn_id = str(uuid.uuid4())
         assistant_message = {
             "role": "assistant",
             "content": response_text,
             "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "trace_data": trace_data if trace_data else [],
+            "turn_id": turn_id,
+            "trace_summary": st.session_state.trace_store.add(turn_id, trace_data or []),
         }
         st.session_state.messages.append(assistant_message)
         display_message(assistant_message)
@@ -0,0 +1,83 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import logging
+import os
+import time
+
+import boto3
+import streamlit as st
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger(__name__)
+
+# process wide connection metrics, shown in the app's debug panel
+connection_metrics = {"warm_up_ms": None}
+
+
+def client_settings():
+    """
+    Reads the Bedrock Agent Runtime client settings from the environment.
+
+    Returns:
+    dict: region, pool_size, connect_timeout, read_timeout, retry_mode and max_attempts
+    """
+    return {
+        "region": os.environ.get("BEDROCK_REGION", os.environ.get("AWS_REGION", "us-west-2")),
+        "pool_size": int(os.environ.get("BEDROCK_POOL_SIZE", "10")),
+        "connect_timeout": int(os.environ.get("BEDROCK_CONNECT_TIMEOUT", "5")),
+        "read_timeout": int(os.environ.get("BEDROCK_READ_TIMEOUT", "120")),
+        "retry_mode": os.environ.get("BEDROCK_RETRY_MODE", "adaptive"),
+        "max_attempts": int(os.environ.get("BEDROCK_MAX_ATTEMPTS", "3")),
+    }
+
+
+@st.cache_resource
+def get_agent_runtime_client(region, pool_size, connect_timeout, read_timeout, retry_mode, max_attempts):
+    """
+    Builds one Bedrock Agent Runtime client per distinct configuration, shared by every
+    user and rerun of the app, and warms its connection pool.
+    """
+    client = boto3.client(
+        "bedrock-agent-runtime",
+        region_name=region,
+        config=Config(
+            max_pool_connections=pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={"mode": retry_mode, "max_attempts": max_attempts},
+            tcp_keepalive=True,
+        ),
+    )
+    connection_metrics["warm_up_ms"] = warm_up(client)
+    return client
+
+
+def warm_up(client):
+    """
+    Opens a pooled TLS connection to the endpoint ahead of the first user request.
+
+    Any request that reaches the service leaves a keep-alive connection in the pool,
+    so a lookup of a memory that does not exist is enough; the expected error is ignored.
+
+    Returns:
+    float: Milliseconds spent, including DNS, TCP and TLS setup
+    """
+    started = time.perf_counter()
+    try:
+        client.get_agent_memory(
+            agentId="WARMUP0000",
+            agentAliasId="WARMUP0000",
+            memoryType="SESSION_SUMMARY",
+            memoryId="warmup",
+        )
+    except (ClientError, BotoCoreError) as e:
+        logger.debug(f"Warm up request returned: {e}")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"Bedrock Agent Runtime connection warmed up in {elapsed_ms:.0f} ms")
+    return elapsed_ms
+
+
+def agent_runtime_client():
+    return get_agent_runtime_client(**client_settings())
@@ -0,0 +1,26 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# Dictionary mapping names to their data
+citizen_data = {
+    "Tom": {"district_id": 4, "citizen_id": 2, "name": "Tom"},
+    "Heather": {"district_id": 1, "citizen_id": 8, "name": "Heather"},
+    "Frank": {"district_id": 3, "citizen_id": 3, "name": "Frank"},
+}
+
+# Scripted conversations replayed by the load generator, {name} is the citizen's name
+conversations = {
+    "book_park": [
+        "Hi, I'm {name}. Is park 1 available between 2024-12-01 and 2024-12-15?",
+        "Please book park 1 for me on the first available day.",
+        "What are the rules for reserving a park pavilion?",
+    ],
+    "bulk_pickup": [
+        "Hi, I'm {name}. When is garbage pickup in my district?",
+        "Can you schedule a bulk waste pickup for me on the next pickup day?",
+    ],
+    "policy_question": [
+        "Which streets are closed this month?",
+        "How far in advance do I need to request a street closure?",
+    ],
+}
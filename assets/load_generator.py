@@ -0,0 +1,229 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Replays scripted citizen conversations against the agent across many concurrent
+sessions and reports time to first chunk, total latency and error rate per turn.
+
+    python assets/load_generator.py --sessions 500 --concurrency 200 --stub
+    python assets/load_generator.py --sessions 500 --stub --citizens-file citizens.jsonl
+    python assets/load_generator.py --sessions 100 --concurrency 50 \\
+        --agent-id AGENT --agent-alias-id ALIAS --region us-west-2 --output results.jsonl
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from citizens import citizen_data, conversations
+from trace_analyzer import percentile
+
+
+class BedrockAgentBackend:
+    """
+    Streams responses from a deployed agent with invoke_agent.
+    """
+
+    def __init__(self, agent_id, agent_alias_id, region=None, max_pool_connections=50):
+        import boto3
+        from botocore.config import Config
+
+        self.agent_id = agent_id
+        self.agent_alias_id = agent_alias_id
+        self.client = boto3.client(
+            "bedrock-agent-runtime",
+            region_name=region,
+            config=Config(max_pool_connections=max_pool_connections, retries={"mode": "standard"}),
+        )
+
+    def invoke(self, session_id, input_text, session_attributes):
+        response = self.client.invoke_agent(
+            inputText=input_text,
+            agentId=self.agent_id,
+            agentAliasId=self.agent_alias_id,
+            sessionId=session_id,
+            sessionState={"sessionAttributes": session_attributes},
+        )
+        for event in response["completion"]:
+            if "chunk" in event:
+                yield event["chunk"]["bytes"].decode("utf-8")
+
+
+class StubAgentBackend:
+    """
+    Offline stand in for the agent. Latencies are drawn from a log-normal distribution
+    around the given medians, and a fraction of turns fail.
+    """
+
+    def __init__(self, first_chunk_ms=1500, chunk_ms=40, chunks=8, error_rate=0.01, seed=None):
+        self.first_chunk_ms = first_chunk_ms
+        self.chunk_ms = chunk_ms
+        self.chunks = chunks
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def invoke(self, session_id, input_text, session_attributes):
+        time.sleep(self.first_chunk_ms * self.random.lognormvariate(0, 0.4) / 1000)
+        if self.random.random() < self.error_rate:
+            raise Exception("ThrottlingException: stubbed agent failure")
+        for i in range(self.chunks):
+            if i:
+                time.sleep(self.chunk_ms * self.random.lognormvariate(0, 0.3) / 1000)
+            yield f"chunk {i} "
+
+
+def run_turn(backend, session_id, turn, input_text, session_attributes):
+    """
+    Runs one turn synchronously and times it.
+
+    Returns:
+    dict: turn, ttfc_ms, total_ms and error
+    """
+    started = time.perf_counter()
+    first_chunk = None
+    error = None
+    try:
+        for _ in backend.invoke(session_id, input_text, session_attributes):
+            if first_chunk is None:
+                first_chunk = time.perf_counter()
+    except Exception as e:
+        error = str(e)
+    finished = time.perf_counter()
+    return {
+        "session_id": session_id,
+        "turn": turn,
+        "ttfc_ms": (first_chunk - started) * 1000 if first_chunk else None,
+        "total_ms": (finished - started) * 1000,
+        "error": error,
+    }
+
+
+async def run_session(backend, citizen, script, semaphore, results, think_time_ms=0):
+    session_id = str(uuid.uuid4())
+    session_attributes = {
+        "citizenID": str(citizen["citizen_id"]),
+        "districtID": str(citizen["district_id"]),
+    }
+    async with semaphore:
+        for turn, template in enumerate(script):
+            result = await asyncio.to_thread(
+                run_turn, backend, session_id, turn, template.format(name=citizen["name"]), session_attributes
+            )
+            results.append(result)
+            if result["error"]:
+                break
+            if think_time_ms:
+                await asyncio.sleep(think_time_ms / 1000)
+
+
+def load_citizens(path):
+    """
+    Citizen profiles from a JSON lines file, as the city generator writes them.
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def run_load(backend, sessions, concurrency, think_time_ms=0, seed=None, citizens=None):
+    """
+    Runs `sessions` scripted conversations with at most `concurrency` in flight, as
+    citizens drawn from `citizens`, by default the profiles of assets/citizens.py.
+
+    Returns:
+    ([dict], float): The per turn results and the wall clock seconds
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+    rng = random.Random(seed)
+    citizens = list(citizens or citizen_data.values())
+    scripts = list(conversations.values())
+    results = []
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(backend, rng.choice(citizens), rng.choice(scripts), semaphore, results, think_time_ms)
+        for _ in range(sessions)
+    ))
+    return results, time.perf_counter() - started
+
+
+def summarize(results):
+    """
+    Groups results by turn index.
+
+    Returns:
+    dict: {turn: {count, error_rate, ttfc_p50, ttfc_p90, ttfc_p99, total_p50, total_p90, total_p99}}
+    """
+    summary = {}
+    ordered = sorted(results, key=lambda result: result["turn"])
+    for turn, group in itertools.groupby(ordered, key=lambda result: result["turn"]):
+        group = list(group)
+        ok = [result for result in group if not result["error"]]
+        row = {"count": len(group), "error_rate": 1 - len(ok) / len(group)}
+        for metric in ("ttfc", "total"):
+            values = [result[f"{metric}_ms"] for result in ok if result[f"{metric}_ms"] is not None]
+            for p in (50, 90, 99):
+                row[f"{metric}_p{p}"] = percentile(values, p)
+        summary[turn] = row
+    return summary
+
+
+def format_summary(summary, elapsed):
+    turns = sum(row["count"] for row in summary.values())
+    lines = [
+        f"{turns} turns in {elapsed:.1f}s ({turns / elapsed:.1f} turns/s)",
+        f"{'turn':>4} {'count':>6} {'errors':>7} {'ttfc p50':>9} {'p90':>7} {'p99':>7} "
+        f"{'total p50':>10} {'p90':>7} {'p99':>7}",
+    ]
+    for turn, row in summary.items():
+        cells = [f"{row[key] or 0:>7.0f}" for key in ("ttfc_p90", "ttfc_p99")]
+        totals = [f"{row[key] or 0:>7.0f}" for key in ("total_p90", "total_p99")]
+        lines.append(
+            f"{turn:>4} {row['count']:>6} {row['error_rate']:>7.1%} {row['ttfc_p50'] or 0:>9.0f} {' '.join(cells)} "
+            f"{row['total_p50'] or 0:>10.0f} {' '.join(totals)}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--think-time-ms", type=int, default=0, help="pause between turns of a session")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", help="write per turn results as JSONL")
+    parser.add_argument("--citizens-file", help="citizen profiles as JSON lines, from city_generator.py")
+    parser.add_argument("--stub", action="store_true", help="use the offline stub agent")
+    parser.add_argument("--stub-error-rate", type=float, default=0.01)
+    parser.add_argument("--agent-id")
+    parser.add_argument("--agent-alias-id")
+    parser.add_argument("--region")
+    args = parser.parse_args()
+
+    if args.stub:
+        backend = StubAgentBackend(error_rate=args.stub_error_rate, seed=args.seed)
+    elif args.agent_id and args.agent_alias_id:
+        backend = BedrockAgentBackend(args.agent_id, args.agent_alias_id, args.region, args.concurrency)
+    else:
+        parser.error("either --stub or --agent-id and --agent-alias-id are required")
+
+    citizens = load_citizens(args.citizens_file) if args.citizens_file else None
+    results, elapsed = asyncio.run(
+        run_load(backend, args.sessions, args.concurrency, args.think_time_ms, args.seed, citizens)
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+    print(format_summary(summarize(results), elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Breaks agent turns down into a timeline of LLM, tool, retrieval and guardrail steps
+and reports where the latency goes.
+
+Reads JSONL where each line is one turn, either {"session_id": ..., "traces": [...]}
+or a bare list of trace events as returned by invoke_agent. The Streamlit client
+exports this format from the sidebar.
+
+    python assets/trace_analyzer.py traces.jsonl
+    python assets/trace_analyzer.py traces.jsonl --timeline
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict, deque
+
+from trace_store import TRACE_TYPES, event_time
+
+
+CATEGORIES = ("llm", "tool", "retrieval", "guardrail", "other")
+
+PERCENTILES = (50, 90, 99)
+
+
+def classify(trace_type, body):
+    """
+    Works out which step a trace event starts or ends.
+
+    Returns:
+    (str, str, str): The category, 'start' or 'end', and a label
+    """
+    if trace_type == "guardrailTrace":
+        return "guardrail", "point", body.get("action", "")
+    if trace_type == "failureTrace":
+        return "other", "point", body.get("failureReason", "failure")
+    if "modelInvocationInput" in body:
+        return "llm", "start", trace_type.replace("Trace", "")
+    if "modelInvocationOutput" in body:
+        return "llm", "end", trace_type.replace("Trace", "")
+    invocation = body.get("invocationInput")
+    if invocation:
+        if "knowledgeBaseLookupInput" in invocation:
+            return "retrieval", "start", invocation["knowledgeBaseLookupInput"].get("knowledgeBaseId", "")
+        if "actionGroupInvocationInput" in invocation:
+            action = invocation["actionGroupInvocationInput"]
+            return "tool", "start", f"{action.get('actionGroupName', '')}.{action.get('function', action.get('apiPath', ''))}"
+        return "other", "start", invocation.get("invocationType", "")
+    observation = body.get("observation")
+    if observation:
+        if "knowledgeBaseLookupOutput" in observation:
+            return "retrieval", "end", ""
+        if "actionGroupInvocationOutput" in observation:
+            return "tool", "end", ""
+        return "other", "point", observation.get("type", "")
+    return "other", "point", next(iter(body), "")
+
+
+def _metadata_ms(body):
+    for key in ("modelInvocationOutput", "observation"):
+        section = body.get(key, {})
+        for nested in (section, *[v for v in section.values() if isinstance(v, dict)]):
+            total = nested.get("metadata", {}).get("totalTimeMs")
+            if total is not None:
+                return total
+    return None
+
+
+def _trace_id(body):
+    """
+    The traceId of the step an event belongs to, shared by the events that open and close it.
+    """
+    for key in ("modelInvocationInput", "modelInvocationOutput", "invocationInput", "observation"):
+        section = body.get(key)
+        if isinstance(section, dict) and section.get("traceId"):
+            return section["traceId"]
+    return body.get("traceId")
+
+
+def build_timeline(traces):
+    """
+    Turns the trace events of one turn into timed steps.
+
+    Step durations come from the trace metadata when the service reports them, and
+    otherwise from the eventTime of the events that open and close the step.
+
+    Returns:
+    [dict]: Steps with category, label, start_ms and duration_ms, relative to the first event
+    """
+    events = []
+    for event in traces:
+        trace = event.get("trace", {})
+        for trace_type in TRACE_TYPES:
+            if trace_type in trace:
+                events.append((event_time(event), trace_type, trace[trace_type]))
+
+    timed = [time for time, _, _ in events if time]
+    origin = min(timed) if timed else None
+
+    def offset(time):
+        return (time - origin).total_seconds() * 1000 if time and origin else None
+
+    steps = []
+    # open steps by category and trace id; steps sharing both, such as parallel tool
+    # calls of one orchestration step, are closed in the order they were opened
+    open_steps = defaultdict(deque)
+    for time, trace_type, body in events:
+        category, phase, label = classify(trace_type, body)
+        key = (category, _trace_id(body))
+        if phase == "start":
+            step = {"category": category, "label": label, "start_ms": offset(time), "duration_ms": None}
+            open_steps[key].append(step)
+            steps.append(step)
+        elif phase == "end" and (open_steps[key] or open_steps[(category, None)]):
+            step = (open_steps[key] or open_steps[(category, None)]).popleft()
+            reported = _metadata_ms(body)
+            if reported is not None:
+                step["duration_ms"] = reported
+            elif step["start_ms"] is not None and offset(time) is not None:
+                step["duration_ms"] = offset(time) - step["start_ms"]
+        else:
+            steps.append({"category": category, "label": label, "start_ms": offset(time), "duration_ms": 0})
+
+    return steps
+
+
+def breakdown(traces):
+    """
+    Sums step durations per category for one turn.
+
+    Returns:
+    dict: Milliseconds per category plus total_ms, the span of the turn
+    """
+    steps = build_timeline(traces)
+    totals = dict.fromkeys(CATEGORIES, 0.0)
+    for step in steps:
+        totals[step["category"]] += step["duration_ms"] or 0
+    ends = [step["start_ms"] + (step["duration_ms"] or 0) for step in steps if step["start_ms"] is not None]
+    totals["total_ms"] = max(ends) if ends else sum(totals[category] for category in CATEGORIES)
+    return totals
+
+
+def percentile(values, p):
+    """
+    Linear interpolation percentile, p in [0, 100].
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def aggregate(turns):
+    """
+    Aggregates per turn breakdowns into percentiles and the share of time per category.
+
+    Parameters:
+    turns ([[dict]]): The trace events of each turn
+
+    Returns:
+    dict: {"turns": n, "percentiles": {category: {p50, p90, p99}}, "share": {category: fraction}}
+    """
+    samples = defaultdict(list)
+    for traces in turns:
+        for key, value in breakdown(traces).items():
+            samples[key].append(value)
+
+    measured = sum(sum(samples[category]) for category in CATEGORIES)
+    return {
+        "turns": len(turns),
+        "percentiles": {
+            key: {f"p{p}": percentile(values, p) for p in PERCENTILES}
+            for key, values in samples.items()
+        },
+        "share": {
+            category: (sum(samples[category]) / measured if measured else 0.0)
+            for category in CATEGORIES
+        },
+    }
+
+
+def read_turns(lines):
+    turns = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        turns.append(record["traces"] if isinstance(record, dict) else record)
+    return turns
+
+
+def format_report(report):
+    lines = [f"turns: {report['turns']}", f"{'step':<10} {'share':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}"]
+    for key in (*CATEGORIES, "total_ms"):
+        values = report["percentiles"].get(key, {})
+        share = f"{report['share'][key]:.0%}" if key in report["share"] else ""
+        cells = [f"{values.get(f'p{p}') or 0:>9.0f}" for p in PERCENTILES]
+        lines.append(f"{key.replace('_ms', ''):<10} {share:>6} {' '.join(cells)}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', help='JSONL file of turns, stdin when omitted')
+    parser.add_argument('--timeline', action='store_true', help='also print the timeline of every turn')
+    args = parser.parse_args()
+
+    with (open(args.path) if args.path else sys.stdin) as f:
+        turns = read_turns(f)
+
+    if args.timeline:
+        for i, traces in enumerate(turns):
+            print(f"turn {i}")
+            for step in build_timeline(traces):
+                start = f"{step['start_ms']:.0f}" if step['start_ms'] is not None else "?"
+                duration = f"{step['duration_ms']:.0f}" if step['duration_ms'] is not None else "?"
+                print(f"  +{start:>7} ms {duration:>7} ms  {step['category']:<9} {step['label']}")
+    print(format_report(aggregate(turns)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import datetime
+import json
+from collections import Counter, OrderedDict
+
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_TURNS = 20
+
+TRACE_TYPES = (
+    "preProcessingTrace",
+    "orchestrationTrace",
+    "postProcessingTrace",
+    "guardrailTrace",
+    "failureTrace",
+)
+
+
+def event_time(trace):
+    value = trace.get("eventTime")
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return None
+
+
+def summarize_traces(traces):
+    """
+    Condenses the raw trace events of one agent turn into a small dict that is cheap
+    to keep in session state and to render on every rerun.
+
+    Parameters:
+    traces ([dict]): The trace events from invoke_agent
+
+    Returns:
+    dict: Step counts, tool calls, knowledge base lookups, guardrail actions and timings
+    """
+    steps = Counter()
+    tool_calls = []
+    kb_lookups = 0
+    guardrail_actions = []
+    model_ms = 0
+    input_tokens = 0
+    output_tokens = 0
+    times = []
+
+    for event in traces:
+        trace = event.get("trace", {})
+        timestamp = event_time(event)
+        if timestamp:
+            times.append(timestamp)
+        for trace_type in TRACE_TYPES:
+            if trace_type not in trace:
+                continue
+            steps[trace_type] += 1
+            body = trace[trace_type]
+            invocation = body.get("invocationInput", {})
+            if "actionGroupInvocationInput" in invocation:
+                action = invocation["actionGroupInvocationInput"]
+                tool_calls.append(f"{action.get('actionGroupName', '')}.{action.get('function', action.get('apiPath', ''))}")
+            if "knowledgeBaseLookupInput" in invocation:
+                kb_lookups += 1
+            if trace_type == "guardrailTrace" and body.get("action"):
+                guardrail_actions.append(body["action"])
+            metadata = body.get("modelInvocationOutput", {}).get("metadata", {})
+            usage = metadata.get("usage", {})
+            input_tokens += usage.get("inputTokens", 0)
+            output_tokens += usage.get("outputTokens", 0)
+            model_ms += metadata.get("totalTimeMs", 0)
+
+    elapsed_ms = int((max(times) - min(times)).total_seconds() * 1000) if len(times) > 1 else None
+    return {
+        "events": len(traces),
+        "steps": dict(steps),
+        "tool_calls": tool_calls,
+        "kb_lookups": kb_lookups,
+        "guardrail_actions": guardrail_actions,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "model_ms": model_ms or None,
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+class TraceStore:
+    """
+    Keeps raw traces for the most recent turns of a session, bounded by both a turn
+    count and a serialized size. Older turns keep only their summary; their raw
+    traces are dropped and reported as evicted when expanded.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_turns=DEFAULT_MAX_TURNS):
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self._raw = OrderedDict()
+        self._bytes = 0
+
+    def add(self, turn_id, traces):
+        """
+        Stores the raw traces of a turn and returns their summary.
+        """
+        serialized = json.dumps(traces, default=str)
+        self._raw[turn_id] = serialized
+        self._bytes += len(serialized)
+        while self._raw and (len(self._raw) > self.max_turns or self._bytes > self.max_bytes):
+            _, evicted = self._raw.popitem(last=False)
+            self._bytes -= len(evicted)
+        return summarize_traces(traces)
+
+    def get(self, turn_id):
+        """
+        Returns the raw traces of a turn, or None when they were evicted.
+        """
+        serialized = self._raw.get(turn_id)
+        return None if serialized is None else json.loads(serialized)
+
+    def to_jsonl(self, session_id):
+        """
+        Exports the retained raw traces, one turn per line, in the format trace_analyzer.py reads.
+        """
+        return "".join(
+            f'{{"session_id":{json.dumps(session_id)},"turn_id":{json.dumps(turn_id)},"traces":{serialized}}}\n'
+            for turn_id, serialized in self._raw.items()
+        )
+
+    def clear(self):
+        self._raw.clear()
+        self._bytes = 0
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+
+def page_of_messages(messages, visible):
+    """
+    Returns the tail of the history to render and how many earlier messages are hidden.
+    """
+    hidden = max(len(messages) - visible, 0)
+    return messages[hidden:], hidden
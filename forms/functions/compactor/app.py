@@ -0,0 +1,169 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import gzip
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from aws_lambda_powertools import Metrics, Logger, Tracer
+from aws_lambda_powertools.metrics import MetricUnit, single_metric
+
+from keys import FormField, FormTemplateListing, FormVersion, KeyFormatError, decode, form_partition
+from model import migrate_legacy_form_version
+
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+table_name = os.environ['DDB_TABLE']
+table = boto3.resource('dynamodb').Table(table_name)
+s3 = boto3.client('s3')
+
+archive_bucket = os.environ['FORMS_ARCHIVE_BUCKET']
+archive_prefix = os.environ.get('FORMS_ARCHIVE_PREFIX', 'forms')
+archive_after_seconds = int(os.environ.get('FORMS_ARCHIVE_AFTER_DAYS', '30')) * 24 * 3600
+batch_rows = int(os.environ.get('FORMS_ARCHIVE_BATCH_ROWS', '5000'))
+
+
+def list_form_templates():
+    """
+    Lists the form templates from their listing rows, a query of one partition.
+    """
+    kwargs = {
+        "KeyConditionExpression": Key('pk').eq(FormTemplateListing.PARTITION),
+        "ProjectionExpression": "pk, sk",
+    }
+    while True:
+        response = table.query(**kwargs)
+        for item in response['Items']:
+            yield decode(item['pk'], item['sk']).template_id
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def read_partition(form_template_id):
+    kwargs = {"KeyConditionExpression": Key('pk').eq(form_partition(form_template_id))}
+    while True:
+        response = table.query(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def decimal_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def archive_batch(form_template_id, rows):
+    """
+    Writes rows to S3 as gzipped JSON lines, then deletes them from the table.
+    Nothing is deleted unless the upload succeeded.
+    """
+    body = gzip.compress("".join(json.dumps(row, default=decimal_default) + "\n" for row in rows).encode("utf-8"))
+    day = datetime.now(timezone.utc).strftime('%Y/%m/%d')
+    key = f"{archive_prefix}/{form_template_id}/{day}/{uuid.uuid4()}.jsonl.gz"
+    s3.put_object(Bucket=archive_bucket, Key=key, Body=body, ContentEncoding='gzip', ContentType='application/x-ndjson')
+    with table.batch_writer() as batch:
+        for row in rows:
+            batch.delete_item(Key={'pk': row['pk'], 'sk': row['sk']})
+    logger.info(f"Archived {len(rows)} rows of form {form_template_id} to s3://{archive_bucket}/{key}")
+    return key
+
+
+def compact_form_template(form_template_id, now):
+    """
+    Archives the rows of versions submitted more than FORMS_ARCHIVE_AFTER_DAYS ago and
+    publishes the partition size, per template, as metrics. Started rows in the legacy
+    key format are migrated to the current one on the way.
+
+    Returns:
+    dict: rows, bytes, archived_versions and archived_rows
+    """
+    versions = defaultdict(list)
+    submitted_at = {}
+    rows = 0
+    size = 0
+    for item in read_partition(form_template_id):
+        legacy = migrate_legacy_form_version(item, table)
+        if legacy is not None:
+            # the migrated row is counted from the next run on
+            logger.info(f"Migrated legacy started row {item['sk']} to {legacy.sk}")
+            continue
+        rows += 1
+        size += len(item['pk']) + len(item['sk']) + len(str(item.get('data', '')))
+        try:
+            entity = decode(item['pk'], item['sk'])
+        except KeyFormatError:
+            logger.warning(f"Skipping row with an unrecognized key: {item['sk']}")
+            continue
+        if not isinstance(entity, (FormVersion, FormField)):
+            continue
+        version = (entity.citizen_id, entity.version_id)
+        versions[version].append(item)
+        if isinstance(entity, FormVersion) and item.get('data') == "SUBMITTED":
+            submitted_at[version] = int(item.get('submitted_at', 0))
+
+    due = [version for version, at in submitted_at.items() if now - at >= archive_after_seconds]
+    batch = []
+    archived_rows = 0
+    for version in due:
+        batch.extend(versions[version])
+        if len(batch) >= batch_rows:
+            archive_batch(form_template_id, batch)
+            archived_rows += len(batch)
+            batch = []
+    if batch:
+        archive_batch(form_template_id, batch)
+        archived_rows += len(batch)
+
+    for name, value, unit in (
+        ("FormPartitionItems", rows - archived_rows, MetricUnit.Count),
+        ("FormPartitionBytes", size, MetricUnit.Bytes),
+        ("FormDraftVersions", len(versions) - len(submitted_at), MetricUnit.Count),
+    ):
+        with single_metric(name=name, unit=unit, value=value) as metric:
+            metric.add_dimension(name="form_template_id", value=form_template_id)
+
+    return {"rows": rows, "bytes": size, "archived_versions": len(due), "archived_rows": archived_rows}
+
+
+@metrics.log_metrics(capture_cold_start_metric=True)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context(log_event=True)
+def lambda_handler(event, context):
+    """
+    This function compacts form template partitions on a schedule.
+
+    Draft versions that are never submitted expire through the table's TTL; this
+    archives submitted versions to S3 so the partitions only hold live data.
+
+    Parameters:
+    event (dict): The scheduled event
+    context (dict): additional context for the request
+
+    Returns:
+    response (dict): Per template compaction results
+    """
+    now = int(time.time())
+    results = {}
+    for form_template_id in list_form_templates():
+        results[form_template_id] = compact_form_template(form_template_id, now)
+        if context.get_remaining_time_in_millis() < 30000:
+            logger.warning("Stopping early, the remaining templates are compacted on the next run")
+            break
+    metrics.add_metric(name="FormVersionsArchived", unit=MetricUnit.Count,
+                       value=sum(result["archived_versions"] for result in results.values()))
+    logger.info(results)
+    return results
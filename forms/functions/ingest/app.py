@@ -12,7 +12,8 @@ from collections import defaultdict
 from aws_lambda_powertools import Metrics, Logger, Tracer
 
 # from model import get_garbage_route_by_district_id, write_bulk_waste_request
-from model import start_form_version, write_form_template_field, write_form_template, get_form_fields
+from model import start_form_version, write_form_template_field, write_form_template, write_form_template_schema, get_form_fields
+from schema import infer_schema, encode_schema
 
 
 logger = Logger()
@@ -23,9 +24,17 @@ table_name = os.environ['DDB_TABLE']
 table = boto3.resource('dynamodb').Table(table_name)
 
 textract = boto3.client('textract')
+s3 = boto3.client('s3')
 
 forms_bucket = os.environ['FORMS_INGEST_BUCKET']
 
+# analyze_document handles single page documents up to 10 MB in one call
+SYNC_MAX_BYTES = int(os.environ.get('TEXTRACT_SYNC_MAX_BYTES', str(10 * 1024 * 1024)))
+SYNC_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.tif', '.tiff')
+
+# the schema item holds every field; one row per field is only kept for older readers
+WRITE_FIELD_ROWS = os.environ.get('FORMS_WRITE_FIELD_ROWS', 'false').lower() == 'true'
+
 def create_new_form_template():
     """
     This function initializes a new form template in the application datastore.
@@ -62,39 +71,89 @@ def start_textract_analysis_job(s3_bucket, s3_key):
     )
     return response['JobId']
 
-def get_textract_result_or_status(job_id):
+def get_textract_result_or_status(job_id, next_token=None):
     """
-    This function starts the Amazon Textract job
+    This function gets the status of an Amazon Textract job, and one page of its blocks once done
 
     Parameters:
     job_id (str): The JobId for the Amazon Textract job
+    next_token (str): The token of the page of blocks to get
 
     Returns:
     response dict: The job response
     """
-    response = textract.get_document_analysis(
-        JobId=job_id,
-    )
+    kwargs = {"JobId": job_id}
+    if next_token:
+        kwargs["NextToken"] = next_token
+    response = textract.get_document_analysis(**kwargs)
     return response
 
-
-def wait_for_textract_result(job_id):
+def wait_for_textract_result(job_id, max_delay=5):
     """
-    This function loops until the job with id job_id is complete
+    This function polls, backing off from half a second, until the job with id job_id is complete
 
     Parameters:
     job_id (str): The JobId for the Amazon Textract job
 
     Returns:
-    response dict: The job response
+    blocks [dict]: The blocks of every result page
     """
+    delay = 0.5
     response = get_textract_result_or_status(job_id)
-    status = response['JobStatus']
-    if status == "IN_PROGRESS":
+    while response['JobStatus'] == "IN_PROGRESS":
         logger.info(f"Waiting for textract job_id: {job_id}")
-        time.sleep(2)
-        return (wait_for_textract_result(job_id))
-    return response
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+        response = get_textract_result_or_status(job_id)
+    if response['JobStatus'] != "SUCCEEDED":
+        raise Exception(f"Textract job {job_id} ended with status {response['JobStatus']}")
+
+    blocks = response['Blocks']
+    while 'NextToken' in response:
+        response = get_textract_result_or_status(job_id, response['NextToken'])
+        blocks += response['Blocks']
+    return blocks
+
+def use_sync_analysis(s3_key, size):
+    """
+    Single page documents within the synchronous API limits skip the async job. Page
+    counts are not known up front, so a multi-page PDF that gets here falls back to
+    the async path when analyze_document rejects it.
+    """
+    return s3_key.lower().endswith(SYNC_EXTENSIONS) and size <= SYNC_MAX_BYTES
+
+def analyze_document_blocks(s3_bucket, s3_key):
+    """
+    This function runs the Amazon Textract forms analysis, synchronously for small single page documents
+
+    Parameters:
+    s3_bucket (str): The S3 bucket storing the form template
+    s3_key (str): The S3 key for the template
+
+    Returns:
+    blocks [dict]: The Amazon Textract blocks of the document
+    """
+    size = s3.head_object(Bucket=s3_bucket, Key=s3_key)['ContentLength']
+    if use_sync_analysis(s3_key, size):
+        try:
+            response = textract.analyze_document(
+                Document={"S3Object": {
+                    "Bucket": s3_bucket,
+                    "Name": s3_key
+                }},
+                FeatureTypes=["FORMS"]
+            )
+            logger.info(f"Analyzed {s3_key} synchronously, {response['DocumentMetadata']['Pages']} page(s)")
+            return response['Blocks']
+        except (textract.exceptions.UnsupportedDocumentException,
+                textract.exceptions.DocumentTooLargeException) as e:
+            logger.info(f"Falling back to async analysis for {s3_key}: {e}")
+
+    job_id = start_textract_analysis_job(
+        s3_bucket=s3_bucket,
+        s3_key=s3_key
+    )
+    return wait_for_textract_result(job_id)
 
 def find_value_block(key_block, value_map):
     for relationship in key_block['Relationships']:
@@ -127,16 +186,29 @@ def get_form_fields_from_doc(form_location_s3_bucket, form_location_s3_key):
     form_location_s3_key (str): The S3 key for the template
 
     Returns:
-    fields [str]: The fields in the form
+    fields [dict]: The fields in the form, see extract_form_fields
     """
-    job_id = start_textract_analysis_job(
-        s3_bucket=form_location_s3_bucket,
-        s3_key=form_location_s3_key
-    )
-    textract_response = wait_for_textract_result(job_id)
+    blocks = analyze_document_blocks(form_location_s3_bucket, form_location_s3_key)
+    return extract_form_fields(blocks)
+
+def has_selection_element(block, blocks_map):
+    for relationship in block.get('Relationships', []):
+        if relationship['Type'] == 'CHILD':
+            for child_id in relationship['Ids']:
+                if blocks_map[child_id]['BlockType'] == 'SELECTION_ELEMENT':
+                    return True
+    return False
+
+def extract_form_fields(blocks):
+    """
+    This function extracts the form keys from Amazon Textract blocks, with the details schema inference needs.
 
-    blocks = textract_response['Blocks']
+    Parameters:
+    blocks [dict]: The Amazon Textract blocks
 
+    Returns:
+    fields [dict]: name (raw key text), values and has_selection of each key, in document order
+    """
     key_map = {}
     value_map = {}
     block_map = {}
@@ -150,13 +222,15 @@ def get_form_fields_from_doc(form_location_s3_bucket, form_location_s3_key):
                 value_map[block_id] = block
 
     kvs = defaultdict(list)
+    selections = defaultdict(bool)
     for block_id, key_block in key_map.items():
         value_block = find_value_block(key_block, value_map)
         key = get_text(key_block, block_map)
         val = get_text(value_block, block_map)
         kvs[key].append(val)
+        selections[key] |= has_selection_element(value_block, block_map)
 
-    return list(kvs.keys())
+    return [{"name": key, "values": values, "has_selection": selections[key]} for key, values in kvs.items()]
 
 
 @metrics.log_metrics(capture_cold_start_metric=True)
@@ -189,21 +263,25 @@ def lambda_handler(event, context):
         logger.info("Found fields: {form_fields}")
         logger.info(form_fields)
 
-        for i, field in enumerate(form_fields):
-            logger.info(f"Adding field: {field}")
-            write_form_template_field(
-                form_template_id=form_template_id,
-                field_id=i,
-                data=json.dumps({
-                    "field_name": field,
-                    "is_required": False
-                }),
-                table=table
-            )
-
-
-
-
-
-
-
+        schema = infer_schema(form_fields)
+        logger.info(f"Inferred schema version {schema['v']} with {len(schema['fields'])} fields")
+        write_form_template_schema(
+            form_template_id=form_template_id,
+            data=encode_schema(schema),
+            schema_version=schema['v'],
+            table=table
+        )
+
+        if WRITE_FIELD_ROWS:
+            for field in schema['fields']:
+                logger.info(f"Adding field: {field['name']}")
+                write_form_template_field(
+                    form_template_id=form_template_id,
+                    field_id=field['id'],
+                    data=json.dumps({
+                        "field_name": field['name'],
+                        "field_type": field['type'],
+                        "is_required": field['required']
+                    }),
+                    table=table
+                )
@@ -0,0 +1,81 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import re
+
+
+SCHEMA_VERSION = 1
+
+# checked in order, the first match wins; checkbox comes from the value block instead
+TYPE_PATTERNS = (
+    ("signature", re.compile(r"\bsign(ature|ed)?\b")),
+    ("date", re.compile(r"\b(date|dob|birth|day)\b")),
+    ("number", re.compile(r"\b(number|no|amount|zip|postal|phone|age|count|total|qty|quantity|#)\b|#")),
+)
+
+
+def normalize_field_name(text):
+    """
+    Cleans a Textract key: collapses whitespace and drops trailing colons, dots and selection marks.
+    """
+    name = re.sub(r"\s+", " ", text or "").strip()
+    name = re.sub(r"^(X\s+)+|(\s+X)+$", "", name)
+    return name.rstrip(" :.").strip()
+
+
+def field_id_for(name, taken):
+    """
+    Derives a stable snake_case id from the field name, suffixed when the name repeats in the form.
+    """
+    base = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "field"
+    field_id = base
+    n = 2
+    while field_id in taken:
+        field_id = f"{base}_{n}"
+        n += 1
+    taken.add(field_id)
+    return field_id
+
+
+def infer_field_type(name, has_selection=False):
+    if has_selection:
+        return "checkbox"
+    lowered = name.lower()
+    for field_type, pattern in TYPE_PATTERNS:
+        if pattern.search(lowered):
+            return field_type
+    return "text"
+
+
+def infer_schema(fields):
+    """
+    Builds the template schema from the fields found by the parsing engine.
+
+    Parameters:
+    fields ([dict]): name and has_selection of each form key, in document order
+
+    Returns:
+    dict: {"v": version, "fields": [{"id", "name", "type", "required"}]}
+    """
+    taken = set()
+    schema_fields = []
+    for field in fields:
+        name = normalize_field_name(field["name"])
+        if not name:
+            continue
+        schema_fields.append({
+            "id": field_id_for(name, taken),
+            "name": name,
+            "type": infer_field_type(name, field.get("has_selection", False)),
+            "required": False,
+        })
+    return {"v": SCHEMA_VERSION, "fields": schema_fields}
+
+
+def encode_schema(schema):
+    return json.dumps(schema, separators=(",", ":"))
+
+
+def decode_schema(data):
+    return json.loads(data)
@@ -0,0 +1,126 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Local benchmark for the knowledge base vector index profiles.
+
+Measures recall@k of each profile against an exact fp32 numpy brute force search,
+next to the estimated native memory of the index. Quantization error is always
+measured; when hnswlib is installed the HNSW graph (m, ef_construction, ef_search)
+is built as well so that graph approximation error is included.
+
+    python knowledgebase/benchmarks/index_profiles_benchmark.py --vectors 20000 --queries 200
+    python knowledgebase/benchmarks/index_profiles_benchmark.py --embeddings corpus.npy
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'functions', 'oas_index_custom_resource_handler'))
+
+from index_profiles import PROFILES, estimate_memory_bytes  # noqa: E402
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def synthetic_embeddings(num_vectors, dimension, num_clusters=64, seed=7):
+    """
+    Clustered, unit normalized vectors, closer to real embeddings than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, num_clusters, num_vectors)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((num_vectors, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def quantize(vectors, quantization):
+    """
+    Returns the vectors as the index would see them after quantization, as float32.
+    """
+    if quantization == "fp16":
+        return vectors.astype(np.float16).astype(np.float32)
+    return vectors
+
+
+def brute_force_top_k(corpus, queries, k, batch_size=256):
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), batch_size):
+        scores = queries[start:start + batch_size] @ corpus.T
+        top = np.argpartition(-scores, k, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        results[start:start + batch_size] = np.take_along_axis(top, order, axis=1)
+    return results
+
+
+def hnsw_top_k(corpus, queries, k, profile):
+    index = hnswlib.Index(space='ip', dim=corpus.shape[1])
+    index.init_index(max_elements=len(corpus), ef_construction=profile['ef_construction'], M=profile['m'])
+    index.add_items(corpus)
+    index.set_ef(max(profile['ef_search'], k))
+    labels, _ = index.knn_query(queries, k=k)
+    return labels
+
+
+def recall_at_k(expected, actual):
+    hits = sum(len(set(e).intersection(a)) for e, a in zip(expected, actual))
+    return hits / expected.size
+
+
+def run(args):
+    embeddings = np.load(args.embeddings).astype(np.float32) if args.embeddings else None
+    rows = []
+    for name, profile in PROFILES.items():
+        if embeddings is not None:
+            if embeddings.shape[1] != profile['dimension']:
+                print(f"Skipping {name}: embeddings have dimension {embeddings.shape[1]}, profile expects {profile['dimension']}")
+                continue
+            vectors = embeddings
+        else:
+            vectors = synthetic_embeddings(args.vectors + args.queries, profile['dimension'])
+        corpus, queries = vectors[:-args.queries], vectors[-args.queries:]
+
+        expected = brute_force_top_k(corpus, queries, args.k)
+        quantized = quantize(corpus, profile['quantization'])
+
+        started = time.perf_counter()
+        if hnswlib is not None:
+            actual = hnsw_top_k(quantized, queries, args.k, profile)
+        else:
+            actual = brute_force_top_k(quantized, queries, args.k)
+        elapsed = time.perf_counter() - started
+
+        rows.append((
+            name,
+            profile['dimension'],
+            profile['quantization'],
+            recall_at_k(expected, actual),
+            estimate_memory_bytes(profile, len(corpus)) / 1024 ** 2,
+            estimate_memory_bytes(profile, args.projected_vectors) / 1024 ** 3,
+            elapsed,
+        ))
+
+    mode = "hnsw" if hnswlib is not None else "brute force (install hnswlib to include graph error)"
+    print(f"search mode: {mode}, k={args.k}")
+    print(f"{'profile':<10} {'dim':>5} {'quant':>6} {'recall':>7} {'mem MiB':>9} "
+          f"{'mem GiB @' + format(args.projected_vectors, ','):>18} {'seconds':>8}")
+    for name, dimension, quantization, recall, mem, projected, elapsed in rows:
+        print(f"{name:<10} {dimension:>5} {quantization:>6} {recall:>7.3f} {mem:>9.1f} {projected:>18.2f} {elapsed:>8.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', type=int, default=20000, help='synthetic corpus size')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--embeddings', help='.npy file of real embeddings, the last --queries rows are used as queries')
+    parser.add_argument('--projected-vectors', type=int, default=10_000_000,
+                        help='corpus size used for the projected memory column')
+    run(parser.parse_args())
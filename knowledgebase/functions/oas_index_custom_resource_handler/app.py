@@ -2,18 +2,228 @@
 # SPDX-License-Identifier: MIT-0
 
 import json
-import boto3
-import cfnresponse
 import os
 import time
 
-from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth
+import boto3
+import cfnresponse
+
+from opensearch_client import get_client
+
+from index_profiles import resolve_profile, build_index_settings
+from index_rebuild import drop_indices, index_versions, serving_indices, swap_alias, versioned_index_name
+
+READINESS_INITIAL_DELAY = 1
+READINESS_MAX_DELAY = 16
+# leave enough of the invocation to send the response to cloudformation
+READINESS_DEADLINE_MARGIN_MS = 10000
+REBUILD_STATE_MACHINE_ARN = os.environ.get('REBUILD_STATE_MACHINE_ARN')
+
+
+def mappings_match(expected, actual):
+    """
+    Checks that an existing index mapping is compatible with the one we would create.
+
+    Parameters:
+    expected (dict): The mappings block we would create the index with
+    actual (dict): The mappings block returned by get_mapping
+
+    Returns:
+    bool: True when every expected field exists with the same definition
+    """
+    actual_properties = actual.get('properties', {})
+    for field, definition in expected['properties'].items():
+        existing = actual_properties.get(field)
+        if existing is None or existing.get('type') != definition['type']:
+            return False
+        if definition['type'] == 'knn_vector':
+            if int(existing.get('dimension', 0)) != definition['dimension']:
+                return False
+            for key in ('name', 'engine', 'space_type'):
+                if existing.get('method', {}).get(key) != definition['method'][key]:
+                    return False
+            if existing.get('data_type', 'float') != definition.get('data_type', 'float'):
+                return False
+    return True
+
+
+def get_index_mappings(client, index_name):
+    response = client.indices.get_mapping(index=index_name)
+    # the response is keyed by the index name
+    return next(iter(response.values()))['mappings']
+
+
+def index_is_ready(client, index_name, expected_mappings):
+    """
+    An index is usable once it exists, its mapping is visible and it accepts searches.
+    """
+    try:
+        if not client.indices.exists(index=index_name):
+            return False
+        if not mappings_match(expected_mappings, get_index_mappings(client, index_name)):
+            return False
+        client.count(index=index_name)
+        return True
+    except Exception as err:
+        print(f"Index {index_name} not ready yet: {err}")
+        return False
+
+
+def wait_for_index_ready(client, index_name, expected_mappings, deadline):
+    """
+    Polls the index with exponential backoff until it is ready or the deadline passes.
+
+    Parameters:
+    client (OpenSearch): The opensearch client
+    index_name (str): The index to check
+    expected_mappings (dict): The mappings the index was created with
+    deadline (float): time.monotonic() value after which we give up
+
+    Returns:
+    float: Seconds spent waiting
+    """
+    started = time.monotonic()
+    delay = READINESS_INITIAL_DELAY
+    while not index_is_ready(client, index_name, expected_mappings):
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(f"Index {index_name} was not ready after {time.monotonic() - started:.1f} seconds")
+        time.sleep(delay)
+        delay = min(delay * 2, READINESS_MAX_DELAY)
+    return time.monotonic() - started
+
 
-print("Setting up auth")
-region = os.environ['AWS_REGION']
-service = 'aoss'
-credentials = boto3.Session().get_credentials()
-awsauth = AWSV4SignerAuth(credentials, region, service)
+def create_index(client, index_name, index_settings, deadline):
+    """
+    Creates the first versioned index behind the index_name alias, or accepts an
+    existing index with matching mappings, then waits for it to be usable.
+    """
+    if serving_indices(client, index_name):
+        if not mappings_match(index_settings['mappings'], get_index_mappings(client, index_name)):
+            raise Exception(f"Index {index_name} already exists with different mappings")
+        print(f"Index {index_name} already exists with matching mappings")
+        response = {'acknowledged': True, 'index': index_name, 'existing': True}
+    else:
+        response = client.indices.create(
+            index=versioned_index_name(index_name, 1),
+            body=json.dumps({**index_settings, "aliases": {index_name: {}}})
+        )
+    waited = wait_for_index_ready(client, index_name, index_settings['mappings'], deadline)
+    print(f"Index {index_name} ready after {waited:.1f} seconds")
+    return response
+
+
+def plan_update(index_settings, actual_mappings, embedding_model, old_embedding_model):
+    """
+    Decides how an index takes new settings.
+
+    Returns:
+    str: unchanged; add, when only fields are missing; reindex, when a field or the
+    vector method changed but the vectors can be copied; or replace, when the model
+    or dimension changed and every document has to be embedded again
+    """
+    expected = index_settings['mappings']['properties']
+    actual = actual_mappings.get('properties', {})
+    if embedding_model != old_embedding_model or \
+            int(actual.get('vector', {}).get('dimension', 0)) != expected['vector']['dimension']:
+        return "replace"
+    changed = [
+        field for field, definition in expected.items()
+        if field in actual and not mappings_match({'properties': {field: definition}}, actual_mappings)
+    ]
+    if changed or actual['vector'].get('method') != expected['vector']['method']:
+        return "reindex"
+    if any(field not in actual for field in expected):
+        return "add"
+    return "unchanged"
+
+
+def start_rebuild(index_name, old_indices, new_index, os_url):
+    """
+    Starts the state machine that reindexes into new_index and swaps the alias. The
+    execution is named after the new index, so a retried request starts it once.
+    """
+    response = boto3.client('stepfunctions').start_execution(
+        stateMachineArn=REBUILD_STATE_MACHINE_ARN,
+        name=new_index,
+        input=json.dumps({
+            'os_url': os_url, 'index_name': index_name, 'old_indices': old_indices, 'new_index': new_index,
+        }),
+    )
+    print(f"Rebuilding {old_indices} into {new_index} with {response['executionArn']}")
+    return response['executionArn']
+
+
+def stop_rebuild(new_index):
+    execution_arn = REBUILD_STATE_MACHINE_ARN.replace(':stateMachine:', ':execution:') + f":{new_index}"
+    boto3.client('stepfunctions').stop_execution(executionArn=execution_arn, cause="Index settings changed again")
+
+
+def update_index(client, index_name, index_settings, embedding_model, old_embedding_model, os_url, deadline):
+    """
+    Applies new index settings without taking search down.
+
+    Missing fields are added to the mapping in place. Any other change builds the next
+    versioned index: when the vectors can be kept, the rebuild state machine copies the
+    documents into it and swaps the alias, which takes longer than a custom resource
+    may run, so the update completes while the old index keeps serving. A new model or
+    dimension makes the old vectors useless, so the empty index takes the alias right
+    away and the knowledge base, replaced with the new model, ingests into it.
+
+    A version that is not behind the alias is a rebuild still running. Rolling back to
+    the serving settings stops it, and any other update waits for it to finish.
+    """
+    current = serving_indices(client, index_name)
+    if not current:
+        return create_index(client, index_name, index_settings, deadline)
+
+    building = sorted(set(index_versions(client, index_name).values()) - set(current))
+    plan = plan_update(index_settings, get_index_mappings(client, index_name), embedding_model, old_embedding_model)
+    if building:
+        if plan != "unchanged":
+            raise Exception(f"Index {index_name} is still being rebuilt into {building}, update again once it is done")
+        for new_index in building:
+            stop_rebuild(new_index)
+        drop_indices(client, building)
+        print(f"Stopped rebuilding {index_name} into {building}")
+        return {'acknowledged': True, 'index': index_name, 'abandoned': building}
+
+    if plan == "unchanged":
+        print(f"Index settings for {index_name} unchanged")
+        return {'acknowledged': True, 'index': index_name, 'unchanged': True}
+    if plan == "add":
+        actual = get_index_mappings(client, index_name).get('properties', {})
+        missing = {field: definition for field, definition in index_settings['mappings']['properties'].items()
+                   if field not in actual}
+        print(f"Adding fields {list(missing)} to {index_name}")
+        client.indices.put_mapping(index=index_name, body={"properties": missing})
+        waited = wait_for_index_ready(client, index_name, index_settings['mappings'], deadline)
+        print(f"Index {index_name} ready after {waited:.1f} seconds")
+        return {'acknowledged': True, 'index': index_name, 'added': sorted(missing)}
+
+    new_index = versioned_index_name(index_name, max(index_versions(client, index_name), default=0) + 1)
+    client.indices.create(index=new_index, body=json.dumps(index_settings))
+    waited = wait_for_index_ready(client, new_index, index_settings['mappings'], deadline)
+    print(f"Index {new_index} ready after {waited:.1f} seconds")
+    if plan == "replace":
+        swap_alias(client, index_name, current, new_index)
+        print(f"Replaced {current} with the empty {new_index}, the knowledge base ingests into it")
+        return {'acknowledged': True, 'index': new_index, 'replaced': current}
+    try:
+        execution_arn = start_rebuild(index_name, current, new_index, os_url)
+    except Exception:
+        drop_indices(client, [new_index])
+        raise
+    return {'acknowledged': True, 'index': new_index, 'rebuilding': current, 'execution': execution_arn}
+
+
+def delete_index(client, index_name):
+    """
+    Drops every index behind index_name, including a rebuild still running.
+    """
+    indices = sorted(set(serving_indices(client, index_name)) | set(index_versions(client, index_name).values()))
+    if not indices:
+        return {'acknowledged': True, 'index': index_name, 'missing': True}
+    return client.indices.delete(index=",".join(indices), ignore_unavailable=True)
 
 
 def lambda_handler(event, context):
@@ -25,74 +235,46 @@ def lambda_handler(event, context):
     index_name = props['index_name']
     print(f"{action} {index_name} on {os_url}")
 
-    host = os_url.replace("https://", "")
-
-    print(f"using hostname: {host}")
-
     print(f"Connecting to opensearch at {os_url}")
 
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_compress=True,  # enables gzip compression for request bodies
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection
-    )
+    client = get_client(os_url)
 
     print("got connection")
 
-    index_settings = {
-        "settings": {
-            "index.knn": "true"
-        },
-        "mappings": {
-            "properties": {
-                "vector": {
-                    "type": "knn_vector",
-                    "dimension": 1536,
-                    "method": {
-                        "name": "hnsw",
-                        "engine": "faiss",
-                        "space_type": "innerproduct",
-                        "parameters": {
-                            "ef_construction": 512,
-                            "m": 16
-                        },
-                    },
-                },
-                "text": {
-                    "type": "text"
-                },
-                "text-metadata": {
-                    "type": "text"
-                }
-            }
-        }
-    }
+    deadline = time.monotonic() + (context.get_remaining_time_in_millis() - READINESS_DEADLINE_MARGIN_MS) / 1000
 
     try:
         if action == "Create":
-            response = client.indices.create(
-                index=index_name,
-                body=json.dumps(index_settings)
-            )
-            time.sleep(120)
+            profile = resolve_profile(props)
+            print(f"Using index profile: {profile}")
+            index_settings = build_index_settings(profile)
+            response = create_index(client, index_name, index_settings, deadline)
+        elif action == "Update":
+            old_props = event.get('OldResourceProperties', {})
+            profile = resolve_profile(props)
+            index_settings = build_index_settings(profile)
+            if old_props.get('index_name') != index_name:
+                # a new physical resource, cloudformation deletes the old one after the update
+                response = create_index(client, index_name, index_settings, deadline)
+            else:
+                # stacks from before profiles carried a model embedded with titan v1
+                old_embedding_model = old_props.get('embedding_model') or 'amazon.titan-embed-text-v1'
+                response = update_index(
+                    client, index_name, index_settings, profile['embedding_model'], old_embedding_model, os_url,
+                    deadline
+                )
         elif action == "Delete":
-            response = client.indices.delete(
-                index=index_name,
-            )
+            response = delete_index(client, index_name)
         event['response'] = response
     except Exception as err:
         print(err)
         cfnresponse.send(event, context, cfnresponse.FAILED, "FAILED", f"oas_index_{index_name}")
         return {
             'statusCode': 500,
-            'body': json.dumps({'message': 'Index create command failed'})
+            'body': json.dumps({'message': f'Index {action} command failed'})
         }
 
     print(response)
-    # it can take a minute for the index to be ready
     cfnresponse.send(event, context, cfnresponse.SUCCESS, response, f"oas_index_{index_name}")
     return {
         'statusCode': 200,
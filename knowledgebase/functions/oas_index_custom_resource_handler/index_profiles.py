@@ -0,0 +1,168 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import copy
+
+
+QUANTIZATIONS = ("none", "fp16")
+
+# bytes used per vector component for each quantization
+BYTES_PER_DIMENSION = {
+    "none": 4,
+    "fp16": 2,
+}
+
+# the embedding models a knowledge base can write to these indices with, and the
+# dimensions each can emit; both emit float32 vectors
+EMBEDDING_MODELS = {
+    "amazon.titan-embed-text-v1": (1536,),
+    "amazon.titan-embed-text-v2:0": (256, 512, 1024),
+}
+
+PROFILES = {
+    # the original index definition, fp32 vectors from amazon.titan-embed-text-v1
+    "default": {
+        "embedding_model": "amazon.titan-embed-text-v1",
+        "dimension": 1536,
+        "engine": "faiss",
+        "space_type": "innerproduct",
+        "m": 16,
+        "ef_construction": 512,
+        "ef_search": 512,
+        "quantization": "none",
+    },
+    # halves vector memory with faiss scalar quantization, recall is close to fp32
+    "balanced": {
+        "embedding_model": "amazon.titan-embed-text-v1",
+        "dimension": 1536,
+        "engine": "faiss",
+        "space_type": "innerproduct",
+        "m": 16,
+        "ef_construction": 256,
+        "ef_search": 256,
+        "quantization": "fp16",
+    },
+    # titan v2 at 1024 dimensions with fp16 scalar quantization, a third of the default's vector memory
+    "titanv2": {
+        "embedding_model": "amazon.titan-embed-text-v2:0",
+        "dimension": 1024,
+        "engine": "faiss",
+        "space_type": "innerproduct",
+        "m": 16,
+        "ef_construction": 256,
+        "ef_search": 256,
+        "quantization": "fp16",
+    },
+}
+
+# metadata attributes from the .metadata.json sidecars that the document search tool
+# filters on, mapped as they would be dynamically so existing indices keep matching
+FILTER_FIELDS = ("department", "document_type")
+FILTER_FIELD_MAPPING = {
+    "type": "text",
+    "fields": {
+        "keyword": {"type": "keyword", "ignore_above": 256}
+    }
+}
+
+INT_FIELDS = ("dimension", "m", "ef_construction", "ef_search")
+
+
+def resolve_profile(props):
+    """
+    Builds the index profile from the custom resource properties.
+
+    A named profile is picked with `index_profile` and any of its fields can be
+    overridden by a property with the same name. CloudFormation passes every
+    property as a string, so numeric fields are converted here. A dimension the
+    embedding model cannot emit is rejected.
+
+    Parameters:
+    props (dict): The ResourceProperties of the custom resource
+
+    Returns:
+    dict: The resolved profile
+    """
+    profile_name = props.get('index_profile', 'default')
+    if profile_name not in PROFILES:
+        raise Exception(f"Unknown index profile {profile_name}, expected one of {list(PROFILES)}")
+    profile = copy.deepcopy(PROFILES[profile_name])
+    for field in profile:
+        if props.get(field) not in (None, ''):
+            profile[field] = props[field]
+    for field in INT_FIELDS:
+        profile[field] = int(profile[field])
+    if profile['quantization'] not in QUANTIZATIONS:
+        raise Exception(f"Unknown quantization {profile['quantization']}, expected one of {QUANTIZATIONS}")
+    if profile['quantization'] == 'fp16' and profile['engine'] != 'faiss':
+        raise Exception("fp16 scalar quantization is only supported by the faiss engine")
+    dimensions = EMBEDDING_MODELS.get(profile['embedding_model'])
+    if dimensions is None:
+        raise Exception(f"Unknown embedding model {profile['embedding_model']}, expected one of {list(EMBEDDING_MODELS)}")
+    if profile['dimension'] not in dimensions:
+        raise Exception(
+            f"{profile['embedding_model']} emits {' or '.join(map(str, dimensions))} dimensions, "
+            f"the knowledge base could not write to an index of dimension {profile['dimension']}"
+        )
+    return profile
+
+
+def build_index_settings(profile):
+    """
+    Builds the index body for a profile.
+
+    Returns:
+    dict: The settings and mappings for indices.create
+    """
+    parameters = {
+        "ef_construction": profile['ef_construction'],
+        "m": profile['m'],
+    }
+    if profile['engine'] == 'faiss':
+        parameters["ef_search"] = profile['ef_search']
+    if profile['quantization'] == 'fp16':
+        parameters["encoder"] = {
+            "name": "sq",
+            "parameters": {"type": "fp16"}
+        }
+
+    vector = {
+        "type": "knn_vector",
+        "dimension": profile['dimension'],
+        "method": {
+            "name": "hnsw",
+            "engine": profile['engine'],
+            "space_type": profile['space_type'],
+            "parameters": parameters,
+        },
+    }
+
+    settings = {"index.knn": "true"}
+    if profile['engine'] != 'faiss':
+        settings["index.knn.algo_param.ef_search"] = profile['ef_search']
+
+    return {
+        "settings": settings,
+        "mappings": {
+            "properties": {
+                "vector": vector,
+                "text": {
+                    "type": "text"
+                },
+                # the knowledgebase writes its own metadata as a JSON string into this field
+                "metadata": {
+                    "type": "text",
+                    "index": False
+                },
+                **{field: FILTER_FIELD_MAPPING for field in FILTER_FIELDS},
+            }
+        }
+    }
+
+
+def estimate_memory_bytes(profile, num_vectors):
+    """
+    Estimates native memory for an HNSW graph, 1.1 * (bytes_per_vector + 8 * m) * num_vectors.
+    """
+    bytes_per_vector = BYTES_PER_DIMENSION[profile['quantization']] * profile['dimension']
+    return int(1.1 * (bytes_per_vector + 8 * profile['m']) * num_vectors)
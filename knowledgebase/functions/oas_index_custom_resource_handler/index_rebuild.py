@@ -0,0 +1,129 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Rebuilds the knowledge base index behind its alias without taking search down.
+
+The index name the knowledge base and the retrieval tool use is an alias over a
+versioned index, <index_name>_v<N>. The custom resource creates the next version
+and starts the rebuild state machine, which steps through this handler: a sliced,
+server side reindex into the new version, polled until it finishes, then a single
+_aliases call that moves the alias and drops the old index. The old version keeps
+serving until the swap, and a failed rebuild drops the new version instead.
+"""
+
+import re
+
+from opensearch_client import get_client
+
+
+def versioned_index_name(index_name, version):
+    return f"{index_name}_v{version}"
+
+
+def index_versions(client, index_name):
+    """
+    The versioned indices of index_name, serving or being built, by version.
+    """
+    pattern = re.compile(rf"{re.escape(index_name)}_v(\d+)")
+    indices = client.indices.get(index=f"{index_name}_v*", allow_no_indices=True)
+    return {int(m.group(1)): m.group(0) for m in map(pattern.fullmatch, indices) if m}
+
+
+def serving_indices(client, index_name):
+    """
+    The indices index_name resolves to: the alias targets or, for stacks created
+    before indices were versioned, the concrete index itself.
+    """
+    if client.indices.exists_alias(name=index_name):
+        return sorted(client.indices.get_alias(name=index_name))
+    if client.indices.exists(index=index_name):
+        return [index_name]
+    return []
+
+
+def start_reindex(client, source_indices, dest_index):
+    """
+    Starts a sliced, server side reindex of every document into dest_index.
+
+    Returns:
+    str: The id of the reindex task
+    """
+    response = client.reindex(
+        body={
+            "source": {"index": ",".join(source_indices)},
+            "dest": {"index": dest_index}
+        },
+        slices="auto",
+        refresh=True,
+        wait_for_completion=False
+    )
+    print(f"Reindexing {source_indices} into {dest_index} with task {response['task']}")
+    return response['task']
+
+
+def reindex_completed(client, task_id):
+    """
+    Checks the reindex task, raising when it finished with failures.
+
+    Returns:
+    bool: True once the task has finished
+    """
+    task = client.tasks.get(task_id=task_id)
+    if not task.get('completed'):
+        status = task.get('task', {}).get('status', {})
+        print(f"Reindex task {task_id}: {status.get('created', 0)} of {status.get('total', '?')} documents")
+        return False
+    result = task.get('response', {})
+    if task.get('error') or result.get('failures'):
+        raise Exception(f"Reindex task {task_id} failed: {task.get('error') or result['failures']}")
+    print(f"Reindex task {task_id} copied {result.get('total')} documents")
+    return True
+
+
+def swap_alias(client, index_name, old_indices, new_index):
+    """
+    Points the index_name alias at new_index and drops the old indices in one _aliases
+    call, so index_name resolves to exactly one index at every moment. A legacy
+    concrete index named index_name is replaced by the alias in the same call.
+    """
+    actions = [{"remove_index": {"index": old_index}} for old_index in old_indices]
+    actions.append({"add": {"index": new_index, "alias": index_name}})
+    return client.indices.update_aliases(body={"actions": actions})
+
+
+def drop_indices(client, indices):
+    if indices:
+        client.indices.delete(index=",".join(indices), ignore_unavailable=True)
+
+
+def lambda_handler(event, context):
+    """
+    One step of the rebuild state machine.
+
+    The input carries os_url, index_name, old_indices, new_index and step: reindex
+    starts the copy, check polls it, swap moves the alias and abandon drops the new
+    index after a failed step.
+
+    Returns:
+    dict: For reindex and check, {"task_id": str, "completed": bool}
+    """
+    step = event['step']
+    client = get_client(event['os_url'])
+    index_name, old_indices, new_index = event['index_name'], event['old_indices'], event['new_index']
+    print(f"{step} {old_indices} -> {new_index} behind {index_name}")
+
+    if step == "reindex":
+        return {"task_id": start_reindex(client, old_indices, new_index), "completed": False}
+    if step == "check":
+        task_id = event['reindex']['task_id']
+        return {"task_id": task_id, "completed": reindex_completed(client, task_id)}
+    if step == "swap":
+        swap_alias(client, index_name, old_indices, new_index)
+        return {"index": new_index, "replaced": old_indices}
+    if step == "abandon":
+        # only an index the alias does not point at yet can be dropped
+        if new_index not in serving_indices(client, index_name):
+            drop_indices(client, [new_index])
+        return {"index": new_index, "dropped": True}
+    raise Exception(f"Unknown rebuild step {step}")
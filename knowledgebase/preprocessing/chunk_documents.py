@@ -0,0 +1,320 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Preprocesses knowledge base PDFs into deduplicated, section aligned chunks.
+
+Text is streamed from each PDF page by page and split on section headings, long
+sections are cut into overlapping windows, and identical chunks across documents
+are stored once. The chunks are written to a compact JSONL file and, with
+--bucket, uploaded under chunks/ as one text object per chunk with a
+.metadata.json sidecar. A separate data source embeds chunks/ without chunking
+again, and the raw copies of the documents under documents/ are removed. Objects
+are content addressed, so re-running only uploads new chunks, and the chunks a
+document no longer produces are deleted.
+
+    python knowledgebase/preprocessing/chunk_documents.py assets --output chunks.jsonl
+    python knowledgebase/preprocessing/chunk_documents.py assets --bucket my-kb-bucket --department Parks
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+DEFAULT_MAX_WORDS = 300
+DEFAULT_OVERLAP_WORDS = 50
+# the chunks and the raw documents are read by separate knowledge base data sources
+CHUNK_PREFIX = "chunks/"
+DOCUMENTS_PREFIX = "documents/"
+# maps each document to the hashes of its chunks, outside both data source prefixes; the
+# sample data deployment reads it to leave the chunked documents out of documents/
+CHUNK_INDEX_KEY = "chunk-index.json"
+
+HEADING_PATTERN = re.compile(
+    r"^(?:(?:section|article|chapter)\s+\S+.*|\d+(?:\.\d+)*\.?\s+[A-Z].{0,80}|[A-Z][A-Z0-9 ,&'/-]{3,80})$",
+    re.IGNORECASE
+)
+
+
+def is_heading(line):
+    line = line.strip()
+    if not line or len(line) > 90 or line.endswith(('.', ',', ';')):
+        return False
+    # numbered and keyword headings match case insensitively, bare headings must be upper case
+    if re.match(r"^(?:section|article|chapter|\d)", line, re.IGNORECASE):
+        return bool(HEADING_PATTERN.match(line))
+    return line.isupper() and bool(HEADING_PATTERN.match(line))
+
+
+def stream_pages(path):
+    """
+    Yields (page_number, text) one page at a time, so large documents are never fully in memory.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    for page_number, page in enumerate(reader.pages, start=1):
+        yield page_number, page.extract_text() or ''
+
+
+def stream_sections(pages):
+    """
+    Groups page text into (section_title, first_page, words) by heading lines.
+    """
+    title, first_page, words = None, 1, []
+    for page_number, text in pages:
+        for line in text.splitlines():
+            if is_heading(line):
+                if words:
+                    yield title, first_page, words
+                title, first_page, words = line.strip(), page_number, []
+            else:
+                if not words:
+                    first_page = page_number
+                words.extend(line.split())
+    if words:
+        yield title, first_page, words
+
+
+def window(words, max_words, overlap_words):
+    if len(words) <= max_words:
+        yield words
+        return
+    step = max_words - overlap_words
+    for start in range(0, len(words), step):
+        yield words[start:start + max_words]
+        if start + max_words >= len(words):
+            break
+
+
+def content_hash(text):
+    normalized = " ".join(text.lower().split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def chunk_document(path, max_words=DEFAULT_MAX_WORDS, overlap_words=DEFAULT_OVERLAP_WORDS, pages=None):
+    """
+    Chunks one document.
+
+    Parameters:
+    path (str): The PDF path
+    max_words (int): The maximum words per chunk
+    overlap_words (int): Words repeated between consecutive chunks of one section
+    pages (iterable): Optional (page_number, text) pairs, read from the PDF when omitted
+
+    Returns:
+    [dict]: Chunks with hash, text, source, section and page
+    """
+    if overlap_words >= max_words:
+        raise ValueError("overlap_words must be smaller than max_words")
+    source = os.path.basename(path)
+    chunks = []
+    for title, page, words in stream_sections(pages if pages is not None else stream_pages(path)):
+        for piece in window(words, max_words, overlap_words):
+            text = " ".join(piece)
+            chunks.append({
+                "hash": content_hash(text),
+                "text": text,
+                "source": source,
+                "section": title,
+                "page": page,
+            })
+    return chunks
+
+
+def _chunk_document_args(args):
+    return chunk_document(*args)
+
+
+def chunk_corpus(paths, max_words=DEFAULT_MAX_WORDS, overlap_words=DEFAULT_OVERLAP_WORDS, max_workers=None):
+    """
+    Chunks documents in a process pool and deduplicates identical chunks across documents.
+
+    Returns:
+    ([dict], dict): The unique chunks, and stats with total and duplicate counts
+    """
+    unique = {}
+    total = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        work = [(path, max_words, overlap_words) for path in paths]
+        for chunks in executor.map(_chunk_document_args, work):
+            for chunk in chunks:
+                total += 1
+                existing = unique.get(chunk['hash'])
+                if existing is None:
+                    unique[chunk['hash']] = {**chunk, "sources": [chunk['source']]}
+                elif chunk['source'] not in existing['sources']:
+                    existing['sources'].append(chunk['source'])
+    return list(unique.values()), {"total": total, "unique": len(unique), "duplicates": total - len(unique)}
+
+
+def write_jsonl(chunks, output_path):
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, separators=(',', ':'), ensure_ascii=False))
+            f.write('\n')
+
+
+def metadata_sidecar(chunk, attributes, sources):
+    return {
+        "metadataAttributes": {
+            **attributes,
+            "source": chunk['source'] if chunk['source'] in sources else sources[0],
+            "sources": ",".join(sources),
+            "section": chunk['section'] or "",
+            "page": chunk['page'],
+        }
+    }
+
+
+def chunk_sources(index):
+    """
+    Inverts a {source: [hash]} chunk index into {hash: [source]}, sources sorted.
+    """
+    sources = {}
+    for source in sorted(index):
+        for chunk_hash in index[source]:
+            sources.setdefault(chunk_hash, []).append(source)
+    return sources
+
+
+def plan_chunk_upload(chunks, documents, index, existing_keys, prefix=CHUNK_PREFIX):
+    """
+    Works out the bucket changes for a run that chunked `documents`. Their previous
+    chunks are replaced, chunks of other documents are kept.
+
+    Parameters:
+    chunks ([dict]): The unique chunks of this run
+    documents ([str]): The source names chunked in this run
+    index (dict): The stored {source: [hash]} chunk index
+    existing_keys (set): The keys under prefix
+
+    Returns:
+    dict: The new index, and the hashes to upload, whose sidecar sources changed, and to delete
+    """
+    new_index = {source: hashes for source, hashes in index.items() if source not in documents}
+    for chunk in chunks:
+        for source in chunk['sources']:
+            new_index.setdefault(source, []).append(chunk['hash'])
+    before, after = chunk_sources(index), chunk_sources(new_index)
+    upload = [
+        chunk['hash'] for chunk in chunks
+        if f"{prefix}{chunk['hash']}.txt" not in existing_keys
+        or f"{prefix}{chunk['hash']}.txt.metadata.json" not in existing_keys
+    ]
+    uploading = set(upload)
+    return {
+        "index": new_index,
+        "sources": after,
+        "upload": upload,
+        "rewrite": [
+            chunk_hash for chunk_hash in after
+            if chunk_hash not in uploading and before.get(chunk_hash) != after[chunk_hash]
+        ],
+        "delete": [chunk_hash for chunk_hash in before if chunk_hash not in after],
+    }
+
+
+def upload_chunks(chunks, documents, s3_bucket, attributes, max_workers=8, prefix=CHUNK_PREFIX, s3_client=None):
+    """
+    Uploads each chunk as <prefix><hash>.txt with a <prefix><hash>.txt.metadata.json sidecar
+    for the chunks data source, which embeds them without chunking again.
+
+    The chunk index at CHUNK_INDEX_KEY records the chunks of every document, so a run
+    deletes the chunks its documents no longer produce and rewrites the sidecars whose
+    sources changed. Chunks already in the bucket are not uploaded again. The raw copies
+    of the documents under DOCUMENTS_PREFIX are removed, so each document is embedded once.
+
+    Parameters:
+    chunks ([dict]): The unique chunks from chunk_corpus
+    documents ([str]): The source names of every document chunked in this run
+    s3_bucket (str): The knowledge base bucket
+    attributes (dict): Metadata attributes for every chunk
+    s3_client: Optional s3 client
+
+    Returns:
+    dict: The number of chunks uploaded, updated and deleted
+    """
+    if s3_client is None:
+        import boto3
+
+        s3_client = boto3.client('s3')
+    existing = set()
+    for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=s3_bucket, Prefix=prefix):
+        existing.update(obj['Key'] for obj in page.get('Contents', []))
+    try:
+        index = json.loads(s3_client.get_object(Bucket=s3_bucket, Key=CHUNK_INDEX_KEY)['Body'].read())
+    except s3_client.exceptions.NoSuchKey:
+        index = {}
+
+    plan = plan_chunk_upload(chunks, documents, index, existing, prefix)
+    sources = plan['sources']
+    by_hash = {chunk['hash']: chunk for chunk in chunks}
+
+    def put_sidecar(chunk_hash):
+        key = f"{prefix}{chunk_hash}.txt.metadata.json"
+        if chunk_hash in by_hash:
+            sidecar = metadata_sidecar(by_hash[chunk_hash], attributes, sources[chunk_hash])
+        else:
+            # only documents outside this run still have the chunk, patch its sources in place
+            sidecar = json.loads(s3_client.get_object(Bucket=s3_bucket, Key=key)['Body'].read())
+            metadata = sidecar['metadataAttributes']
+            if metadata.get('source') not in sources[chunk_hash]:
+                metadata['source'] = sources[chunk_hash][0]
+            metadata['sources'] = ",".join(sources[chunk_hash])
+        s3_client.put_object(Bucket=s3_bucket, Key=key, Body=json.dumps(sidecar).encode('utf-8'))
+
+    def upload(chunk_hash):
+        key = f"{prefix}{chunk_hash}.txt"
+        s3_client.put_object(Bucket=s3_bucket, Key=key, Body=by_hash[chunk_hash]['text'].encode('utf-8'))
+        put_sidecar(chunk_hash)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(upload, plan['upload']))
+        list(executor.map(put_sidecar, plan['rewrite']))
+
+    stale = [f"{prefix}{chunk_hash}.txt{suffix}" for chunk_hash in plan['delete'] for suffix in ("", ".metadata.json")]
+    stale += [f"{DOCUMENTS_PREFIX}{document}" for document in documents]
+    for i in range(0, len(stale), 1000):
+        s3_client.delete_objects(
+            Bucket=s3_bucket, Delete={'Objects': [{'Key': key} for key in stale[i:i + 1000]], 'Quiet': True}
+        )
+    s3_client.put_object(Bucket=s3_bucket, Key=CHUNK_INDEX_KEY, Body=json.dumps(plan['index']).encode('utf-8'))
+    return {"uploaded": len(plan['upload']), "updated": len(plan['rewrite']), "deleted": len(plan['delete'])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help='directory of PDFs to preprocess')
+    parser.add_argument('--output', default='chunks.jsonl')
+    parser.add_argument('--bucket', help='knowledge base bucket to upload the chunks to')
+    parser.add_argument('--max-words', type=int, default=DEFAULT_MAX_WORDS)
+    parser.add_argument('--overlap-words', type=int, default=DEFAULT_OVERLAP_WORDS)
+    parser.add_argument('--workers', type=int, default=None, help='processes used for chunking')
+    parser.add_argument('--department', help='department metadata attribute for every chunk')
+    parser.add_argument('--document-type', help='document_type metadata attribute for every chunk')
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.directory, f) for f in os.listdir(args.directory) if f.lower().endswith('.pdf')
+    )
+    chunks, stats = chunk_corpus(paths, args.max_words, args.overlap_words, args.workers)
+    write_jsonl(chunks, args.output)
+    print(f"Chunked {len(paths)} documents: {stats}, written to {args.output}")
+
+    if args.bucket:
+        attributes = {
+            key: value for key, value in
+            (("department", args.department), ("document_type", args.document_type)) if value
+        }
+        documents = [os.path.basename(path) for path in paths]
+        result = upload_chunks(chunks, documents, args.bucket, attributes)
+        print(f"Chunks in {args.bucket}: {result}")
+
+
+if __name__ == '__main__':
+    main()
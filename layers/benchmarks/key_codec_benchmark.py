@@ -0,0 +1,88 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Local benchmark for the single table key codec in the model layer.
+
+Generates a realistic mix of park reservation, bulk pickup and form keys, then times
+batch decoding of query results with decode_many and encoding of the same entities,
+next to the ad hoc str.replace parsing the park handler used before the codec.
+
+    python layers/benchmarks/key_codec_benchmark.py --items 1000000
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'model'))
+
+from keys import (  # noqa: E402
+    BulkPickupCounter, BulkPickupRequest, FormField, FormVersion, ParkReservation, decode_many,
+)
+
+
+def synthetic_items(num_items, seed=7):
+    rng = random.Random(seed)
+    start = datetime.date(2024, 1, 1)
+    routes = ["Yellow", "Blue", "Orange", "Green", "Red"]
+    items = []
+    for i in range(num_items):
+        day = (start + datetime.timedelta(days=rng.randrange(365))).isoformat()
+        kind = rng.random()
+        if kind < 0.5:
+            entity = ParkReservation(rng.randrange(1, 200), day)
+        elif kind < 0.7:
+            entity = BulkPickupRequest(rng.choice(routes), day, rng.randrange(1, 10 ** 6), shard=rng.randrange(4))
+        elif kind < 0.75:
+            entity = BulkPickupCounter(rng.choice(routes), day, rng.randrange(4))
+        elif kind < 0.8:
+            entity = FormVersion(f"T{rng.randrange(50)}", rng.randrange(1, 10 ** 6), f"v{i}")
+        else:
+            entity = FormField(f"T{rng.randrange(50)}", rng.randrange(1, 10 ** 6), f"v{i}", f"field_{rng.randrange(30)}")
+        items.append(entity.key)
+    return items
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    items = synthetic_items(args.items, args.seed)
+
+    entities, decode_seconds = timed(decode_many, items, True)
+    _, encode_seconds = timed(lambda: [entity.key for entity in entities])
+    reservations = [item for item in items if item["pk"][0] == "P"]
+    _, replace_seconds = timed(lambda: [item["sk"].replace("R", "").replace("#", "") for item in reservations])
+    _, typed_seconds = timed(lambda: [e.date for e in decode_many(reservations) if isinstance(e, ParkReservation)])
+
+    tracemalloc.start()
+    sample = decode_many(items[:100_000])
+    entity_bytes = tracemalloc.get_traced_memory()[0] / len(sample)
+    tracemalloc.stop()
+
+    print(f"{'operation':<36} {'items':>10} {'seconds':>8} {'items/s':>12}")
+    for name, count, seconds in (
+        ("decode_many (mixed)", len(items), decode_seconds),
+        ("encode (mixed)", len(entities), encode_seconds),
+        ("park dates, str.replace", len(reservations), replace_seconds),
+        ("park dates, decode_many", len(reservations), typed_seconds),
+    ):
+        print(f"{name:<36} {count:>10} {seconds:>8.2f} {count / seconds:>12,.0f}")
+    print(f"~{entity_bytes:.0f} bytes per decoded entity (__slots__, including its strings)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Size and import time report for the built layers and functions.
+
+Run after sam build. Layers are the build directories with a python/ folder and
+functions the ones with an app.py. Each import is timed in a fresh interpreter, the
+best of --runs, so the numbers approximate the import phase of a cold start. Functions
+are imported with the layers their built template attaches, layers with every layer
+on the path. boto3 comes from the Lambda runtime, so it must be installed where this
+runs, as must PyYAML to read the templates.
+
+    sam build && python layers/layer_report.py .aws-sam/build
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+CHILD = """
+import json, os, sys, time
+
+class Environ(dict):
+    def __missing__(self, key):
+        return "layer-report"
+
+paths, modules = json.loads(sys.argv[1])
+os.environ = Environ(os.environ)
+sys.path[:0] = paths
+started = time.perf_counter()
+error = None
+for module in modules:
+    try:
+        __import__(module)
+    except Exception as e:
+        error = f"{module}: {type(e).__name__}: {e}"
+seconds = time.perf_counter() - started
+files = [getattr(module, "__file__", None) or "" for module in list(sys.modules.values())]
+print(json.dumps({"seconds": seconds, "error": error, "files": files}))
+"""
+
+CHILD_ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_REGION": "us-east-1",
+    "POWERTOOLS_TRACE_DISABLED": "true",
+    "POWERTOOLS_METRICS_NAMESPACE": "layer-report",
+}
+
+
+def directory_size(path):
+    size = 0
+    files = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            size += os.path.getsize(os.path.join(root, name))
+            files += 1
+    return size, files
+
+
+def top_level_modules(path):
+    modules = []
+    for name in sorted(os.listdir(path)):
+        if name.endswith(".dist-info") or name.startswith(("_", ".")) or name == "bin":
+            continue
+        if os.path.isfile(os.path.join(path, name, "__init__.py")):
+            modules.append(name)
+        elif name.endswith(".py"):
+            modules.append(name[:-3])
+    return modules
+
+
+def attached_layers(build_dir):
+    """
+    The layers each function references in the built templates, by function logical id.
+    Layers are referenced through stack parameters named after the layer resources.
+    """
+    import yaml
+
+    class Loader(yaml.SafeLoader):
+        pass
+
+    # keep !Ref X as X and ignore the values of other intrinsic functions
+    Loader.add_multi_constructor("!", lambda loader, suffix, node: (
+        loader.construct_scalar(node) if suffix == "Ref" and isinstance(node, yaml.ScalarNode) else None
+    ))
+
+    attached = {}
+    for root, _, names in os.walk(build_dir):
+        if "template.yaml" not in names:
+            continue
+        with open(os.path.join(root, "template.yaml")) as f:
+            template = yaml.load(f, Loader=Loader) or {}
+        default = ((template.get("Globals") or {}).get("Function") or {}).get("Layers", [])
+        for name, resource in (template.get("Resources") or {}).items():
+            if resource.get("Type") == "AWS::Serverless::Function":
+                layers = (resource.get("Properties") or {}).get("Layers", default)
+                attached[name] = [layer["Ref"] if isinstance(layer, dict) else layer for layer in layers]
+    return attached
+
+
+def find_builds(build_dir):
+    layers = {}
+    functions = {}
+    for root, dirs, names in os.walk(build_dir):
+        if "python" in dirs and not names:
+            layers[os.path.basename(root)] = os.path.abspath(os.path.join(root, "python"))
+            dirs.clear()
+        elif "app.py" in names:
+            functions[os.path.basename(root)] = os.path.abspath(root)
+            dirs.clear()
+    return layers, functions
+
+
+def slowest_imports(stderr, modules, count=3):
+    """
+    The slowest direct imports of the timed modules from -X importtime, as (module, cumulative microseconds).
+    """
+    children = []
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # a module's own imports are printed before it, one level deeper
+        if depth == 1:
+            children.append((name.strip(), int(cumulative)))
+        elif depth == 0:
+            if name.strip() in modules:
+                imports.extend(children)
+            children = []
+    return sorted(imports, key=lambda item: -item[1])[:count]
+
+
+def time_imports(paths, modules, runs):
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD, json.dumps([paths, modules])],
+            capture_output=True, text=True, env={**os.environ, **CHILD_ENV},
+        )
+        if result.returncode != 0:
+            return {"seconds": None, "error": result.stderr.strip().splitlines()[-1], "files": [], "slowest": []}
+        measured = json.loads(result.stdout.strip().splitlines()[-1])
+        measured["slowest"] = slowest_imports(result.stderr, modules)
+        if best is None or measured["seconds"] < best["seconds"]:
+            best = measured
+    return best
+
+
+def report(build_dir, runs=3):
+    layers, functions = find_builds(build_dir)
+    rows = []
+    layer_sizes = {}
+    for name, path in sorted(layers.items()):
+        size, files = directory_size(path)
+        layer_sizes[name] = size
+        # layer modules may import other layers, as they do in a function
+        measured = time_imports([path, *layers.values()], top_level_modules(path), runs)
+        rows.append({"kind": "layer", "name": name, "bytes": size, "files": files, **measured})
+
+    attached = attached_layers(build_dir)
+    for name, path in sorted(functions.items()):
+        size, files = directory_size(path)
+        # functions missing from the templates get every layer
+        used = [layer for layer in attached.get(name, layers) if layer in layers]
+        measured = time_imports([path, *(layers[layer] for layer in used)], ["app"], runs)
+        rows.append({
+            "kind": "function", "name": name, "bytes": size, "files": files, "layers": used,
+            "bytes_with_layers": size + sum(layer_sizes[layer] for layer in used), **measured,
+        })
+
+    for row in rows:
+        del row["files"]
+    return rows
+
+
+def print_report(rows):
+    print(f"{'':<9}{'name':<40}{'unzipped':>12}{'with layers':>13}{'import ms':>11}  slowest imports")
+    for row in rows:
+        with_layers = f"{row['bytes_with_layers'] / 2 ** 20:.1f} MB" if "bytes_with_layers" in row else ""
+        import_ms = f"{row['seconds'] * 1000:.0f}" if row["seconds"] is not None else "failed"
+        slowest = ", ".join(f"{module} {us / 1000:.0f}ms" for module, us in row["slowest"])
+        print(f"{row['kind']:<9}{row['name']:<40}{row['bytes'] / 2 ** 20:>9.1f} MB{with_layers:>13}{import_ms:>11}  {slowest}")
+        if row.get("layers"):
+            print(f"{'':<9}  uses {', '.join(row['layers'])}")
+        if row["error"]:
+            print(f"{'':<9}  {row['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("build_dir", nargs="?", default=".aws-sam/build")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the rows as JSON")
+    args = parser.parse_args()
+
+    rows = report(args.build_dir, args.runs)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
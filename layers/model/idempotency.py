@@ -0,0 +1,83 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+
+from aws_lambda_powertools.utilities.idempotency import (
+    DynamoDBPersistenceLayer,
+    IdempotencyConfig,
+    idempotent_function,
+)
+from aws_lambda_powertools.utilities.idempotency.exceptions import (
+    IdempotencyItemNotFoundError,
+    IdempotencyValidationError,
+)
+from aws_lambda_powertools.utilities.idempotency.persistence.datarecord import STATUS_CONSTANTS
+
+
+DEFAULT_TABLE_NAME = os.environ.get('IDEMPOTENCY_TABLE')
+# long enough to cover the agent's retries of a call, short enough that the same
+# call made again later in the conversation runs again
+DEFAULT_EXPIRY_SECONDS = int(os.environ.get('IDEMPOTENCY_EXPIRY_SECONDS', '120'))
+
+
+def idempotency_request(session_id, function, **arguments):
+    """
+    Builds the payload an idempotent write is keyed on: the agent session, the tool
+    function and the resolved arguments, after any session attribute overrides.
+
+    Returns:
+    dict: The idempotency payload
+    """
+    return {
+        "session_id": session_id,
+        "function": function,
+        "arguments": {name: str(value).strip() for name, value in arguments.items() if value is not None},
+    }
+
+
+def idempotent_tool(table_name=DEFAULT_TABLE_NAME, expiry_seconds=DEFAULT_EXPIRY_SECONDS):
+    """
+    Returns a decorator that makes a tool write idempotent, with the records persisted
+    in the idempotency table. That table has a hash key only, so each record is its own
+    partition keyed by the request hash, rather than every record of a function sharing
+    one static partition of the application table.
+
+    The decorated function takes the payload from idempotency_request as its `request`
+    keyword argument and returns a JSON serializable result. A retried call within the
+    expiry returns the stored result without running the function again; a call that
+    raises stores nothing, so it can be retried. The decorated function's
+    has_stored_result(request) tells whether such a retry would be answered from its
+    record, so the caller can let it through a rate limit the first call already paid.
+
+    Returns:
+    (function, IdempotencyConfig): The decorator and its config, which needs
+    register_lambda_context(context) at the start of each invocation
+    """
+    persistence_layer = DynamoDBPersistenceLayer(table_name=table_name)
+    config = IdempotencyConfig(
+        expires_after_seconds=expiry_seconds,
+        use_local_cache=True,
+    )
+
+    def decorator(function):
+        decorated = idempotent_function(
+            data_keyword_argument='request',
+            persistence_store=persistence_layer,
+            config=config,
+        )(function)
+        # the record key prefix powertools derives for the function
+        function_name = f"{function.__module__}.{function.__qualname__}"
+
+        def has_stored_result(request):
+            persistence_layer.configure(config=config, function_name=function_name)
+            try:
+                record = persistence_layer.get_record(request)
+            except (IdempotencyItemNotFoundError, IdempotencyValidationError):
+                return False
+            return record is not None and record.status == STATUS_CONSTANTS["COMPLETED"]
+
+        decorated.has_stored_result = has_stored_result
+        return decorated
+
+    return decorator, config
@@ -0,0 +1,438 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Key codec for the single table design. Every entity encodes its pk and sk here and
+decode() turns a key pair back into the entity, so the formats live in one place:
+
+    ParkReservation      P{park_id}#              R{date}#
+    GarbageRoute         T{district_id}#          T{district_id}#
+    Citizen              U{citizen_id}#           U{citizen_id}#
+    BulkPickupRequest    G{route}#[S{shard}#]     R{date}#C{citizen_id}#
+    BulkPickupCounter    G{route}#S{shard}#       N{date}#
+    FormTemplate         #F{template_id}#         #F{template_id}#
+    FormTemplateListing  Dforms#                  F{template_id}#
+    FormTemplateSchema   #F{template_id}#         #F{template_id}#S#
+    FormTemplateField    #F{template_id}#         #F{template_id}#F{field_id}#
+    FormVersion          #F{template_id}#         #F{template_id}#C{citizen_id}#V{version_id}#
+    FormField            #F{template_id}#         #F{template_id}#C{citizen_id}#V{version_id}#F{field_id}#
+    RateLimitBucket      L{scope}#{subject}#      L{scope}#{subject}#
+
+Form versions were once started as #F{template_id}#{citizen_id}#{version_id}#. With a
+citizen id starting with C and a version id starting with V such a key reads as the
+current format, so decode() does not accept the old format at all; legacy_form_version()
+recognizes those rows from their data and model.migrate_legacy_form_version() rewrites them.
+"""
+
+import re
+
+
+DATE = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+
+# the old started rows were only written by start_form_version, with shortuuid version ids
+LEGACY_VERSION_ID_LENGTH = 22
+
+
+class KeyFormatError(ValueError):
+    pass
+
+
+def component(value, name):
+    value = str(value)
+    if not value or "#" in value:
+        raise KeyFormatError(f"Invalid {name} {value!r}: must be non empty and not contain '#'")
+    return value
+
+
+def date_component(value, name="date"):
+    value = str(value)
+    if not DATE.match(value):
+        raise KeyFormatError(f"Invalid {name} {value!r}: expected YYYY-MM-DD")
+    return value
+
+
+class Entity:
+    """
+    Base of the key entities. Constructors validate their components; the decoded()
+    classmethods skip that for components decode() has already split and checked.
+    """
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return {"pk": self.pk, "sk": self.sk}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+    def __hash__(self):
+        return hash((type(self), *(getattr(self, slot) for slot in self.__slots__)))
+
+    def __repr__(self):
+        fields = ", ".join(f"{slot}={getattr(self, slot)!r}" for slot in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class ParkReservation(Entity):
+    __slots__ = ("park_id", "date")
+
+    def __init__(self, park_id, date):
+        self.park_id = component(park_id, "park_id")
+        self.date = date_component(date)
+
+    @classmethod
+    def decoded(cls, park_id, date):
+        entity = object.__new__(cls)
+        entity.park_id = park_id
+        entity.date = date
+        return entity
+
+    @staticmethod
+    def partition(park_id):
+        return f"P{component(park_id, 'park_id')}#"
+
+    pk = property(lambda self: f"P{self.park_id}#")
+    sk = property(lambda self: f"R{self.date}#")
+
+
+class GarbageRoute(Entity):
+    __slots__ = ("district_id",)
+
+    def __init__(self, district_id):
+        self.district_id = component(district_id, "district_id")
+
+    @classmethod
+    def decoded(cls, district_id):
+        entity = object.__new__(cls)
+        entity.district_id = district_id
+        return entity
+
+    pk = property(lambda self: f"T{self.district_id}#")
+    sk = property(lambda self: f"T{self.district_id}#")
+
+
+class Citizen(Entity):
+    __slots__ = ("citizen_id",)
+
+    def __init__(self, citizen_id):
+        self.citizen_id = component(citizen_id, "citizen_id")
+
+    @classmethod
+    def decoded(cls, citizen_id):
+        entity = object.__new__(cls)
+        entity.citizen_id = citizen_id
+        return entity
+
+    pk = property(lambda self: f"U{self.citizen_id}#")
+    sk = property(lambda self: f"U{self.citizen_id}#")
+
+
+def route_partition(route, shard=None):
+    route = component(route, "route")
+    return f"G{route}#" if shard is None else f"G{route}#S{int(shard)}#"
+
+
+class BulkPickupRequest(Entity):
+    """
+    A bulk pickup request. shard is None for requests written before routes were sharded.
+    """
+    __slots__ = ("route", "shard", "date", "citizen_id")
+
+    def __init__(self, route, date, citizen_id, shard=None):
+        self.route = component(route, "route")
+        self.shard = None if shard is None else int(shard)
+        self.date = date_component(date)
+        self.citizen_id = component(citizen_id, "citizen_id")
+
+    @classmethod
+    def decoded(cls, route, shard, date, citizen_id):
+        entity = object.__new__(cls)
+        entity.route = route
+        entity.shard = shard
+        entity.date = date
+        entity.citizen_id = citizen_id
+        return entity
+
+    pk = property(lambda self: route_partition(self.route, self.shard))
+    sk = property(lambda self: f"R{self.date}#C{self.citizen_id}#")
+
+
+class BulkPickupCounter(Entity):
+    __slots__ = ("route", "shard", "date")
+
+    def __init__(self, route, date, shard):
+        self.route = component(route, "route")
+        self.shard = int(shard)
+        self.date = date_component(date)
+
+    @classmethod
+    def decoded(cls, route, shard, date):
+        entity = object.__new__(cls)
+        entity.route = route
+        entity.shard = shard
+        entity.date = date
+        return entity
+
+    pk = property(lambda self: route_partition(self.route, self.shard))
+    sk = property(lambda self: f"N{self.date}#")
+
+
+def form_partition(template_id):
+    return f"#F{component(template_id, 'template_id')}#"
+
+
+class FormTemplate(Entity):
+    __slots__ = ("template_id",)
+
+    def __init__(self, template_id):
+        self.template_id = component(template_id, "template_id")
+
+    @classmethod
+    def decoded(cls, template_id):
+        entity = object.__new__(cls)
+        entity.template_id = template_id
+        return entity
+
+    pk = property(lambda self: f"#F{self.template_id}#")
+    sk = property(lambda self: f"#F{self.template_id}#")
+
+
+class FormTemplateListing(Entity):
+    """
+    One row per form template in a shared partition, so the templates are listed with a query.
+    """
+    __slots__ = ("template_id",)
+
+    PARTITION = "Dforms#"
+
+    def __init__(self, template_id):
+        self.template_id = component(template_id, "template_id")
+
+    @classmethod
+    def decoded(cls, template_id):
+        entity = object.__new__(cls)
+        entity.template_id = template_id
+        return entity
+
+    pk = property(lambda self: FormTemplateListing.PARTITION)
+    sk = property(lambda self: f"F{self.template_id}#")
+
+
+class FormTemplateSchema(Entity):
+    __slots__ = ("template_id",)
+
+    def __init__(self, template_id):
+        self.template_id = component(template_id, "template_id")
+
+    @classmethod
+    def decoded(cls, template_id):
+        entity = object.__new__(cls)
+        entity.template_id = template_id
+        return entity
+
+    pk = property(lambda self: f"#F{self.template_id}#")
+    sk = property(lambda self: f"#F{self.template_id}#S#")
+
+
+class FormTemplateField(Entity):
+    __slots__ = ("template_id", "field_id")
+
+    def __init__(self, template_id, field_id):
+        self.template_id = component(template_id, "template_id")
+        self.field_id = component(field_id, "field_id")
+
+    @classmethod
+    def decoded(cls, template_id, field_id):
+        entity = object.__new__(cls)
+        entity.template_id = template_id
+        entity.field_id = field_id
+        return entity
+
+    pk = property(lambda self: f"#F{self.template_id}#")
+    sk = property(lambda self: f"#F{self.template_id}#F{self.field_id}#")
+
+
+class FormVersion(Entity):
+    __slots__ = ("template_id", "citizen_id", "version_id")
+
+    def __init__(self, template_id, citizen_id, version_id):
+        self.template_id = component(template_id, "template_id")
+        self.citizen_id = component(citizen_id, "citizen_id")
+        self.version_id = component(version_id, "version_id")
+
+    @classmethod
+    def decoded(cls, template_id, citizen_id, version_id):
+        entity = object.__new__(cls)
+        entity.template_id = template_id
+        entity.citizen_id = citizen_id
+        entity.version_id = version_id
+        return entity
+
+    pk = property(lambda self: f"#F{self.template_id}#")
+    sk = property(lambda self: f"#F{self.template_id}#C{self.citizen_id}#V{self.version_id}#")
+
+    @property
+    def fields_prefix(self):
+        return f"{self.sk}F"
+
+
+class FormField(Entity):
+    __slots__ = ("template_id", "citizen_id", "version_id", "field_id")
+
+    def __init__(self, template_id, citizen_id, version_id, field_id):
+        self.template_id = component(template_id, "template_id")
+        self.citizen_id = component(citizen_id, "citizen_id")
+        self.version_id = component(version_id, "version_id")
+        self.field_id = component(field_id, "field_id")
+
+    @classmethod
+    def decoded(cls, template_id, citizen_id, version_id, field_id):
+        entity = object.__new__(cls)
+        entity.template_id = template_id
+        entity.citizen_id = citizen_id
+        entity.version_id = version_id
+        entity.field_id = field_id
+        return entity
+
+    pk = property(lambda self: f"#F{self.template_id}#")
+    sk = property(
+        lambda self: f"#F{self.template_id}#C{self.citizen_id}#V{self.version_id}#F{self.field_id}#"
+    )
+
+
+class RateLimitBucket(Entity):
+    __slots__ = ("scope", "subject")
+
+    def __init__(self, scope, subject):
+        self.scope = component(scope, "scope")
+        self.subject = component(subject, "subject")
+
+    @classmethod
+    def decoded(cls, scope, subject):
+        entity = object.__new__(cls)
+        entity.scope = scope
+        entity.subject = subject
+        return entity
+
+    pk = property(lambda self: f"L{self.scope}#{self.subject}#")
+    sk = property(lambda self: f"L{self.scope}#{self.subject}#")
+
+
+def _decode_form(pk, sk):
+    template_id = pk[2:-1]
+    if not sk.startswith(pk):
+        raise KeyFormatError(f"Form key {sk!r} does not belong to partition {pk!r}")
+    parts = sk[len(pk):].split("#")
+    # parts always ends with the empty string after the trailing '#'
+    if parts[-1] != "":
+        raise KeyFormatError(f"Form key {sk!r} must end with '#'")
+    n = len(parts) - 1
+    if n == 0:
+        return FormTemplate.decoded(template_id)
+    if n == 1:
+        if parts[0] == "S":
+            return FormTemplateSchema.decoded(template_id)
+        if parts[0][:1] == "F" and len(parts[0]) > 1:
+            return FormTemplateField.decoded(template_id, parts[0][1:])
+    elif n == 2:
+        if parts[0][:1] == "C" and parts[1][:1] == "V" and len(parts[0]) > 1 and len(parts[1]) > 1:
+            return FormVersion.decoded(template_id, parts[0][1:], parts[1][1:])
+    elif n == 3:
+        c, v, f = parts[0], parts[1], parts[2]
+        if c[:1] == "C" and v[:1] == "V" and f[:1] == "F" and len(c) > 1 and len(v) > 1 and len(f) > 1:
+            return FormField.decoded(template_id, c[1:], v[1:], f[1:])
+    raise KeyFormatError(f"Unrecognized form key {sk!r}")
+
+
+def legacy_form_version(pk, sk, data):
+    """
+    Recognizes a version row in the old #F{template_id}#{citizen_id}#{version_id}# format.
+
+    Those rows always hold STARTED, since submitting a version wrote the current format,
+    and a shortuuid version id, one character shorter than the V prefixed id of a
+    current row. Current STARTED rows are written by the same start_form_version, so
+    their second component is never that length.
+
+    Returns:
+    FormVersion: The version the row belongs to, or None for any other row
+    """
+    if data != "STARTED" or pk[:2] != "#F" or not sk.startswith(pk):
+        return None
+    parts = sk[len(pk):].split("#")
+    if len(parts) != 3 or parts[2] or not parts[0] or len(parts[1]) != LEGACY_VERSION_ID_LENGTH:
+        return None
+    return FormVersion(pk[2:-1], parts[0], parts[1])
+
+
+def _decode_route(pk, sk):
+    parts = pk[1:].split("#")
+    if len(parts) == 2 and parts[0]:
+        route, shard = parts[0], None
+    elif len(parts) == 3 and parts[0] and parts[1][:1] == "S" and parts[1][1:].isdigit():
+        route, shard = parts[0], int(parts[1][1:])
+    else:
+        raise KeyFormatError(f"Unrecognized route partition {pk!r}")
+    if sk[:1] == "N" and shard is not None and DATE.match(sk[1:-1]) and sk[-1:] == "#":
+        return BulkPickupCounter.decoded(route, shard, sk[1:-1])
+    if sk[:1] == "R":
+        date, _, rest = sk[1:].partition("#C")
+        if DATE.match(date) and rest[-1:] == "#" and len(rest) > 1 and "#" not in rest[:-1]:
+            return BulkPickupRequest.decoded(route, shard, date, rest[:-1])
+    raise KeyFormatError(f"Unrecognized bulk pickup key {sk!r}")
+
+
+def decode(pk, sk):
+    """
+    Decodes a key pair into its entity.
+
+    Raises:
+    KeyFormatError: When the key matches no known format
+    """
+    if pk[-1:] != "#" or sk[-1:] != "#":
+        raise KeyFormatError(f"Keys must end with '#': {pk!r}, {sk!r}")
+    prefix = pk[:1]
+    if prefix == "P":
+        if sk[:1] == "R" and DATE.match(sk[1:-1]) and "#" not in pk[1:-1] and len(pk) > 2:
+            return ParkReservation.decoded(pk[1:-1], sk[1:-1])
+    elif prefix == "T":
+        if pk == sk and "#" not in pk[1:-1] and len(pk) > 2:
+            return GarbageRoute.decoded(pk[1:-1])
+    elif prefix == "U":
+        if pk == sk and "#" not in pk[1:-1] and len(pk) > 2:
+            return Citizen.decoded(pk[1:-1])
+    elif prefix == "G":
+        return _decode_route(pk, sk)
+    elif prefix == "D":
+        if pk == FormTemplateListing.PARTITION and sk[:1] == "F" and "#" not in sk[1:-1] and len(sk) > 2:
+            return FormTemplateListing.decoded(sk[1:-1])
+    elif prefix == "L":
+        parts = pk[1:-1].split("#")
+        if pk == sk and len(parts) == 2 and parts[0] and parts[1]:
+            return RateLimitBucket.decoded(parts[0], parts[1])
+    elif pk[:2] == "#F" and "#" not in pk[2:-1] and len(pk) > 3:
+        return _decode_form(pk, sk)
+    raise KeyFormatError(f"Unrecognized key {pk!r}, {sk!r}")
+
+
+def decode_many(items, strict=False):
+    """
+    Decodes the items of a query or scan result.
+
+    Parameters:
+    items ([dict]): Items with pk and sk attributes
+    strict (bool): Raise on keys that match no format instead of skipping them
+
+    Returns:
+    [Entity]: The decoded entities, in item order
+    """
+    entities = []
+    append = entities.append
+    for item in items:
+        try:
+            append(decode(item["pk"], item["sk"]))
+        except KeyFormatError:
+            if strict:
+                raise
+    return entities
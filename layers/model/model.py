@@ -1,9 +1,21 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
+import os
+import time
+
 import shortuuid
 from boto3.dynamodb.conditions import Key
 
+from keys import (
+    BulkPickupRequest, FormField, FormTemplate, FormTemplateField, FormTemplateListing, FormTemplateSchema,
+    FormVersion, GarbageRoute, ParkReservation, form_partition, legacy_form_version,
+)
+
+
+# draft form rows expire through the table's TTL unless the version is submitted
+FORM_DRAFT_TTL_SECONDS = int(os.environ.get('FORM_DRAFT_TTL_SECONDS', str(7 * 24 * 3600)))
+TTL_ATTRIBUTE = "expiration"
 
 FACETS = {
     "Sales": "S",
@@ -25,134 +37,127 @@ def get_item_by_key(pk, sk, table):
 def get_user(uid, table):
     return get_item_by_key(pk=uid, sk=uid, table=table)
 
+def put_entity(entity, table, **attributes):
+    return write_to_ddb(item={**entity.key, **attributes}, table=table)
+
 def get_garbage_route_by_district_id(district_id, table):
-    pk = f"T{district_id}#"
-    sk = f"T{district_id}#"
-    return get_item_by_key(pk, sk, table)
-
-def get_park_reservation(park_id, start_date, end_date, table):
-    return get_item_by_key(
-        pk=f"P{park_id}#",
-        sk=f"RS{start_date}#E{end_date}#",
-        table=table
-    )
+    return table.get_item(Key=GarbageRoute(district_id).key)
 
 def get_park_reservations(park_id, start_date, end_date, table):
-    pk = f"P{park_id}#"
-    # sk=R{start_date}#{end_date}#
+    pk = ParkReservation.partition(park_id)
     reservations = table.query(
         KeyConditionExpression=Key('pk').eq(pk) & Key('sk').begins_with(f"R")
     )
     return reservations['Items']
 
 def write_park_reservation(park_id, reservation_date, citizen_id, table):
-    return write_to_ddb(
-            item={
-                "pk": f"P{park_id}#",
-                "sk": f"R{reservation_date}#",
-                "data": citizen_id
-            },
-            table=table
-        )
+    return put_entity(ParkReservation(park_id, reservation_date), table, data=citizen_id)
 
 def write_bulk_waste_request(garbage_route, pickup_date, citizen_id, table):
-    return write_to_ddb(
-            item={
-                "pk": f"G{garbage_route}#",
-                "sk": f"R{pickup_date}#C{citizen_id}#",
-                "data": citizen_id
-            },
-            table=table
-        )
+    return put_entity(BulkPickupRequest(garbage_route, pickup_date, citizen_id), table, data=citizen_id)
 
 def get_form_template_by_id(form_template_id, table):
-    pk = f"#F{form_template_id}#"
-    sk = f"#F{form_template_id}#"
-    return table.get_item(Key={'pk': pk, 'sk': sk})
+    return table.get_item(Key=FormTemplate(form_template_id).key)
 
 
 def write_form_template(form_template_id, data, table):
-    pk = f"#F{form_template_id}#"
-    sk = f"#F{form_template_id}#"
-    response = write_to_ddb(
-        item={
-            "pk": pk,
-            "sk": sk,
-            "data": data
-        },
-        table=table
-    )
+    response = put_entity(FormTemplate(form_template_id), table, data=data)
     print(response)
+    put_entity(FormTemplateListing(form_template_id), table)
     return form_template_id
 
 def write_form_template_field(form_template_id, field_id, data, table):
-    pk = f"#F{form_template_id}#"
-    sk = f"#F{form_template_id}#F{field_id}#"
-    data = data
-    response = write_to_ddb(
-        item={
-            "pk": pk,
-            "sk": sk,
-            "data": data
-        },
-        table=table
-    )
+    response = put_entity(FormTemplateField(form_template_id, field_id), table, data=data)
     print(response)
     return response
 
+def draft_expiration():
+    return int(time.time()) + FORM_DRAFT_TTL_SECONDS
+
+def write_form_template_schema(form_template_id, data, schema_version, table):
+    """
+    Stores every field of a template in one item, so a template loads with a single get_item.
+    """
+    return put_entity(FormTemplateSchema(form_template_id), table, data=data, schema_version=schema_version)
+
+def get_form_template_schema(form_template_id, table):
+    return table.get_item(Key=FormTemplateSchema(form_template_id).key).get('Item')
+
 def start_form_version(form_template_id, citizen_id, table):
     version_id = shortuuid.uuid()
-    pk = f"#F{form_template_id}#"
-    sk = f"#F{form_template_id}#{citizen_id}#{version_id}#"
-    data = "STARTED"
-    response = write_to_ddb(
-        item={
-            "pk": pk,
-            "sk": sk,
-            "data": data
-        },
-        table=table
+    response = put_entity(
+        FormVersion(form_template_id, citizen_id, version_id), table,
+        data="STARTED",
+        **{TTL_ATTRIBUTE: draft_expiration()}
     )
     print(response)
     return version_id
 
 def submit_form_version(form_template_id, citizen_id, version_id, table):
-    pk = f"#F{form_template_id}#"
-    sk = f"#F{form_template_id}#C{citizen_id}#V{version_id}#"
-    data = "SUBMITTED"
-    return write_to_ddb(
-        item={
-            "pk": pk,
-            "sk": sk,
-            "data": data
-        },
-        table=table
+    # replaces the STARTED row of the version, expiration included
+    response = put_entity(
+        FormVersion(form_template_id, citizen_id, version_id), table,
+        data="SUBMITTED",
+        submitted_at=int(time.time())
     )
+    keep_form_version(form_template_id, citizen_id, version_id, table)
+    return response
+
+def migrate_legacy_form_version(item, table):
+    """
+    Moves a started row in the old #F{id}#{citizen}#{version}# format to the current key.
+    A version that was submitted since already has its row there, which is kept.
+
+    Returns:
+    FormVersion: The migrated version, or None when the item is not a legacy row
+    """
+    version = legacy_form_version(item['pk'], item['sk'], item.get('data'))
+    if version is None:
+        return None
+    try:
+        table.put_item(Item={**item, **version.key}, ConditionExpression="attribute_not_exists(pk)")
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+    table.delete_item(Key={'pk': item['pk'], 'sk': item['sk']})
+    return version
+
+def keep_form_version(form_template_id, citizen_id, version_id, table):
+    """
+    Clears the draft expiration from the field rows of a submitted version, and from
+    its started row when it was written in the old #F{id}#{citizen}#{version}# format
+    and not migrated yet.
+    """
+    version = FormVersion(form_template_id, citizen_id, version_id)
+    pk = version.pk
+    rows = []
+    for prefix in (f"{pk}{citizen_id}#{version_id}#", version.fields_prefix):
+        rows += table.query(
+            KeyConditionExpression=Key('pk').eq(pk) & Key('sk').begins_with(prefix),
+            ProjectionExpression="sk"
+        )['Items']
+    for row in rows:
+        table.update_item(
+            Key={'pk': pk, 'sk': row['sk']},
+            UpdateExpression=f"REMOVE {TTL_ATTRIBUTE}"
+        )
 
 def write_form_field(form_template_id, citizen_id, version_id, field_id, data, table):
-    pk = f"#F{form_template_id}#"
-    sk = f"#F{form_template_id}#C{citizen_id}#V{version_id}#F{field_id}#" # todo - form ingestion should assign field_id's to fields in the form template
-    return write_to_ddb(
-        item={
-            "pk": pk,
-            "sk": sk,
-            "data": data
-        },
-        table=table
+    return put_entity(
+        FormField(form_template_id, citizen_id, version_id, field_id), table,
+        data=data,
+        **{TTL_ATTRIBUTE: draft_expiration()}
     )
 
 def get_form_fields_for_version(form_template_id, citizen_id, version_id, table):
-    pk = f"#F{form_template_id}#"
-    # sk = f"#F{form_template_id}#C{citizen_id}#V{version_id}#F{field_id}#" # todo - form ingestion should assign field_id's to fields in the form template
+    version = FormVersion(form_template_id, citizen_id, version_id)
     fields = table.query(
-        KeyConditionExpression=Key('pk').eq(pk) & Key('sk').begins_with(f"#F{form_template_id}#{citizen_id}#{version_id}")
+        KeyConditionExpression=Key('pk').eq(version.pk) & Key('sk').begins_with(version.fields_prefix)
     )
     return fields['Items']
 
-def get_form_fields(form_template_id, citizen_id, table):
-    pk = f"#F{form_template_id}#"
-    # sk = f"#F{form_template_id}#V{version_id}#F{field_id}#" # todo - form ingestion should assign field_id's to fields in the form template
+def get_form_fields(form_template_id, table, citizen_id=None):
+    pk = form_partition(form_template_id)
     fields = table.query(
-        KeyConditionExpression=Key('pk').eq(pk) & Key('sk').begins_with(f"#F{form_template_id}#")
+        KeyConditionExpression=Key('pk').eq(pk) & Key('sk').begins_with(f"{pk}F")
     )
     return fields['Items']
@@ -0,0 +1,199 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import zlib
+from datetime import date, datetime, timedelta
+
+from keys import BulkPickupCounter, BulkPickupRequest, decode
+
+
+DEFAULT_ROUTES = "Yellow,Blue,Orange,Green,Red"
+
+
+class PickupValidationError(Exception):
+    pass
+
+
+class AlreadyScheduled(Exception):
+    pass
+
+
+class RouteDayFull(Exception):
+    def __init__(self, route, pickup_date, suggestions):
+        super().__init__(f"Route {route} has no bulk pickup capacity left on {pickup_date}")
+        self.route = route
+        self.pickup_date = pickup_date
+        self.suggestions = suggestions
+
+
+def shard_capacities(capacity, shards):
+    """
+    Splits a day's capacity over the counter shards so that the shards never add up to more than the capacity.
+    """
+    base, extra = divmod(capacity, shards)
+    return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+def home_shard(citizen_id, shards):
+    # a citizen's requests always land on the same shard, so a duplicate is caught by a single condition
+    return zlib.crc32(str(citizen_id).encode()) % shards
+
+
+def typed_key(entity):
+    return {name: {"S": value} for name, value in entity.key.items()}
+
+
+def error_code(e):
+    return getattr(e, "response", {}).get("Error", {}).get("Code")
+
+
+class BulkPickupScheduler:
+    """
+    Books bulk waste pickups against a per route, per day capacity.
+
+    Each route and day has `shards` counter items, each holding a slice of the capacity,
+    and the booking increments one counter and writes the request in a single transaction,
+    so a day can never be overbooked however many requests race for it. Counters and
+    requests are spread over G{route}#S{shard}# partitions instead of one hot G{route}#.
+
+    With a route_schedule (the garbage tool's RouteSchedule, or anything with its
+    collection_days method) pickups are only booked on the days the route is collected.
+    """
+
+    def __init__(self, table, capacity=None, shards=None, horizon_days=None, routes=None, route_schedule=None):
+        self.table = table
+        self.client = table.meta.client
+        self.capacity = int(capacity or os.environ.get("BULK_PICKUP_CAPACITY", "20"))
+        self.shards = int(shards or os.environ.get("BULK_PICKUP_SHARDS", "4"))
+        self.horizon_days = int(horizon_days or os.environ.get("BULK_PICKUP_HORIZON_DAYS", "60"))
+        routes = routes or os.environ.get("BULK_PICKUP_ROUTES", DEFAULT_ROUTES).split(",")
+        self.routes = {route.strip().lower(): route.strip() for route in routes if route.strip()}
+        self.shard_capacities = shard_capacities(self.capacity, self.shards)
+        self.route_schedule = route_schedule
+
+    def collection_days(self, route, start, end):
+        """
+        The days from start through end the route is collected on, or None when every day is bookable.
+        """
+        if self.route_schedule is None:
+            return None
+        days = self.route_schedule.collection_days(route, start, end)
+        return None if days is None else [day.isoformat() for day in days]
+
+    def validate(self, route, pickup_date, today=None):
+        """
+        Returns the canonical route name and date, or raises PickupValidationError.
+        """
+        canonical_route = self.routes.get(str(route or "").strip().lower())
+        if canonical_route is None:
+            raise PickupValidationError(
+                f"Unknown garbage route {route}, expected one of {', '.join(self.routes.values())}"
+            )
+        try:
+            day = datetime.strptime(str(pickup_date), "%Y-%m-%d").date()
+        except ValueError:
+            raise PickupValidationError(f"Invalid pickup date {pickup_date}, expected YYYY-MM-DD")
+        today = today or date.today()
+        if day <= today:
+            raise PickupValidationError(f"Pickup date {pickup_date} must be after {today.isoformat()}")
+        if day > today + timedelta(days=self.horizon_days):
+            raise PickupValidationError(
+                f"Pickup date {pickup_date} is more than {self.horizon_days} days ahead"
+            )
+        collection_days = self.collection_days(canonical_route, day, today + timedelta(days=self.horizon_days))
+        if collection_days is not None and day.isoformat() not in collection_days:
+            raise PickupValidationError(
+                f"Route {canonical_route} is not collected on {pickup_date}, "
+                f"the next collection days are: {collection_days[:3]}"
+            )
+        return canonical_route, day.isoformat()
+
+    def schedule(self, route, pickup_date, citizen_id, today=None, suggestions=3):
+        """
+        Books a pickup.
+
+        Returns:
+        dict: route, pickup_date and the shard the capacity was taken from
+
+        Raises:
+        PickupValidationError, AlreadyScheduled or RouteDayFull (carrying suggested dates)
+        """
+        route, pickup_date = self.validate(route, pickup_date, today)
+        start = home_shard(citizen_id, self.shards)
+        request = BulkPickupRequest(route, pickup_date, citizen_id, shard=start)
+
+        for offset in range(self.shards):
+            shard = (start + offset) % self.shards
+            if self.shard_capacities[shard] == 0:
+                continue
+            try:
+                self.client.transact_write_items(TransactItems=[
+                    {
+                        "Update": {
+                            "TableName": self.table.name,
+                            "Key": typed_key(BulkPickupCounter(route, pickup_date, shard)),
+                            "UpdateExpression": "ADD booked :one",
+                            "ConditionExpression": "attribute_not_exists(booked) OR booked < :capacity",
+                            "ExpressionAttributeValues": {
+                                ":one": {"N": "1"},
+                                ":capacity": {"N": str(self.shard_capacities[shard])},
+                            },
+                        }
+                    },
+                    {
+                        "Put": {
+                            "TableName": self.table.name,
+                            "Item": {
+                                **typed_key(request),
+                                "data": {"S": str(citizen_id)},
+                            },
+                            "ConditionExpression": "attribute_not_exists(pk)",
+                        }
+                    },
+                ])
+                return {"route": route, "pickup_date": pickup_date, "shard": shard}
+            except Exception as e:
+                if error_code(e) != "TransactionCanceledException":
+                    raise
+                reasons = [reason.get("Code") for reason in e.response.get("CancellationReasons", [])]
+                if len(reasons) > 1 and reasons[1] == "ConditionalCheckFailed":
+                    raise AlreadyScheduled(f"Citizen {citizen_id} already has a bulk pickup on route {route} on {pickup_date}")
+                if not reasons or reasons[0] != "ConditionalCheckFailed":
+                    raise
+                # this shard is full, try the next one
+
+        raise RouteDayFull(route, pickup_date, self.next_available_days(route, pickup_date, suggestions, today=today))
+
+    def booked(self, route, days):
+        """
+        Reads the counters of several days with batched gets.
+
+        Returns:
+        {str: int}: Pickups booked per day
+        """
+        keys = [typed_key(BulkPickupCounter(route, day, shard)) for day in days for shard in range(self.shards)]
+        totals = {day: 0 for day in days}
+        for i in range(0, len(keys), 100):
+            request = {self.table.name: {"Keys": keys[i:i + 100], "ProjectionExpression": "pk, sk, booked"}}
+            while request:
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in response["Responses"].get(self.table.name, []):
+                    totals[decode(item["pk"]["S"], item["sk"]["S"]).date] += int(item["booked"]["N"])
+                request = response.get("UnprocessedKeys")
+        return totals
+
+    def next_available_days(self, route, pickup_date, count=3, look_ahead=14, today=None):
+        """
+        Suggests the first days after pickup_date with capacity left, within the booking horizon.
+        With a route schedule the candidates are the next look_ahead collection days, otherwise
+        the next look_ahead days.
+        """
+        start = datetime.strptime(pickup_date, "%Y-%m-%d").date() + timedelta(days=1)
+        last = (today or date.today()) + timedelta(days=self.horizon_days)
+        days = self.collection_days(route, start, last)
+        if days is None:
+            days = [(start + timedelta(days=offset)).isoformat() for offset in range((last - start).days + 1)]
+        days = days[:look_ahead]
+        totals = self.booked(route, days)
+        return [day for day in days if totals[day] < self.capacity][:count]
@@ -0,0 +1,199 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import hashlib
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+
+from keys import KeyFormatError, RateLimitBucket
+from pickup_scheduler import error_code
+
+
+DEFAULT_MODE = os.environ.get('RATE_LIMIT_MODE', 'memory').lower()
+DEFAULT_SESSION_PER_MINUTE = float(os.environ.get('RATE_LIMIT_SESSION_PER_MINUTE', '30'))
+DEFAULT_CITIZEN_PER_MINUTE = float(os.environ.get('RATE_LIMIT_CITIZEN_PER_MINUTE', '60'))
+DEFAULT_BURST = int(os.environ.get('RATE_LIMIT_BURST', '10'))
+DEFAULT_MAX_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', '10000'))
+
+# idle buckets are full again after burst * interval, the table TTL removes them some time later
+TTL_ATTRIBUTE = 'expiration'
+
+
+class Throttled:
+    """
+    A rejected tool call: which bucket ran out and when it has a token again.
+    """
+
+    def __init__(self, scope, retry_after_seconds):
+        self.scope = scope
+        self.retry_after_seconds = retry_after_seconds
+
+    def response_body(self, function):
+        """
+        The action group response body for the rejected call, a compact JSON document
+        the agent can explain to the citizen.
+        """
+        wait = max(1, math.ceil(self.retry_after_seconds))
+        subject = "this conversation" if self.scope == "session" else "this citizen"
+        return {
+            'TEXT': {
+                "body": json.dumps({
+                    "error": "rate_limited",
+                    "function": function,
+                    "scope": self.scope,
+                    "retry_after_seconds": wait,
+                    "message": f"Too many {function} requests for {subject}. Wait {wait} seconds before trying again.",
+                }, separators=(',', ':'))
+            }
+        }
+
+
+class MemoryBuckets:
+    """
+    Token buckets held in the warm container. Each container limits on its own, so the
+    effective limit grows with concurrency, but nothing is written to the table.
+    """
+
+    def __init__(self, max_buckets=DEFAULT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._arrivals = OrderedDict()
+
+    def take(self, scope, subject, interval, burst, now):
+        key = (scope, subject)
+        arrival = max(self._arrivals.get(key, now), now) + interval
+        wait = arrival - now - burst * interval
+        if wait > 0:
+            return wait
+        self._arrivals[key] = arrival
+        self._arrivals.move_to_end(key)
+        while len(self._arrivals) > self.max_buckets:
+            self._arrivals.popitem(last=False)
+        return 0
+
+
+def bucket_key(scope, subject):
+    """
+    The table key of a bucket. Subjects that can't be a key component, an id with a '#'
+    in it, are replaced by their SHA-256, so any caller supplied id still gets a bucket.
+    """
+    try:
+        bucket = RateLimitBucket(scope, subject)
+    except KeyFormatError:
+        bucket = RateLimitBucket(scope, hashlib.sha256(subject.encode('utf-8')).hexdigest())
+    return {name: {"S": value} for name, value in bucket.key.items()}
+
+
+class DynamoDBBuckets:
+    """
+    Token buckets shared by all containers, one item per bucket in the application table.
+
+    A bucket is stored as the time its next token becomes available (the generic cell
+    rate algorithm), so taking a token is a single conditional update without a read:
+    advance the time by one interval, as long as it stays within burst intervals of now.
+    A bucket idle long enough to be full is reset to now instead, which takes a second
+    update the first time a session calls after a pause. A failed condition returns the
+    stored time, so an empty bucket rejects the call after one update.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.client = table.meta.client
+
+    def take(self, scope, subject, interval, burst, now):
+        key = bucket_key(scope, subject)
+        interval_ms = max(1, int(interval * 1000))
+        now_ms = int(now * 1000)
+        limit_ms = now_ms + (burst - 1) * interval_ms
+        values = {
+            ":now": {"N": str(now_ms)},
+            ":expiration": {"N": str(int(now + burst * interval) + 3600)},
+        }
+        attempts = (
+            ("SET arrival = arrival + :interval, #ttl = :expiration", "arrival BETWEEN :now AND :limit",
+             {":interval": {"N": str(interval_ms)}, ":limit": {"N": str(limit_ms)}}),
+            ("SET arrival = :arrival, #ttl = :expiration", "attribute_not_exists(arrival) OR arrival < :now",
+             {":arrival": {"N": str(now_ms + interval_ms)}}),
+        )
+        # a concurrent call can move the bucket between the two updates, so go round again
+        for _ in range(3):
+            for update, condition, attempt_values in attempts:
+                try:
+                    self.client.update_item(
+                        TableName=self.table.name,
+                        Key=key,
+                        UpdateExpression=update,
+                        ConditionExpression=condition,
+                        ExpressionAttributeNames={"#ttl": TTL_ATTRIBUTE},
+                        ExpressionAttributeValues={**values, **attempt_values},
+                        ReturnValuesOnConditionCheckFailure="ALL_OLD",
+                    )
+                    return 0
+                except Exception as e:
+                    if error_code(e) != "ConditionalCheckFailedException":
+                        raise
+                    arrival = e.response.get("Item", {}).get("arrival")
+                # beyond the limit means the bucket is empty, whichever update was tried
+                if arrival is not None and int(arrival["N"]) > limit_ms:
+                    return (int(arrival["N"]) - limit_ms) / 1000
+        return interval
+
+
+class ToolRateLimiter:
+    """
+    Token bucket rate limiting of agent tool calls, per agent session and per citizen.
+
+    A call takes one token from the session bucket, then one from the citizen bucket
+    when the citizen is known; a bucket refills at its per minute rate up to burst
+    tokens. Calls answered from the session cache never reach the limiter.
+    """
+
+    def __init__(self, mode=DEFAULT_MODE, table=None, session_per_minute=DEFAULT_SESSION_PER_MINUTE,
+                 citizen_per_minute=DEFAULT_CITIZEN_PER_MINUTE, burst=DEFAULT_BURST):
+        if mode not in ("off", "memory", "dynamodb"):
+            raise ValueError(f"Unknown rate limit mode {mode!r}: expected off, memory or dynamodb")
+        if mode == "dynamodb" and table is None:
+            raise ValueError("The dynamodb rate limit mode needs a table")
+        self.mode = mode
+        self.burst = burst
+        self.rates = {"session": session_per_minute, "citizen": citizen_per_minute}
+        self.buckets = DynamoDBBuckets(table) if mode == "dynamodb" else MemoryBuckets()
+
+    def check(self, session_id, citizen_id=None, now=None):
+        """
+        Takes a token for a tool call.
+
+        Parameters:
+        session_id (str): The agent session id
+        citizen_id (str): The citizen making the call, when known
+        now (float): The current time in seconds, for tests
+
+        Returns:
+        Throttled: The rejection when a bucket is empty, otherwise None
+        """
+        if self.mode == "off":
+            return None
+        now = time.time() if now is None else now
+        for scope, subject in (("session", session_id), ("citizen", citizen_id)):
+            rate = self.rates[scope]
+            if not subject or rate <= 0:
+                continue
+            wait = self.buckets.take(scope, str(subject), 60.0 / rate, self.burst, now)
+            if wait > 0:
+                return Throttled(scope, wait)
+        return None
+
+
+def citizen_for_call(parameters, session_attributes):
+    """
+    The citizen a tool call acts for: the session attribute when set, as the handlers use it, else the parameter.
+    """
+    citizen_id = (session_attributes or {}).get('citizenID', '')
+    if citizen_id:
+        return citizen_id
+    for param in parameters or []:
+        if param["name"] == "citizen_id":
+            return param["value"]
+    return None
@@ -0,0 +1,157 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import os
+import time
+from collections import OrderedDict
+
+
+SESSION_ATTRIBUTE_KEY = "toolCache"
+# bumped by every write of the session, so containers holding older entries drop them
+GENERATION_ATTRIBUTE_KEY = "toolCacheGeneration"
+
+DEFAULT_TTL_SECONDS = int(os.environ.get('TOOL_CACHE_TTL_SECONDS', '300'))
+DEFAULT_MAX_SESSIONS = int(os.environ.get('TOOL_CACHE_MAX_SESSIONS', '1000'))
+DEFAULT_USE_SESSION_ATTRIBUTES = os.environ.get('TOOL_CACHE_SESSION_ATTRIBUTES', 'false').lower() == 'true'
+
+
+def normalize_parameters(parameters):
+    """
+    Builds a stable representation of the agent parameters so that the same call
+    with parameters in a different order, or with stray whitespace, hits the same entry.
+
+    Parameters:
+    parameters ([dict]): The parameters list from the agent event
+
+    Returns:
+    str: The normalized parameters
+    """
+    normalized = sorted(
+        (param["name"], str(param.get("value", "")).strip())
+        for param in (parameters or [])
+    )
+    return json.dumps(normalized, separators=(',', ':'))
+
+
+def cache_key(function, parameters):
+    return f"{function}|{normalize_parameters(parameters)}"
+
+
+class SessionToolCache:
+    """
+    Conversation scoped memoization of agent tool results.
+
+    Entries live in the warm container, keyed by sessionId, and can optionally be
+    mirrored into the agent sessionAttributes so that they survive a cold start.
+    Any write performed by the session drops all of its cached reads.
+
+    Without mirroring, a write only reaches the container that handled it. With
+    mirroring, a write also bumps a generation counter in the sessionAttributes, and
+    the entries a container holds are only served for the generation they were
+    cached under, so the next call in any container sees the write.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_sessions=DEFAULT_MAX_SESSIONS,
+                 use_session_attributes=DEFAULT_USE_SESSION_ATTRIBUTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.use_session_attributes = use_session_attributes
+        self._sessions = OrderedDict()
+
+    def _generation(self, session_attributes):
+        if not (self.use_session_attributes and session_attributes):
+            return "0"
+        return str(session_attributes.get(GENERATION_ATTRIBUTE_KEY, "0"))
+
+    def _session_entries(self, session_id, session_attributes=None):
+        generation = self._generation(session_attributes)
+        cached = self._sessions.get(session_id)
+        if cached is None or cached[0] != generation:
+            # a write in another container moved the generation, the attributes hold what is left
+            cached = (generation, self._load_from_session_attributes(session_attributes))
+            self._sessions[session_id] = cached
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return cached[1]
+
+    def _load_from_session_attributes(self, session_attributes):
+        if not (self.use_session_attributes and session_attributes):
+            return {}
+        raw = session_attributes.get(SESSION_ATTRIBUTE_KEY)
+        if not raw:
+            return {}
+        try:
+            return {key: tuple(entry) for key, entry in json.loads(raw).items()}
+        except (ValueError, TypeError):
+            return {}
+
+    def _store_to_session_attributes(self, entries, session_attributes):
+        if not self.use_session_attributes or session_attributes is None:
+            return
+        if entries:
+            session_attributes[SESSION_ATTRIBUTE_KEY] = json.dumps(entries, separators=(',', ':'))
+        else:
+            session_attributes.pop(SESSION_ATTRIBUTE_KEY, None)
+
+    def get(self, session_id, function, parameters, session_attributes=None):
+        """
+        Looks up a cached result for a tool call.
+
+        Parameters:
+        session_id (str): The agent session id
+        function (str): The tool function name
+        parameters ([dict]): The parameters list from the agent event
+        session_attributes (dict): The agent session attributes
+
+        Returns:
+        dict: The cached response body or None
+        """
+        if not session_id:
+            return None
+        entries = self._session_entries(session_id, session_attributes)
+        key = cache_key(function, parameters)
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del entries[key]
+            return None
+        return value
+
+    def put(self, session_id, function, parameters, value, session_attributes=None):
+        """
+        Stores the result for a tool call.
+
+        Parameters:
+        session_id (str): The agent session id
+        function (str): The tool function name
+        parameters ([dict]): The parameters list from the agent event
+        value (dict): The response body to cache
+        session_attributes (dict): The agent session attributes, updated in place when enabled
+        """
+        if not session_id:
+            return
+        entries = self._session_entries(session_id, session_attributes)
+        now = time.time()
+        for key in [key for key, (expires_at, _) in entries.items() if expires_at < now]:
+            del entries[key]
+        entries[cache_key(function, parameters)] = (now + self.ttl_seconds, value)
+        self._store_to_session_attributes(entries, session_attributes)
+
+    def invalidate(self, session_id, session_attributes=None):
+        """
+        Drops every cached result for a session, used after the session performs a write.
+        With mirroring enabled, the generation in the session attributes moves on too,
+        which drops the results other containers hold for the session.
+
+        Parameters:
+        session_id (str): The agent session id
+        session_attributes (dict): The agent session attributes, updated in place when enabled
+        """
+        self._sessions.pop(session_id, None)
+        if self.use_session_attributes and session_attributes is not None:
+            session_attributes[GENERATION_ATTRIBUTE_KEY] = str(int(self._generation(session_attributes)) + 1)
+        self._store_to_session_attributes({}, session_attributes)
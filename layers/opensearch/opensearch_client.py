@@ -0,0 +1,128 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import threading
+import time
+
+import boto3
+from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth, helpers
+
+
+DEFAULT_SERVICE = 'aoss'
+DEFAULT_POOL_MAXSIZE = int(os.environ.get('OPENSEARCH_POOL_MAXSIZE', '10'))
+DEFAULT_TIMEOUT = int(os.environ.get('OPENSEARCH_TIMEOUT', '30'))
+CREDENTIALS_REFRESH_SECONDS = 300
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class SessionCredentials:
+    """
+    Credentials for the SigV4 signer that are re-resolved from the boto3 session
+    periodically, so a long lived container never signs with expired keys.
+    """
+
+    def __init__(self, refresh_seconds=CREDENTIALS_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._credentials = None
+        self._resolved_at = 0
+        self._lock = threading.Lock()
+
+    def get_frozen_credentials(self):
+        with self._lock:
+            if self._credentials is None or time.monotonic() - self._resolved_at > self.refresh_seconds:
+                self._credentials = boto3.Session().get_credentials()
+                self._resolved_at = time.monotonic()
+            # refreshable credentials refresh themselves here when close to expiry
+            return self._credentials.get_frozen_credentials()
+
+    @property
+    def access_key(self):
+        return self.get_frozen_credentials().access_key
+
+    @property
+    def secret_key(self):
+        return self.get_frozen_credentials().secret_key
+
+    @property
+    def token(self):
+        return self.get_frozen_credentials().token
+
+
+def get_client(host, region=None, service=DEFAULT_SERVICE, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    """
+    Returns an OpenSearch client for the host, reusing the client and its pooled,
+    keep-alive connections across invocations of a warm container.
+
+    Parameters:
+    host (str): The endpoint, with or without the https:// prefix
+    region (str): The AWS region, defaults to AWS_REGION
+    service (str): 'aoss' for serverless collections, 'es' for managed domains
+    pool_maxsize (int): The number of pooled HTTP connections
+
+    Returns:
+    OpenSearch: The client
+    """
+    host = host.replace("https://", "").rstrip('/')
+    region = region or os.environ['AWS_REGION']
+    key = (host, region, service)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = OpenSearch(
+                    hosts=[{'host': host, 'port': 443}],
+                    http_compress=True,  # enables gzip compression for request bodies
+                    http_auth=AWSV4SignerAuth(SessionCredentials(), region, service),
+                    use_ssl=True,
+                    verify_certs=True,
+                    connection_class=RequestsHttpConnection,
+                    pool_maxsize=pool_maxsize,
+                    timeout=DEFAULT_TIMEOUT,
+                    max_retries=3,
+                    retry_on_timeout=True
+                )
+                _clients[key] = client
+    return client
+
+
+def bulk_index(client, index_name, documents, chunk_size=500, thread_count=None):
+    """
+    Indexes documents in bulk. Documents may carry an `_id`; everything else is the source.
+
+    Parameters:
+    client (OpenSearch): The client
+    index_name (str): The target index
+    documents (iterable[dict]): The documents to index
+    chunk_size (int): Documents per bulk request
+    thread_count (int): When set, bulk requests are sent in parallel over the connection pool
+
+    Returns:
+    (int, [dict]): The number of indexed documents and the errors
+    """
+    actions = ({"_index": index_name, **document} for document in documents)
+    if thread_count:
+        success = 0
+        errors = []
+        for ok, item in helpers.parallel_bulk(client, actions, chunk_size=chunk_size,
+                                              thread_count=thread_count, raise_on_error=False):
+            if ok:
+                success += 1
+            else:
+                errors.append(item)
+        return success, errors
+    return helpers.bulk(client, actions, chunk_size=chunk_size, raise_on_error=False)
+
+
+def bulk_delete(client, index_name, document_ids, chunk_size=500):
+    """
+    Deletes documents by id in bulk.
+
+    Returns:
+    (int, [dict]): The number of deleted documents and the errors
+    """
+    actions = ({"_op_type": "delete", "_index": index_name, "_id": document_id} for document_id in document_ids)
+    return helpers.bulk(client, actions, chunk_size=chunk_size, raise_on_error=False)
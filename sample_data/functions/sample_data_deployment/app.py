@@ -7,126 +7,91 @@ import cfnresponse
 import boto3
 
 
-from model import get_park_reservations, write_park_reservation, write_to_ddb
+from keys import GarbageRoute, ParkReservation
+from asset_sync import chunked_documents, sync_assets, delete_assets, get_s3_client
+from ingestion import DOCUMENTS_PREFIX, sync_knowledgebase
 
 def upload_to_knowledgebase(s3_bucket):
     print(f"Uploading data to knowledgebase bucket: {s3_bucket}")
 
-    files_to_upload = [f for f in os.listdir('assets') if f.endswith('.pdf')]
-    print(f"Files to upload: {files_to_upload}")
-
-    s3_client = boto3.client('s3')
-    for f in files_to_upload:
-        print(f"Uploading file: {f}")
-        response = s3_client.upload_file(os.path.join('assets', f), s3_bucket, f)
-        print(response)
-        print(f"Uploaded file: {f}")
+    s3_client = get_s3_client()
+    # documents preprocessed into chunks/ are only read from there
+    chunked = chunked_documents(s3_bucket, s3_client)
+    result = sync_assets(s3_bucket, 'assets', s3_client, prefix=DOCUMENTS_PREFIX, exclude=chunked)
+    print(result)
+    if result['failed']:
+        raise Exception(f"Failed to upload files: {result['failed']}")
 
     print(f"Uploads complete")
 
 def delete_samples_from_knowledgebase(s3_bucket):
     print(f"Deleting data from knowledgebase bucket: {s3_bucket}")
 
-    files_to_upload = [f for f in os.listdir('assets') if f.endswith('.pdf')]
-    print(f"Files to delete: {files_to_upload}")
-
-    s3_client = boto3.client('s3')
-    for f in files_to_upload:
-        try:
-            print(f"Deleting file: {f}")
-            response = s3_client.delete_object(
-                Bucket=s3_bucket,
-                Key=f
-            )
-            print(response)
-            print(f"Deleted file: {f}")
-        except Exception as e:
-            print(f"Exception: {e}")
-            print(f"Error deleting {f} - continuing")
+    pdfs = [f for f in os.listdir('assets') if f.endswith('.pdf')]
+    # samples were uploaded to the bucket root before the data sources were split by prefix
+    files_to_delete = [f"{DOCUMENTS_PREFIX}{f}" for f in pdfs] + pdfs
+    print(f"Files to delete: {files_to_delete}")
+
+    failed = delete_assets(s3_bucket, files_to_delete, get_s3_client())
+    if failed:
+        print(f"Error deleting {failed} - continuing")
+
+    print(f"Deletes complete")
+
+# the demo city; load test sized cities come from sample_data/generator/city_generator.py
+ROUTES = {
+    "Yellow": ['A1', 'A2', 'A3', 'A4'],
+    "Blue": ['A5', 'A6', 'B3', 'B4'],
+    "Orange": ['B1', 'B2', 'C1', 'C2'],
+    "Green": ['C3', 'C4', 'C5', 'C6'],
+    "Red": ['D3', 'D4', 'D5', 'D6'],
+}
+
+RESERVATIONS = {
+    "P1": [
+        ("2024-12-03", "C1"), ("2024-12-04", "C2"), ("2024-12-05", "C3"), ("2024-12-07", "C4"),
+        ("2024-12-08", "C5"), ("2024-12-09", "C1"), ("2024-12-10", "C1"), ("2024-12-11", "C2"),
+        ("2024-12-13", "C4"), ("2024-12-14", "C1"), ("2024-12-18", "C5"), ("2024-12-19", "C5"),
+        ("2024-12-23", "C4"), ("2024-12-24", "C11"), ("2024-12-25", "C111"), ("2024-12-26", "C109"),
+        ("2024-12-29", "C31"),
+    ],
+    "P2": [("2024-12-13", "C201")],
+    "P3": [("2024-12-12", "C10")],
+    "P4": [("2024-12-09", "C111")],
+    "P5": [("2024-12-03", "C1")],
+    "P6": [("2024-12-04", "C2")],
+    "P7": [
+        ("2024-12-05", "C3"), ("2024-12-07", "C4"), ("2024-12-08", "C5"), ("2024-12-09", "C1"),
+        ("2024-12-10", "C1"), ("2024-12-11", "C2"), ("2024-12-13", "C4"), ("2024-12-14", "C1"),
+        ("2024-12-18", "C5"), ("2024-12-19", "C5"), ("2024-12-23", "C4"), ("2024-12-24", "C11"),
+    ],
+    "P8": [
+        ("2024-12-25", "C111"), ("2024-12-26", "C109"), ("2024-12-29", "C31"), ("2024-12-13", "C201"),
+        ("2024-12-12", "C10"), ("2024-12-09", "C111"),
+    ],
+}
+
+
+def sample_items():
+    for route, district_ids in ROUTES.items():
+        for district_id in district_ids:
+            yield {**GarbageRoute(district_id).key, "data": route}
+    for park_id, reservations in RESERVATIONS.items():
+        for reservation_date, citizen_id in reservations:
+            yield {**ParkReservation(park_id, reservation_date).key, "data": citizen_id}
 
-    print(f"Uploads complete")
 
 def create_trash_routes(table_name):
     print(f"Populating records into table: {table_name}")
     table = boto3.resource('dynamodb').Table(table_name)
 
-    yellow_route = [ {"pk": f"T{district_id}#", "sk": f"T{district_id}#", "data": "Yellow"} for district_id in [
-        'A1', 'A2', 'A3', 'A4']
-    ]
-
-    blue_route = [ {"pk": f"T{district_id}#", "sk": f"T{district_id}#", "data": "Blue"} for district_id in [
-        'A5', 'A6', 'B3', 'B4']
-    ]
-
-    orange_route = [ {"pk": f"T{district_id}#", "sk": f"T{district_id}#", "data": "Orange"} for district_id in [
-        'B1', 'B2', 'C1', 'C2']
-    ]
-
-    green_route = [ {"pk": f"T{district_id}#", "sk": f"T{district_id}#", "data": "Green"} for district_id in [
-        'C3', 'C4', 'C5', 'C6']
-    ]
-
-    red_route = [{"pk": f"T{district_id}#", "sk": f"T{district_id}#", "data": "Red"} for district_id in [
-        'D3', 'D4', 'D5', 'D6']
-                   ]
-
-    items = yellow_route + blue_route + orange_route + green_route + red_route
-
-    for item in items:
-        print(f"Writing item to ddb: {item}")
-        write_to_ddb(item, table)
-        print(f"Wrote item to ddb: {item}")
-
-    write_park_reservation("P1", "2024-12-03", "C1", table)
-    write_park_reservation("P1", "2024-12-04", "C2", table)
-    write_park_reservation("P1", "2024-12-05", "C3", table)
-    write_park_reservation("P1", "2024-12-07", "C4", table)
-    write_park_reservation("P1", "2024-12-08", "C5", table)
-    write_park_reservation("P1", "2024-12-09", "C1", table)
-    write_park_reservation("P1", "2024-12-10", "C1", table)
-    write_park_reservation("P1", "2024-12-11", "C2", table)
-    write_park_reservation("P1", "2024-12-13", "C4", table)
-    write_park_reservation("P1", "2024-12-14", "C1", table)
-    write_park_reservation("P1", "2024-12-18", "C5", table)
-    write_park_reservation("P1", "2024-12-19", "C5", table)
-    write_park_reservation("P1", "2024-12-23", "C4", table)
-    write_park_reservation("P1", "2024-12-24", "C11", table)
-    write_park_reservation("P1", "2024-12-25", "C111", table)
-    write_park_reservation("P1", "2024-12-26", "C109", table)
-    write_park_reservation("P1", "2024-12-29", "C31", table)
-    write_park_reservation("P2", "2024-12-13", "C201", table)
-    write_park_reservation("P3", "2024-12-12", "C10", table)
-    write_park_reservation("P4", "2024-12-09", "C111", table)
-    write_park_reservation("P5", "2024-12-03", "C1", table)
-    write_park_reservation("P6", "2024-12-04", "C2", table)
-    write_park_reservation("P7", "2024-12-05", "C3", table)
-    write_park_reservation("P7", "2024-12-07", "C4", table)
-    write_park_reservation("P7", "2024-12-08", "C5", table)
-    write_park_reservation("P7", "2024-12-09", "C1", table)
-    write_park_reservation("P7", "2024-12-10", "C1", table)
-    write_park_reservation("P7", "2024-12-11", "C2", table)
-    write_park_reservation("P7", "2024-12-13", "C4", table)
-    write_park_reservation("P7", "2024-12-14", "C1", table)
-    write_park_reservation("P7", "2024-12-18", "C5", table)
-    write_park_reservation("P7", "2024-12-19", "C5", table)
-    write_park_reservation("P7", "2024-12-23", "C4", table)
-    write_park_reservation("P7", "2024-12-24", "C11", table)
-    write_park_reservation("P8", "2024-12-25", "C111", table)
-    write_park_reservation("P8", "2024-12-26", "C109", table)
-    write_park_reservation("P8", "2024-12-29", "C31", table)
-    write_park_reservation("P8", "2024-12-13", "C201", table)
-    write_park_reservation("P8", "2024-12-12", "C10", table)
-    write_park_reservation("P8", "2024-12-09", "C111", table)
-
-    print("Wrote items to dynamodb")
-
-def sync_knowledgebase(kb_id, datasource_id):
-    print(f"Syncing knowledgebase: {bk_id}")
-    response = client.start_ingestion_job(
-        knowledgeBaseId=bk_id,
-        dataSourceId=datasource_id
-    )
-    print(response)
+    count = 0
+    with table.batch_writer() as batch:
+        for item in sample_items():
+            batch.put_item(Item=item)
+            count += 1
+
+    print(f"Wrote {count} items to dynamodb")
 
 def prepare_agent(agent_id):
     print(f"Preparing agent: {agent_id}")
@@ -144,7 +109,8 @@ def lambda_handler(event, context):
     datasource_id = props['datasource_id']
     kb_id = props['kb_id']
 
-    if action == "Create":
+    # an update reloads the sample data and syncs again, the writes are idempotent
+    if action in ("Create", "Update"):
         try:
             print(f"Got DynamoDB Table Name: {table_name}")
 
@@ -154,12 +120,16 @@ def lambda_handler(event, context):
 
             upload_to_knowledgebase(s3_bucket)
 
+            print("Syncing knowledgebase")
+            try:
+                table = boto3.resource('dynamodb').Table(table_name)
+                print(sync_knowledgebase(kb_id, datasource_id, s3_bucket, table, prefix=DOCUMENTS_PREFIX))
+            except Exception as e:
+                print(f"Error syncing knowledgebase {kb_id} - continuing: {e}")
+
             print("Sending success response to cloudformation")
             cfnresponse.send(event, context, cfnresponse.SUCCESS, {"response": "OK"}, f"sample_data_{s3_bucket}_{table_name}")
 
-            # print("Syncing knowledgebase")
-            # sync_knowledgebase(kb_id, datasource_id)
-            #
             # print("Preparing agent")
             # prepare_agent(agent_id)
         except:
@@ -0,0 +1,205 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+
+MB = 1024 * 1024
+
+MAX_WORKERS = int(os.environ.get('ASSET_SYNC_MAX_WORKERS', '8'))
+DELETE_BATCH_SIZE = 1000  # the limit for a single s3 delete_objects call
+# written by knowledgebase/preprocessing/chunk_documents.py, {document: [chunk hash]}
+CHUNK_INDEX_KEY = "chunk-index.json"
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * MB,
+    multipart_chunksize=16 * MB,
+    max_concurrency=4,
+    use_threads=True
+)
+
+
+def get_s3_client():
+    # every upload thread can hold several multipart connections, size the pool for all of them
+    return boto3.client(
+        's3',
+        config=Config(max_pool_connections=MAX_WORKERS * TRANSFER_CONFIG.max_concurrency)
+    )
+
+
+def compute_etag(path, transfer_config=TRANSFER_CONFIG):
+    """
+    Computes the ETag S3 will assign to a file uploaded with the given transfer config.
+
+    Parameters:
+    path (str): The local file path
+    transfer_config (TransferConfig): The transfer config used for the upload
+
+    Returns:
+    str: The expected ETag, without quotes
+    """
+    size = os.path.getsize(path)
+    chunk_size = transfer_config.multipart_chunksize
+    with open(path, 'rb') as f:
+        if size < transfer_config.multipart_threshold:
+            return hashlib.md5(f.read()).hexdigest()
+        part_digests = []
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            part_digests.append(hashlib.md5(chunk).digest())
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+def build_local_manifest(directory, suffix='.pdf', prefix='', exclude=()):
+    """
+    Builds a manifest of the local assets.
+
+    Parameters:
+    directory (str): The directory holding the assets
+    suffix (str): Only files with this suffix are included
+    prefix (str): The key prefix the assets are uploaded under
+    exclude (set): File names to leave out
+
+    Returns:
+    dict: Map of object key to {"path": str, "etag": str}
+    """
+    manifest = {}
+    for f in sorted(os.listdir(directory)):
+        if f.endswith(suffix) and f not in exclude:
+            path = os.path.join(directory, f)
+            manifest[f"{prefix}{f}"] = {"path": path, "etag": compute_etag(path)}
+    return manifest
+
+
+def build_remote_manifest(s3_bucket, s3_client, prefix=''):
+    """
+    Lists the objects already in the bucket.
+
+    Returns:
+    dict: Map of object key to ETag, without quotes
+    """
+    manifest = {}
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=s3_bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            manifest[obj['Key']] = obj['ETag'].strip('"')
+    return manifest
+
+
+def chunked_documents(s3_bucket, s3_client):
+    """
+    The documents the knowledge base reads as preprocessed chunks, from the chunk index.
+    Their raw copies were removed when they were chunked and must not be uploaded again,
+    or the knowledge base would embed both.
+
+    Returns:
+    set: The document file names
+    """
+    try:
+        return set(json.loads(s3_client.get_object(Bucket=s3_bucket, Key=CHUNK_INDEX_KEY)['Body'].read()))
+    except s3_client.exceptions.NoSuchKey:
+        return set()
+
+
+def diff_manifests(local_manifest, remote_manifest):
+    """
+    Works out which local assets need to be uploaded.
+
+    Returns:
+    ([str], [str]): The keys to upload and the keys that are unchanged
+    """
+    to_upload = []
+    unchanged = []
+    for key, entry in local_manifest.items():
+        if remote_manifest.get(key) == entry['etag']:
+            unchanged.append(key)
+        else:
+            to_upload.append(key)
+    return to_upload, unchanged
+
+
+def upload_assets(s3_bucket, local_manifest, keys, s3_client, max_workers=MAX_WORKERS):
+    """
+    Uploads the given keys in parallel using multipart transfers for large files.
+
+    Returns:
+    [str]: The keys that failed to upload
+    """
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                s3_client.upload_file,
+                local_manifest[key]['path'],
+                s3_bucket,
+                key,
+                Config=TRANSFER_CONFIG
+            ): key for key in keys
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                future.result()
+                print(f"Uploaded file: {key}")
+            except Exception as e:
+                print(f"Error uploading {key}: {e}")
+                failed.append(key)
+    return failed
+
+
+def delete_assets(s3_bucket, keys, s3_client):
+    """
+    Deletes the given keys in batches using delete_objects.
+
+    Returns:
+    [str]: The keys that failed to delete
+    """
+    failed = []
+    for i in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[i:i + DELETE_BATCH_SIZE]
+        response = s3_client.delete_objects(
+            Bucket=s3_bucket,
+            Delete={
+                'Objects': [{'Key': key} for key in batch],
+                'Quiet': True
+            }
+        )
+        for error in response.get('Errors', []):
+            print(f"Error deleting {error['Key']}: {error.get('Message')}")
+            failed.append(error['Key'])
+    return failed
+
+
+def sync_assets(s3_bucket, directory, s3_client=None, prefix='', exclude=()):
+    """
+    Uploads new and changed assets, skipping files whose ETag already matches the bucket.
+
+    Parameters:
+    s3_bucket (str): The destination bucket
+    directory (str): The directory holding the assets
+    s3_client: Optional s3 client
+    prefix (str): The key prefix to upload under
+    exclude (set): File names not to upload, such as the chunked documents
+
+    Returns:
+    dict: Summary of the uploaded, unchanged, excluded and failed keys
+    """
+    s3_client = s3_client or get_s3_client()
+    local_manifest = build_local_manifest(directory, prefix=prefix, exclude=exclude)
+    remote_manifest = build_remote_manifest(s3_bucket, s3_client, prefix)
+    to_upload, unchanged = diff_manifests(local_manifest, remote_manifest)
+    print(f"Files to upload: {to_upload}, unchanged: {unchanged}")
+
+    failed = upload_assets(s3_bucket, local_manifest, to_upload, s3_client)
+    return {
+        "uploaded": [key for key in to_upload if key not in failed],
+        "unchanged": unchanged,
+        "excluded": sorted(exclude),
+        "failed": failed
+    }
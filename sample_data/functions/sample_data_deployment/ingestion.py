@@ -0,0 +1,342 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import time
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+from asset_sync import build_remote_manifest
+
+
+# the raw documents data source and the preprocessed chunks data source read these prefixes of the bucket
+DOCUMENTS_PREFIX = "documents/"
+CHUNKS_PREFIX = "chunks/"
+
+ACTIVE_JOB_STATUSES = ("STARTING", "IN_PROGRESS", "STOPPING")
+TERMINAL_JOB_STATUSES = ("COMPLETE", "FAILED", "STOPPED")
+
+
+# each manifest page stays well under the 400 KB DynamoDB item limit
+MANIFEST_PAGE_BYTES = 256 * 1024
+
+
+def corpus_state_key(kb_id, datasource_id):
+    return {"pk": f"#KB{kb_id}#", "sk": f"#KB{kb_id}#D{datasource_id}#"}
+
+
+def manifest_page_prefix(kb_id, datasource_id, corpus_hash):
+    return f"#KB{kb_id}#D{datasource_id}#M{corpus_hash}#"
+
+
+def hash_manifest(manifest):
+    """
+    Hashes a {key: etag} manifest into a single corpus fingerprint.
+    """
+    digest = hashlib.sha256()
+    for key in sorted(manifest):
+        digest.update(f"{key}\0{manifest[key]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def diff_corpus(previous, current):
+    """
+    Compares two {key: etag} manifests.
+
+    Returns:
+    dict: The added, changed and removed keys
+    """
+    return {
+        "added": sorted(key for key in current if key not in previous),
+        "changed": sorted(key for key in current if key in previous and previous[key] != current[key]),
+        "removed": sorted(key for key in previous if key not in current),
+    }
+
+
+def paginate_manifest(manifest, page_bytes=MANIFEST_PAGE_BYTES):
+    """
+    Splits a manifest into JSON documents of at most page_bytes each.
+    """
+    pages = []
+    page = {}
+    size = 2
+    for key in sorted(manifest):
+        entry_size = len(json.dumps({key: manifest[key]}).encode('utf-8'))
+        if page and size + entry_size > page_bytes:
+            pages.append(json.dumps(page))
+            page = {}
+            size = 2
+        page[key] = manifest[key]
+        size += entry_size
+    pages.append(json.dumps(page))
+    return pages
+
+
+def query_manifest_pages(kb_id, datasource_id, corpus_hash, table):
+    pk = corpus_state_key(kb_id, datasource_id)['pk']
+    kwargs = {
+        "KeyConditionExpression": Key('pk').eq(pk)
+        & Key('sk').begins_with(manifest_page_prefix(kb_id, datasource_id, corpus_hash))
+    }
+    while True:
+        response = table.query(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def load_manifest(kb_id, datasource_id, corpus_hash, table):
+    manifest = {}
+    if corpus_hash:
+        for item in query_manifest_pages(kb_id, datasource_id, corpus_hash, table):
+            manifest.update(json.loads(item['data']))
+    return manifest
+
+
+def save_manifest(kb_id, datasource_id, manifest, table):
+    """
+    Stores a manifest as pages under its corpus hash, so the manifest of a running job
+    never overwrites the one last ingested.
+    """
+    prefix = manifest_page_prefix(kb_id, datasource_id, hash_manifest(manifest))
+    pk = corpus_state_key(kb_id, datasource_id)['pk']
+    with table.batch_writer() as batch:
+        for i, page in enumerate(paginate_manifest(manifest)):
+            batch.put_item(Item={"pk": pk, "sk": f"{prefix}{i:05d}#", "data": page})
+
+
+def delete_manifest(kb_id, datasource_id, corpus_hash, table):
+    items = list(query_manifest_pages(kb_id, datasource_id, corpus_hash, table)) if corpus_hash else []
+    with table.batch_writer() as batch:
+        for item in items:
+            batch.delete_item(Key={'pk': item['pk'], 'sk': item['sk']})
+
+
+def load_corpus_state(kb_id, datasource_id, table):
+    """
+    Returns:
+    dict: The hash and job of the last completed ingestion, and the job still to be
+          reconciled as {"job_id", "corpus_hash"}, if any
+    """
+    response = table.get_item(Key=corpus_state_key(kb_id, datasource_id))
+    item = response.get('Item')
+    if not item:
+        return {"corpus_hash": None, "job_id": None, "pending": None}
+    return json.loads(item['data'])
+
+
+def save_corpus_state(kb_id, datasource_id, state, table):
+    table.put_item(Item={
+        **corpus_state_key(kb_id, datasource_id),
+        "data": json.dumps({**state, "updated_at": int(time.time())})
+    })
+
+
+def find_active_ingestion_job(kb_id, datasource_id, bedrock_agent_client):
+    response = bedrock_agent_client.list_ingestion_jobs(
+        knowledgeBaseId=kb_id,
+        dataSourceId=datasource_id,
+        filters=[{"attribute": "STATUS", "operator": "EQ", "values": list(ACTIVE_JOB_STATUSES)}],
+        maxResults=1
+    )
+    jobs = response.get('ingestionJobSummaries', [])
+    return jobs[0]['ingestionJobId'] if jobs else None
+
+
+def reconcile_ingestion_job(kb_id, datasource_id, state, status, table):
+    """
+    Settles the pending job once it reached a terminal status. A completed job makes
+    its manifest the ingested one; a failed or stopped job is dropped, so its changes
+    are picked up again by the next sync.
+
+    Returns:
+    dict: The updated corpus state
+    """
+    pending = state['pending']
+    if status == "COMPLETE":
+        print(f"Ingestion job {pending['job_id']} completed")
+        stale_hash = state['corpus_hash']
+        state = {"corpus_hash": pending['corpus_hash'], "job_id": pending['job_id'], "pending": None}
+    else:
+        print(f"Ingestion job {pending['job_id']} ended {status}, its changes will be ingested again")
+        stale_hash = pending['corpus_hash']
+        state = {**state, "pending": None}
+    save_corpus_state(kb_id, datasource_id, state, table)
+    if stale_hash != state['corpus_hash']:
+        delete_manifest(kb_id, datasource_id, stale_hash, table)
+    return state
+
+
+def sync_knowledgebase(kb_id, datasource_id, s3_bucket, table, bedrock_agent_client=None, s3_client=None,
+                       prefix='', wait_seconds=0):
+    """
+    Starts an ingestion job only when the documents in the knowledge base bucket changed
+    since the last completed ingestion.
+
+    The corpus state only moves forward once a job is COMPLETE. A started job is stored
+    as pending and settled by the next call, or by this one when wait_seconds allows it
+    to finish. While a job is running nothing new is started, so a burst of uploads is
+    coalesced into the job that follows.
+
+    Parameters:
+    kb_id (str): The knowledge base id
+    datasource_id (str): The data source id
+    s3_bucket (str): The knowledge base bucket
+    table: The DynamoDB table storing the last ingested corpus state
+    prefix (str): Only objects under this prefix belong to the data source
+    wait_seconds (int): How long to wait for a started job to finish
+
+    Returns:
+    dict: The detected changes, the status, and the job id when a job is involved
+    """
+    bedrock_agent_client = bedrock_agent_client or boto3.client('bedrock-agent')
+    s3_client = s3_client or boto3.client('s3')
+
+    print(f"Syncing knowledgebase: {kb_id}")
+    state = load_corpus_state(kb_id, datasource_id, table)
+    if state['pending']:
+        job_id = state['pending']['job_id']
+        job = bedrock_agent_client.get_ingestion_job(
+            knowledgeBaseId=kb_id, dataSourceId=datasource_id, ingestionJobId=job_id
+        )['ingestionJob']
+        if job['status'] not in TERMINAL_JOB_STATUSES:
+            print(f"Ingestion job {job_id} is {job['status']}, deferring changes")
+            return {"changes": None, "job_id": job_id, "status": "DEFERRED"}
+        state = reconcile_ingestion_job(kb_id, datasource_id, state, job['status'], table)
+
+    manifest = build_remote_manifest(s3_bucket, s3_client, prefix)
+    corpus_hash = hash_manifest(manifest)
+    if corpus_hash == state['corpus_hash']:
+        print(f"Knowledgebase {kb_id} is up to date")
+        return {"changes": diff_corpus(manifest, manifest), "job_id": None, "status": "UNCHANGED"}
+
+    changes = diff_corpus(load_manifest(kb_id, datasource_id, state['corpus_hash'], table), manifest)
+    # a job started outside this coordinator, from the console for example
+    active_job_id = find_active_ingestion_job(kb_id, datasource_id, bedrock_agent_client)
+    if active_job_id:
+        print(f"Ingestion job {active_job_id} is running, deferring changes {changes}")
+        return {"changes": changes, "job_id": active_job_id, "status": "DEFERRED"}
+
+    save_manifest(kb_id, datasource_id, manifest, table)
+    response = bedrock_agent_client.start_ingestion_job(
+        knowledgeBaseId=kb_id,
+        dataSourceId=datasource_id
+    )
+    job_id = response['ingestionJob']['ingestionJobId']
+    print(f"Started ingestion job {job_id} for changes {changes}")
+    state = {**state, "pending": {"job_id": job_id, "corpus_hash": corpus_hash}}
+    save_corpus_state(kb_id, datasource_id, state, table)
+    result = {"changes": changes, "job_id": job_id, "status": "STARTED"}
+
+    if wait_seconds > 0:
+        try:
+            job = asyncio.run(wait_for_ingestion_job(
+                kb_id, datasource_id, job_id, bedrock_agent_client, timeout=wait_seconds
+            ))
+        except TimeoutError as e:
+            print(f"{e}, the next sync reconciles it")
+            return result
+        reconcile_ingestion_job(kb_id, datasource_id, state, job['status'], table)
+        result.update(status=job['status'])
+    return result
+
+
+async def wait_for_ingestion_job(kb_id, datasource_id, job_id, bedrock_agent_client=None,
+                                 initial_delay=2, max_delay=30, timeout=3600):
+    """
+    Polls an ingestion job with exponential backoff without blocking the event loop.
+
+    Returns:
+    dict: The final ingestion job description
+    """
+    bedrock_agent_client = bedrock_agent_client or boto3.client('bedrock-agent')
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        response = await asyncio.to_thread(
+            bedrock_agent_client.get_ingestion_job,
+            knowledgeBaseId=kb_id,
+            dataSourceId=datasource_id,
+            ingestionJobId=job_id
+        )
+        job = response['ingestionJob']
+        if job['status'] in TERMINAL_JOB_STATUSES:
+            return job
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(f"Ingestion job {job_id} still {job['status']} after {timeout} seconds")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def lambda_handler(event, context):
+    """
+    Syncs the knowledge base data sources on S3 object events from its bucket, and on a
+    schedule so a deferred burst of changes and the pending jobs are settled once the
+    uploads stop. Reserved concurrency of one keeps two syncs from starting jobs at the
+    same time.
+    """
+    print(event)
+    table = boto3.resource('dynamodb').Table(os.environ['TABLE_NAME'])
+    data_sources = (
+        (os.environ['DATA_SOURCE_ID'], DOCUMENTS_PREFIX),
+        (os.environ['CHUNKS_DATA_SOURCE_ID'], CHUNKS_PREFIX),
+    )
+    results = {}
+    for datasource_id, prefix in data_sources:
+        results[datasource_id] = sync_knowledgebase(
+            os.environ['KNOWLEDGE_BASE_ID'], datasource_id, os.environ['KNOWLEDGE_BASE_BUCKET'], table, prefix=prefix
+        )
+    print(results)
+    return results
+
+
+class LocalBedrockAgentClient:
+    """
+    In memory stand in for the bedrock-agent ingestion job API, for running the
+    coordinator locally. A job completes after `polls_to_complete` status checks.
+    """
+
+    def __init__(self, polls_to_complete=2):
+        self.polls_to_complete = polls_to_complete
+        self.jobs = {}
+        self._ids = itertools.count(1)
+
+    def start_ingestion_job(self, knowledgeBaseId, dataSourceId, **kwargs):
+        job_id = f"JOB{next(self._ids):06d}"
+        self.jobs[job_id] = {
+            "ingestionJobId": job_id,
+            "knowledgeBaseId": knowledgeBaseId,
+            "dataSourceId": dataSourceId,
+            "status": "STARTING",
+            "polls": 0
+        }
+        return {"ingestionJob": self._describe(job_id)}
+
+    def get_ingestion_job(self, knowledgeBaseId, dataSourceId, ingestionJobId):
+        job = self.jobs[ingestionJobId]
+        job['polls'] += 1
+        if job['status'] in ACTIVE_JOB_STATUSES:
+            job['status'] = "COMPLETE" if job['polls'] >= self.polls_to_complete else "IN_PROGRESS"
+        return {"ingestionJob": self._describe(ingestionJobId)}
+
+    def list_ingestion_jobs(self, knowledgeBaseId, dataSourceId, filters=None, maxResults=None, **kwargs):
+        statuses = None
+        for f in filters or []:
+            if f['attribute'] == "STATUS":
+                statuses = f['values']
+        summaries = [
+            self._describe(job_id) for job_id, job in self.jobs.items()
+            if job['knowledgeBaseId'] == knowledgeBaseId
+            and job['dataSourceId'] == dataSourceId
+            and (statuses is None or job['status'] in statuses)
+        ]
+        return {"ingestionJobSummaries": summaries[:maxResults]}
+
+    def _describe(self, job_id):
+        return {key: value for key, value in self.jobs[job_id].items() if key != 'polls'}
@@ -0,0 +1,363 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Synthesizes a city in the single table format for load testing the action groups:
+districts on garbage routes, citizen profiles, years of park reservations with seasonal
+and weekend demand, capacity limited bulk pickups, and form templates with submissions.
+
+Items are generated lazily and streamed either into the table with batch writes or
+into gzipped DynamoDB JSON files that DynamoDB's import from S3 reads. The work is
+split over processes by route, park, form template and block of citizens, and every
+one of them draws from its own seeded random stream, so a dataset is identical for
+any number of workers.
+
+    python sample_data/generator/city_generator.py --parks 2000 --years 3 --export-dir city --workers 8
+    python sample_data/generator/city_generator.py --preset small --table my-table
+    python sample_data/generator/city_generator.py --parks 2000 --years 3 --estimate
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'layers', 'model'))
+
+from keys import (  # noqa: E402
+    BulkPickupCounter, BulkPickupRequest, Citizen, FormField, FormTemplate, FormTemplateSchema, FormVersion,
+    GarbageRoute, ParkReservation,
+)
+from pickup_scheduler import home_shard, shard_capacities  # noqa: E402
+
+
+PRESETS = {
+    "small": {"districts": 20, "citizens": 1_000, "parks": 10, "years": 1, "form_templates": 2},
+    "medium": {"districts": 200, "citizens": 100_000, "parks": 2_000, "years": 3, "form_templates": 20},
+    "large": {"districts": 2_000, "citizens": 2_000_000, "parks": 50_000, "years": 5, "form_templates": 100},
+}
+
+DEFAULTS = {
+    "districts": 20,
+    "routes": ["Yellow", "Blue", "Orange", "Green", "Red"],
+    "citizens": 1_000,
+    "parks": 10,
+    "years": 1,
+    "start_date": "2024-01-01",
+    "reservation_rate": 0.25,
+    "bulk_pickups_per_citizen_year": 0.5,
+    "bulk_pickup_capacity": 20,
+    "bulk_pickup_shards": 4,
+    "form_templates": 2,
+    "form_fields": 8,
+    "form_submissions_per_citizen": 0.05,
+    "seed": 7,
+}
+
+FIRST_NAMES = ["Ana", "Ben", "Chen", "Dana", "Eli", "Fatima", "Gus", "Hana", "Ivan", "Jo", "Kofi", "Lena", "Mateo", "Nia"]
+LAST_NAMES = ["Garcia", "Smith", "Nguyen", "Okafor", "Kowalski", "Haddad", "Tanaka", "Silva", "Brown", "Rossi"]
+FIELD_TYPES = ["text", "date", "number", "checkbox", "signature"]
+# citizens are drawn, and split over workers, in blocks of this many
+CITIZEN_BLOCK = 10_000
+
+# demand multipliers: summer peak, quiet winter, busy weekends
+MONTH_FACTOR = 1 + 0.6 * np.cos(2 * np.pi * (np.arange(1, 13) - 7) / 12)
+WEEKDAY_FACTOR = np.array([0.8, 0.8, 0.8, 0.9, 1.1, 1.8, 1.7])
+
+
+def rng_for(seed, kind, index):
+    """
+    Independent random stream per entity, so output does not depend on worker count.
+    """
+    return np.random.default_rng([seed, zlib.crc32(kind.encode()), index])
+
+
+def city_config(**overrides):
+    config = dict(DEFAULTS)
+    config.update({name: value for name, value in overrides.items() if value is not None})
+    return config
+
+
+def calendar(config):
+    start = datetime.date.fromisoformat(config["start_date"])
+    days = np.arange(np.datetime64(start), np.datetime64(start.replace(year=start.year + config["years"])))
+    # 1970-01-01 was a Thursday, weekday 3 counting from Monday
+    weekday = (days.astype(np.int64) + 3) % 7
+    month = days.astype("datetime64[M]").astype(np.int64) % 12
+    return days.astype(str).tolist(), weekday, MONTH_FACTOR[month] * WEEKDAY_FACTOR[weekday]
+
+
+def district_id(index):
+    return f"D{index + 1}"
+
+
+def citizen_id(index):
+    return str(index + 1)
+
+
+def route_items(config, route_index, days, weekday):
+    """
+    The districts on one route, their citizens' bulk pickups and the route's pickup counters.
+    """
+    route = config["routes"][route_index]
+    shards = config["bulk_pickup_shards"]
+    capacities = shard_capacities(config["bulk_pickup_capacity"], shards)
+    booked = np.zeros((len(days), shards), dtype=np.int32)
+    workdays = np.flatnonzero(weekday < 5)
+
+    for index in range(route_index, config["districts"], len(config["routes"])):
+        yield GarbageRoute(district_id(index)).key | {"data": route}
+        # one stream per district, drawn for all of its citizens at once
+        rng = rng_for(config["seed"], "bulk", index)
+        citizens = np.arange(index, config["citizens"], config["districts"])
+        counts = rng.poisson(config["bulk_pickups_per_citizen_year"] * config["years"], len(citizens))
+        requests = np.unique(np.stack([
+            np.repeat(citizens, counts), workdays[rng.integers(0, len(workdays), counts.sum())],
+        ], axis=1), axis=0)
+        for citizen, day in requests.tolist():
+            cid = citizen_id(citizen)
+            start = home_shard(cid, shards)
+            for offset in range(shards):
+                shard = (start + offset) % shards
+                if booked[day, shard] < capacities[shard]:
+                    booked[day, shard] += 1
+                    yield BulkPickupRequest.decoded(route, start, days[day], cid).key | {"data": cid}
+                    break
+
+    for day, shard in zip(*(axis.tolist() for axis in np.nonzero(booked))):
+        yield BulkPickupCounter.decoded(route, shard, days[day]).key | {"booked": int(booked[day, shard])}
+
+
+def park_popularity(rng):
+    """
+    How much busier than average a park is, the first draw of its random stream.
+    """
+    return rng.lognormal(0, 0.5)
+
+
+def park_items(config, park, days, demand):
+    """
+    One park's reservations, at most one per day, drawn against its seasonal demand.
+    """
+    rng = rng_for(config["seed"], "park", park)
+    popularity = park_popularity(rng)
+    probability = np.minimum(config["reservation_rate"] * popularity * demand, 0.95)
+    reserved = np.flatnonzero(rng.random(len(days)) < probability)
+    holders = rng.integers(0, config["citizens"], len(reserved))
+    park_id = f"P{park + 1}"
+    for day, holder in zip(reserved.tolist(), holders.tolist()):
+        yield ParkReservation.decoded(park_id, days[day]).key | {"data": citizen_id(holder)}
+
+
+def form_items(config, template, days):
+    """
+    A form template with its schema and submitted versions.
+    """
+    rng = rng_for(config["seed"], "form", template)
+    template_id = f"T{template + 1}"
+    fields = [
+        {"id": f"field_{i + 1}", "name": f"Field {i + 1}", "type": FIELD_TYPES[rng.integers(len(FIELD_TYPES))], "required": bool(i < 2)}
+        for i in range(config["form_fields"])
+    ]
+    yield FormTemplate(template_id).key | {"data": f"Created {days[0]}"}
+    yield FormTemplateSchema(template_id).key | {
+        "data": json.dumps({"v": 1, "fields": fields}, separators=(",", ":")), "schema_version": 1,
+    }
+    submissions = rng.binomial(config["citizens"], config["form_submissions_per_citizen"] / config["form_templates"])
+    epoch = datetime.datetime(1970, 1, 1)
+    for n, holder in enumerate(rng.integers(0, config["citizens"], submissions)):
+        cid = citizen_id(holder)
+        version_id = f"v{template + 1}x{n + 1}"
+        submitted = datetime.datetime.fromisoformat(days[rng.integers(len(days))])
+        yield FormVersion(template_id, cid, version_id).key | {
+            "data": "SUBMITTED", "submitted_at": int((submitted - epoch).total_seconds()),
+        }
+        for field in fields:
+            yield FormField(template_id, cid, version_id, field["id"]).key | {"data": f"{field['name']} of {cid}"}
+
+
+def citizen_profiles(config, block):
+    """
+    One block of citizen profiles, in the format of assets/citizens.py.
+    """
+    rng = rng_for(config["seed"], "citizens", block)
+    indices = range(block * CITIZEN_BLOCK, min((block + 1) * CITIZEN_BLOCK, config["citizens"]))
+    first_names = rng.integers(len(FIRST_NAMES), size=len(indices)).tolist()
+    last_names = rng.integers(len(LAST_NAMES), size=len(indices)).tolist()
+    for index, first, last in zip(indices, first_names, last_names):
+        yield {
+            "citizen_id": citizen_id(index),
+            "district_id": district_id(index % config["districts"]),
+            "name": f"{FIRST_NAMES[first]} {LAST_NAMES[last]}",
+        }
+
+
+def citizen_blocks(config):
+    return -(-config["citizens"] // CITIZEN_BLOCK)
+
+
+def citizen_items(config, block):
+    for profile in citizen_profiles(config, block):
+        yield Citizen(profile["citizen_id"]).key | {"data": profile["name"], "district_id": profile["district_id"]}
+
+
+def generate_city(config, shard=0, shards=1):
+    """
+    Streams the items of one shard of the city.
+
+    Yields:
+    dict: Table items with pk, sk and their attributes
+    """
+    days, weekday, demand = calendar(config)
+    for route_index in range(shard, len(config["routes"]), shards):
+        yield from route_items(config, route_index, days, weekday)
+    for park in range(shard, config["parks"], shards):
+        yield from park_items(config, park, days, demand)
+    for template in range(shard, config["form_templates"], shards):
+        yield from form_items(config, template, days)
+    for block in range(shard, citizen_blocks(config), shards):
+        yield from citizen_items(config, block)
+
+
+def generate_citizens(config):
+    """
+    Every citizen profile, which the load generator replays with --citizens-file.
+    """
+    for block in range(citizen_blocks(config)):
+        yield from citizen_profiles(config, block)
+
+
+def estimate_items(config):
+    """
+    Expected item counts per entity type, without generating anything.
+    """
+    days, weekday, demand = calendar(config)
+    pickups = config["citizens"] * config["bulk_pickups_per_citizen_year"] * config["years"]
+    # every booked route, day and shard has a counter
+    counters = min(len(config["routes"]) * int((weekday < 5).sum()) * config["bulk_pickup_shards"], pickups)
+    submissions = config["citizens"] * config["form_submissions_per_citizen"]
+    # each park's popularity is drawn first from its own stream, so replay just that draw
+    reservations = sum(
+        float(np.minimum(config["reservation_rate"] * park_popularity(rng_for(config["seed"], "park", park)) * demand, 0.95).sum())
+        for park in range(config["parks"])
+    )
+    estimate = {
+        "districts": config["districts"],
+        "citizens": config["citizens"],
+        "bulk_pickups": int(pickups),
+        "bulk_pickup_counters": int(counters),
+        "park_reservations": int(reservations),
+        "form_items": int(config["form_templates"] * 2 + submissions * (1 + config["form_fields"])),
+    }
+    estimate["total"] = sum(estimate.values())
+    return estimate
+
+
+def to_dynamodb_json(item):
+    return {
+        name: {"N": str(value)} if isinstance(value, (int, float)) and not isinstance(value, bool) else {"S": str(value)}
+        for name, value in item.items()
+    }
+
+
+def write_export(items, directory, shard, items_per_file=1_000_000):
+    """
+    Writes items as gzipped DynamoDB JSON, one {"Item": ...} per line, rolling files every items_per_file.
+
+    Returns:
+    int: The number of items written
+    """
+    os.makedirs(directory, exist_ok=True)
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    written = 0
+    f = None
+    try:
+        for item in items:
+            if written % items_per_file == 0:
+                if f:
+                    f.close()
+                name = f"part-{shard:04d}-{written // items_per_file:05d}.json.gz"
+                f = gzip.open(os.path.join(directory, name), "wt", compresslevel=6)
+            f.write(encode({"Item": to_dynamodb_json(item)}) + "\n")
+            written += 1
+    finally:
+        if f:
+            f.close()
+    return written
+
+
+def write_table(items, table_name):
+    """
+    Streams items into the table with the batch writer, 25 items per request with unprocessed items retried.
+
+    Returns:
+    int: The number of items written
+    """
+    import boto3
+    from botocore.config import Config
+
+    table = boto3.resource("dynamodb", config=Config(retries={"mode": "adaptive", "max_attempts": 10})).Table(table_name)
+    written = 0
+    with table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as batch:
+        for item in items:
+            batch.put_item(Item=item)
+            written += 1
+    return written
+
+
+def run_shard(config, shard, shards, export_dir=None, table_name=None, items_per_file=1_000_000):
+    items = generate_city(config, shard, shards)
+    if export_dir:
+        return write_export(items, export_dir, shard, items_per_file)
+    return write_table(items, table_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS))
+    for name, value in DEFAULTS.items():
+        if name == "routes":
+            parser.add_argument("--routes", type=lambda text: text.split(","), help="comma separated route names")
+        else:
+            parser.add_argument(f"--{name.replace('_', '-')}", type=type(value))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--items-per-file", type=int, default=1_000_000)
+    parser.add_argument("--citizens-file", help="also write citizen profiles as JSON lines, for the load generator's --citizens-file")
+    parser.add_argument("--estimate", action="store_true", help="only print the expected item counts")
+    sink = parser.add_mutually_exclusive_group()
+    sink.add_argument("--export-dir", help="write gzipped DynamoDB JSON files here")
+    sink.add_argument("--table", help="batch write into this DynamoDB table")
+    args = parser.parse_args()
+
+    overrides = dict(PRESETS.get(args.preset, {}))
+    overrides.update({name: getattr(args, name) for name in DEFAULTS if getattr(args, name) is not None})
+    config = city_config(**overrides)
+
+    print(json.dumps(estimate_items(config)))
+    if args.estimate:
+        return
+    if not (args.export_dir or args.table):
+        parser.error("one of --export-dir or --table is required")
+
+    if args.citizens_file:
+        with open(args.citizens_file, "w") as f:
+            for citizen in generate_citizens(config):
+                f.write(json.dumps(citizen) + "\n")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(run_shard, config, shard, args.workers, args.export_dir, args.table, args.items_per_file)
+            for shard in range(args.workers)
+        ]
+        total = sum(future.result() for future in futures)
+    print(f"Wrote {total} items to {args.export_dir or args.table}")
+
+
+if __name__ == "__main__":
+    main()
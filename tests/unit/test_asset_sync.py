@@ -0,0 +1,77 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import io
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("boto3")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'sample_data', 'functions', 'sample_data_deployment'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'knowledgebase', 'preprocessing'))
+
+from asset_sync import chunked_documents, compute_etag, sync_assets  # noqa: E402
+from chunk_documents import upload_chunks  # noqa: E402
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class LocalS3:
+    """
+    Stand in for the s3 client covering the calls of the asset sync and the chunk upload.
+    """
+    exceptions = SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        yield {"Contents": [
+            {"Key": key, "ETag": f'"{etag}"'} for key, (etag, _) in sorted(self.objects.items()) if key.startswith(Prefix)
+        ]}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        return {"Body": io.BytesIO(self.objects[Key][1])}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = ("etag", Body)
+
+    def upload_file(self, path, bucket, key, Config=None):
+        with open(path, 'rb') as f:
+            self.objects[key] = (compute_etag(path), f.read())
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete['Objects']:
+            self.objects.pop(obj['Key'], None)
+        return {}
+
+
+def test_chunked_documents_are_not_uploaded_again(tmp_path):
+    for name in ("a.pdf", "b.pdf"):
+        (tmp_path / name).write_bytes(name.encode())
+    s3 = LocalS3()
+
+    # the first deployment uploads both documents, then a.pdf is preprocessed into chunks
+    assert sorted(sync_assets("kb", str(tmp_path), s3, prefix="documents/")["uploaded"]) == [
+        "documents/a.pdf", "documents/b.pdf"
+    ]
+    chunks = [{"hash": "h1", "text": "Park rules", "source": "a.pdf", "section": None, "page": 1, "sources": ["a.pdf"]}]
+    upload_chunks(chunks, ["a.pdf"], "kb", {}, max_workers=1, s3_client=s3)
+    assert "documents/a.pdf" not in s3.objects
+
+    # an update of the deployment leaves the chunked document out of documents/
+    result = sync_assets("kb", str(tmp_path), s3, prefix="documents/", exclude=chunked_documents("kb", s3))
+
+    assert result["uploaded"] == [] and result["excluded"] == ["a.pdf"]
+    assert sorted(key for key in s3.objects if key.startswith("documents/")) == ["documents/b.pdf"]
+    assert "chunks/h1.txt" in s3.objects
@@ -0,0 +1,43 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'knowledgebase', 'preprocessing'))
+
+from chunk_documents import metadata_sidecar, plan_chunk_upload  # noqa: E402
+
+
+def chunk(chunk_hash, *sources):
+    return {"hash": chunk_hash, "text": chunk_hash, "source": sources[0], "section": None, "page": 1, "sources": list(sources)}
+
+
+def keys(*hashes):
+    return {f"chunks/{chunk_hash}.txt{suffix}" for chunk_hash in hashes for suffix in ("", ".metadata.json")}
+
+
+def test_plan_replaces_the_chunks_of_rechunked_documents():
+    index = {"a.pdf": ["h1", "h2"], "b.pdf": ["h2", "h3"]}
+
+    # a.pdf changed: h1 is gone, h4 is new, and a.pdf no longer shares h2 with b.pdf
+    plan = plan_chunk_upload([chunk("h4", "a.pdf")], ["a.pdf"], index, keys("h1", "h2", "h3"))
+
+    assert plan["index"] == {"a.pdf": ["h4"], "b.pdf": ["h2", "h3"]}
+    assert plan["upload"] == ["h4"]
+    assert plan["rewrite"] == ["h2"]
+    assert plan["delete"] == ["h1"]
+    assert plan["sources"]["h2"] == ["b.pdf"]
+
+
+def test_plan_rewrites_sidecars_when_a_chunk_gains_a_source():
+    index = {"a.pdf": ["h1"]}
+
+    plan = plan_chunk_upload([chunk("h1", "b.pdf")], ["b.pdf"], index, keys("h1"))
+
+    assert plan["upload"] == []
+    assert plan["rewrite"] == ["h1"]
+    assert plan["delete"] == []
+    sidecar = metadata_sidecar(chunk("h1", "b.pdf"), {"department": "Parks"}, plan["sources"]["h1"])
+    assert sidecar["metadataAttributes"]["sources"] == "a.pdf,b.pdf"
+    assert sidecar["metadataAttributes"]["source"] == "b.pdf"
@@ -0,0 +1,79 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import sys
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'sample_data', 'generator'))
+
+from city_generator import PRESETS, city_config, generate_city, to_dynamodb_json  # noqa: E402
+from keys import BulkPickupCounter, BulkPickupRequest, Citizen, decode  # noqa: E402
+from pickup_scheduler import shard_capacities  # noqa: E402
+
+
+def sorted_items(items):
+    return sorted(items, key=lambda item: (item["pk"], item["sk"]))
+
+
+@pytest.fixture(scope="module")
+def small():
+    config = city_config(**PRESETS["small"])
+    return config, sorted_items(generate_city(config))
+
+
+def test_the_city_is_the_same_for_any_number_of_workers(small):
+    config, items = small
+
+    sharded = [item for shard in range(3) for item in generate_city(config, shard, 3)]
+
+    assert sorted_items(sharded) == items
+    assert sorted_items(generate_city(city_config(**PRESETS["small"]))) == items
+    assert sorted_items(generate_city(city_config(**PRESETS["small"], seed=8))) != items
+
+
+def test_bulk_pickups_never_exceed_route_capacity():
+    # far more requests than the routes take, so most days fill up
+    config = city_config(**PRESETS["small"], bulk_pickup_capacity=6, bulk_pickups_per_citizen_year=20)
+    capacities = shard_capacities(config["bulk_pickup_capacity"], config["bulk_pickup_shards"])
+
+    requests = Counter()
+    counters = {}
+    for item in generate_city(config):
+        entity = decode(item["pk"], item["sk"])
+        if isinstance(entity, BulkPickupRequest):
+            requests[(entity.route, entity.date)] += 1
+        elif isinstance(entity, BulkPickupCounter):
+            assert item["booked"] <= capacities[entity.shard]
+            counters[(entity.route, entity.date, entity.shard)] = item["booked"]
+
+    booked = Counter()
+    for (route, day, _), count in counters.items():
+        booked[(route, day)] += count
+    assert booked == requests
+    assert max(requests.values()) == config["bulk_pickup_capacity"]
+
+
+def test_citizens_are_written_with_the_city(small):
+    config, items = small
+
+    citizens = [item for item in items if isinstance(decode(item["pk"], item["sk"]), Citizen)]
+
+    assert len(citizens) == config["citizens"]
+    assert {item["district_id"] for item in citizens} == {f"D{i + 1}" for i in range(config["districts"])}
+
+
+def test_items_convert_to_dynamodb_json():
+    item = {"pk": "GYellow#S1#", "sk": "N2024-01-02#", "booked": 3, "ratio": 0.5, "required": True}
+
+    assert to_dynamodb_json(item) == {
+        "pk": {"S": "GYellow#S1#"},
+        "sk": {"S": "N2024-01-02#"},
+        "booked": {"N": "3"},
+        "ratio": {"N": "0.5"},
+        "required": {"S": "True"},
+    }
@@ -0,0 +1,85 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aws_lambda_powertools")
+
+from aws_lambda_powertools.utilities.idempotency.exceptions import (  # noqa: E402
+    IdempotencyItemAlreadyExistsError,
+    IdempotencyItemNotFoundError,
+)
+from aws_lambda_powertools.utilities.idempotency.persistence.base import BasePersistenceLayer  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'layers', 'model'))
+
+import idempotency  # noqa: E402
+from idempotency import idempotency_request, idempotent_tool  # noqa: E402
+
+
+class LocalPersistenceLayer(BasePersistenceLayer):
+    """
+    Stand in for the DynamoDB persistence layer, keeping the records in a dict.
+    """
+
+    def __init__(self, table_name):
+        super().__init__()
+        self.records = {}
+
+    def _get_record(self, idempotency_key):
+        if idempotency_key not in self.records:
+            raise IdempotencyItemNotFoundError
+        return self.records[idempotency_key]
+
+    def _put_record(self, data_record):
+        existing = self.records.get(data_record.idempotency_key)
+        if existing is not None and not existing.is_expired:
+            raise IdempotencyItemAlreadyExistsError
+        self.records[data_record.idempotency_key] = data_record
+
+    def _update_record(self, data_record):
+        self.records[data_record.idempotency_key] = data_record
+
+    def _delete_record(self, data_record):
+        self.records.pop(data_record.idempotency_key, None)
+
+
+@pytest.fixture()
+def idempotent(monkeypatch):
+    monkeypatch.setattr(idempotency, "DynamoDBPersistenceLayer", LocalPersistenceLayer)
+    decorator, config = idempotent_tool(table_name="idempotency")
+    config.register_lambda_context(SimpleNamespace(get_remaining_time_in_millis=lambda: 30000))
+    return decorator
+
+
+def test_a_completed_write_has_a_stored_result(idempotent):
+    calls = []
+
+    @idempotent
+    def book(request):
+        calls.append(request)
+        return {"booked": request["arguments"]["park_id"]}
+
+    request = idempotency_request("s1", "book_park", park_id="1", citizen_id="C1")
+    assert not book.has_stored_result(request)
+
+    assert book(request=request) == {"booked": "1"}
+    assert book.has_stored_result(idempotency_request("s1", "book_park", park_id=" 1 ", citizen_id="C1"))
+    assert not book.has_stored_result(idempotency_request("s2", "book_park", park_id="1", citizen_id="C1"))
+    assert book(request=request) == {"booked": "1"} and len(calls) == 1
+
+
+def test_a_failed_write_has_no_stored_result(idempotent):
+    @idempotent
+    def book(request):
+        raise ValueError("park closed")
+
+    request = idempotency_request("s1", "book_park", park_id="1", citizen_id="C1")
+    with pytest.raises(ValueError):
+        book(request=request)
+
+    assert not book.has_stored_result(request)
@@ -0,0 +1,185 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import fnmatch
+import json
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("cfnresponse")
+pytest.importorskip("opensearchpy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'layers', 'opensearch'))
+sys.path.insert(0, os.path.join(
+    os.path.dirname(__file__), '..', '..', 'knowledgebase', 'functions', 'oas_index_custom_resource_handler'
+))
+
+import app  # noqa: E402
+import index_rebuild  # noqa: E402
+from index_profiles import build_index_settings, resolve_profile  # noqa: E402
+
+
+class LocalIndices:
+    """
+    Stand in for client.indices covering the index and alias calls of the custom resource.
+    """
+
+    def __init__(self):
+        self.mappings = {}
+        self.documents = {}
+        self.aliases = {}
+
+    def resolve(self, index):
+        names = []
+        for name in index.split(","):
+            names.extend(sorted(self.aliases[name]) if name in self.aliases else [name])
+        return names
+
+    def exists(self, index):
+        return all(name in self.mappings for name in self.resolve(index))
+
+    def exists_alias(self, name):
+        return bool(self.aliases.get(name))
+
+    def get_alias(self, name):
+        return {index: {"aliases": {name: {}}} for index in self.aliases[name]}
+
+    def get(self, index, allow_no_indices=False):
+        return {name: {} for name in self.mappings if fnmatch.fnmatch(name, index)}
+
+    def create(self, index, body):
+        body = json.loads(body)
+        if index in self.mappings or index in self.aliases:
+            raise Exception(f"resource_already_exists_exception {index}")
+        self.mappings[index] = body["mappings"]
+        self.documents[index] = {}
+        for alias in body.get("aliases", {}):
+            self.aliases.setdefault(alias, set()).add(index)
+        return {"acknowledged": True, "index": index}
+
+    def delete(self, index, ignore_unavailable=False):
+        for name in self.resolve(index):
+            self.mappings.pop(name, None)
+            self.documents.pop(name, None)
+            for targets in self.aliases.values():
+                targets.discard(name)
+        return {"acknowledged": True}
+
+    def update_aliases(self, body):
+        for action in body["actions"]:
+            (kind, target), = action.items()
+            if kind == "add":
+                if target["alias"] in self.mappings:
+                    raise Exception(f"invalid_alias_name_exception {target['alias']}")
+                self.aliases.setdefault(target["alias"], set()).add(target["index"])
+            elif kind == "remove_index":
+                self.delete(target["index"])
+        return {"acknowledged": True}
+
+    def get_mapping(self, index):
+        return {name: {"mappings": self.mappings[name]} for name in self.resolve(index)}
+
+    def put_mapping(self, index, body):
+        for name in self.resolve(index):
+            self.mappings[name]["properties"].update(body["properties"])
+        return {"acknowledged": True}
+
+
+class LocalOpenSearch:
+    def __init__(self):
+        self.indices = LocalIndices()
+        self.tasks = self
+        self.reindexed = {}
+
+    def count(self, index):
+        return {"count": sum(len(self.indices.documents[name]) for name in self.indices.resolve(index))}
+
+    def reindex(self, body, slices, refresh, wait_for_completion):
+        dest = self.indices.documents[body["dest"]["index"]]
+        for name in self.indices.resolve(body["source"]["index"]):
+            dest.update(self.indices.documents[name])
+        task_id = f"node:{len(self.reindexed) + 1}"
+        self.reindexed[task_id] = {"completed": True, "response": {"total": len(dest), "failures": []}}
+        return {"task": task_id}
+
+    def get(self, task_id):
+        return self.reindexed[task_id]
+
+
+def settings(profile):
+    return build_index_settings(resolve_profile({"index_profile": profile}))
+
+
+def update(client, profile, old_profile="default"):
+    return app.update_index(
+        client, "kb", settings(profile), resolve_profile({"index_profile": profile})['embedding_model'],
+        resolve_profile({"index_profile": old_profile})['embedding_model'], "https://collection", time.monotonic() + 5
+    )
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    client = LocalOpenSearch()
+    monkeypatch.setattr(index_rebuild, "get_client", lambda os_url: client)
+    app.create_index(client, "kb", settings("default"), time.monotonic() + 5)
+    client.indices.documents["kb_v1"] = {"doc-1": {"text": "Park rules"}, "doc-2": {"text": "Trash pickup"}}
+    return client
+
+
+def test_rebuild_keeps_serving_until_the_alias_swaps(client, monkeypatch):
+    started = []
+    monkeypatch.setattr(app, "start_rebuild", lambda *args: started.append(args) or "execution")
+
+    # a changed vector method cannot be applied in place
+    response = update(client, "balanced")
+    assert response["rebuilding"] == ["kb_v1"]
+    assert started == [("kb", ["kb_v1"], "kb_v2", "https://collection")]
+    assert index_rebuild.serving_indices(client, "kb") == ["kb_v1"]
+    # another change waits for the rebuild
+    with pytest.raises(Exception, match="still being rebuilt"):
+        update(client, "titanv2")
+
+    # the state machine steps
+    event = {"os_url": "https://collection", "index_name": "kb", "old_indices": ["kb_v1"], "new_index": "kb_v2"}
+    reindex = index_rebuild.lambda_handler({**event, "step": "reindex"}, None)
+    assert index_rebuild.lambda_handler({**event, "step": "check", "reindex": reindex}, None)["completed"]
+    index_rebuild.lambda_handler({**event, "step": "swap"}, None)
+
+    assert index_rebuild.serving_indices(client, "kb") == ["kb_v2"]
+    assert sorted(client.indices.mappings) == ["kb_v2"]
+    assert client.count(index="kb")["count"] == 2
+    assert update(client, "balanced", old_profile="balanced")["unchanged"]
+
+
+def test_rolling_back_stops_the_rebuild(client, monkeypatch):
+    stopped = []
+    monkeypatch.setattr(app, "start_rebuild", lambda *args: "execution")
+    monkeypatch.setattr(app, "stop_rebuild", stopped.append)
+
+    update(client, "balanced")
+    response = update(client, "default")
+
+    assert response["abandoned"] == ["kb_v2"] and stopped == ["kb_v2"]
+    assert sorted(client.indices.mappings) == ["kb_v1"]
+
+
+def test_a_new_embedding_model_replaces_a_legacy_index_right_away():
+    client = LocalOpenSearch()
+    client.indices.create(index="kb", body=json.dumps(settings("default")))
+
+    response = update(client, "titanv2")
+
+    assert response == {"acknowledged": True, "index": "kb_v1", "replaced": ["kb"]}
+    assert index_rebuild.serving_indices(client, "kb") == ["kb_v1"]
+    assert app.get_index_mappings(client, "kb")["properties"]["vector"]["dimension"] == 1024
+
+
+def test_missing_fields_are_added_in_place(client):
+    client.indices.mappings["kb_v1"]["properties"].pop("department")
+
+    assert update(client, "default")["added"] == ["department"]
+    assert index_rebuild.serving_indices(client, "kb") == ["kb_v1"]
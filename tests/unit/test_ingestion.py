@@ -0,0 +1,100 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("boto3")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'sample_data', 'functions', 'sample_data_deployment'))
+
+from ingestion import LocalBedrockAgentClient, paginate_manifest, sync_knowledgebase  # noqa: E402
+
+
+class LocalTable:
+    """
+    Stand in for the DynamoDB table resource covering the calls the coordinator makes.
+    """
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get((Key['pk'], Key['sk']))
+        return {"Item": dict(item)} if item else {}
+
+    def put_item(self, Item):
+        self.items[(Item['pk'], Item['sk'])] = dict(Item)
+
+    def delete_item(self, Key):
+        self.items.pop((Key['pk'], Key['sk']), None)
+
+    def query(self, KeyConditionExpression, ExclusiveStartKey=None):
+        pk_condition, sk_condition = KeyConditionExpression.get_expression()['values']
+        pk = pk_condition.get_expression()['values'][1]
+        prefix = sk_condition.get_expression()['values'][1]
+        return {"Items": [
+            dict(item) for (item_pk, item_sk), item in sorted(self.items.items())
+            if item_pk == pk and item_sk.startswith(prefix)
+        ]}
+
+    @contextmanager
+    def batch_writer(self):
+        yield self
+
+
+class LocalBucket:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        yield {"Contents": [
+            {"Key": key, "ETag": f'"{etag}"'} for key, etag in self.objects.items() if key.startswith(Prefix)
+        ]}
+
+
+def test_corpus_state_moves_only_when_the_job_completes():
+    table = LocalTable()
+    bucket = LocalBucket({"a.pdf": "1", "b.pdf": "2"})
+    client = LocalBedrockAgentClient(polls_to_complete=2)
+
+    def sync(**kwargs):
+        return sync_knowledgebase("KB", "DS", "bucket", table, client, bucket, **kwargs)
+
+    started = sync()
+    assert started['status'] == "STARTED"
+    assert started['changes']['added'] == ["a.pdf", "b.pdf"]
+
+    # the job is still running: an upload is deferred, not recorded as ingested
+    bucket.objects["c.pdf"] = "3"
+    assert sync()['status'] == "DEFERRED"
+
+    # the job completed: its manifest is ingested and the deferred upload starts the next job
+    follow_up = sync()
+    assert follow_up['status'] == "STARTED"
+    assert follow_up['changes'] == {"added": ["c.pdf"], "changed": [], "removed": []}
+
+    # a failed job is dropped, so its changes are picked up again
+    client.jobs[follow_up['job_id']]['status'] = "FAILED"
+    retried = sync(wait_seconds=10)
+    assert retried['status'] == "COMPLETE"
+    assert retried['changes']['added'] == ["c.pdf"]
+    assert sync()['status'] == "UNCHANGED"
+
+    # only the pages of the ingested manifest are kept
+    assert len([key for key in table.items if key[1].startswith("#KBKB#DDS#M")]) == 1
+
+
+def test_manifest_pages_stay_under_the_item_limit():
+    manifest = {f"documents/{i:06d}.pdf": "0" * 32 for i in range(20000)}
+
+    pages = paginate_manifest(manifest)
+
+    assert len(pages) > 1
+    assert all(len(page.encode('utf-8')) <= 256 * 1024 for page in pages)
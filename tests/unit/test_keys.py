@@ -0,0 +1,79 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'layers', 'model'))
+
+from keys import (  # noqa: E402
+    BulkPickupCounter, BulkPickupRequest, Citizen, FormField, FormTemplate, FormTemplateField, FormTemplateListing,
+    FormTemplateSchema, FormVersion, GarbageRoute, KeyFormatError, ParkReservation, RateLimitBucket, decode,
+    decode_many, legacy_form_version,
+)
+
+
+ENTITIES = [
+    ParkReservation("P1", "2024-12-03"),
+    GarbageRoute("A1"),
+    Citizen("C1"),
+    BulkPickupRequest("Yellow", "2024-12-03", "C1"),
+    BulkPickupRequest("Yellow", "2024-12-03", "C1", shard=2),
+    BulkPickupCounter("Yellow", "2024-12-03", 2),
+    FormTemplate("W9"),
+    FormTemplateListing("W9"),
+    FormTemplateSchema("W9"),
+    FormTemplateField("W9", "name"),
+    FormVersion("W9", "C1", "V7"),
+    FormField("W9", "C1", "V7", "name"),
+    RateLimitBucket("session", "s1"),
+]
+
+
+@pytest.mark.parametrize("entity", ENTITIES, ids=lambda entity: type(entity).__name__)
+def test_every_entity_round_trips(entity):
+    assert decode(**entity.key) == entity
+    assert decode_many([entity.key], strict=True) == [entity]
+
+
+@pytest.mark.parametrize("pk, sk", [
+    ("P1", "R2024-12-03#"),
+    ("P1#", "R2024-13#"),
+    ("TA1#", "TA2#"),
+    ("UC1#", "UC2#"),
+    ("GYellow#Sx#", "N2024-12-03#"),
+    ("GYellow#", "N2024-12-03#"),
+    ("#FW9#", "#FX1#"),
+    ("#FW9#", "#FW9#C1#V7"),
+    ("#FW9#", "#FW9#C1#7#"),
+    ("#FW9#", "#FW9#C1#V7#Fname#extra#"),
+    ("Lsession#", "Lsession#"),
+    ("Dforms#", "FW9#x#"),
+    ("X1#", "X1#"),
+])
+def test_malformed_keys_are_rejected(pk, sk):
+    with pytest.raises(KeyFormatError):
+        decode(pk, sk)
+    assert decode_many([{"pk": pk, "sk": sk}]) == []
+
+
+def test_components_are_validated():
+    for build in (lambda: ParkReservation("P#1", "2024-12-03"), lambda: ParkReservation("P1", "12/03/2024"),
+                  lambda: FormVersion("W9", "", "V7")):
+        with pytest.raises(KeyFormatError):
+            build()
+
+
+def test_legacy_started_rows_are_recognized_from_their_data():
+    version_id = "V" + "x" * 21
+    # a legacy row whose ids happen to carry the C and V prefixes of the current format
+    legacy = legacy_form_version("#FW9#", f"#FW9#C1#{version_id}#", "STARTED")
+    assert legacy == FormVersion("W9", "C1", version_id)
+    assert legacy.sk == f"#FW9#CC1#V{version_id}#"
+
+    current = FormVersion("W9", "C1", "x" * 22)
+    assert legacy_form_version(current.pk, current.sk, "STARTED") is None
+    assert legacy_form_version("#FW9#", f"#FW9#C1#{version_id}#", "SUBMITTED") is None
+    assert legacy_form_version(*FormField("W9", "C1", "x" * 21, "f").key.values(), "STARTED") is None
@@ -0,0 +1,150 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'layers', 'model'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'agent', 'functions', 'garbage'))
+
+from pickup_scheduler import AlreadyScheduled, BulkPickupScheduler, PickupValidationError, RouteDayFull  # noqa: E402
+from route_schedule import DEFAULT_RULES, RouteSchedule  # noqa: E402
+
+
+TODAY = date(2024, 6, 1)
+
+
+class TransactionCanceled(Exception):
+    def __init__(self, reasons):
+        super().__init__("Transaction cancelled")
+        self.response = {
+            "Error": {"Code": "TransactionCanceledException"},
+            "CancellationReasons": [{"Code": reason} for reason in reasons],
+        }
+
+
+class LocalDynamoDB:
+    """
+    Stand in for the low level DynamoDB client covering the calls the scheduler makes.
+    Like DynamoDB, a transaction checks every condition before applying any write and
+    is isolated from concurrent transactions.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def transact_write_items(self, TransactItems):
+        with self.lock:
+            reasons = []
+            for entry in TransactItems:
+                if "Update" in entry:
+                    update = entry["Update"]
+                    item = self.items.get(self._key(update["Key"]), {})
+                    capacity = int(update["ExpressionAttributeValues"][":capacity"]["N"])
+                    ok = "booked" not in item or int(item["booked"]["N"]) < capacity
+                else:
+                    put = entry["Put"]
+                    ok = self._key(put["Item"]) not in self.items
+                reasons.append("None" if ok else "ConditionalCheckFailed")
+            if any(reason != "None" for reason in reasons):
+                raise TransactionCanceled(reasons)
+            for entry in TransactItems:
+                if "Update" in entry:
+                    key = self._key(entry["Update"]["Key"])
+                    item = self.items.setdefault(key, {**entry["Update"]["Key"], "booked": {"N": "0"}})
+                    item["booked"] = {"N": str(int(item["booked"]["N"]) + 1)}
+                else:
+                    self.items[self._key(entry["Put"]["Item"])] = dict(entry["Put"]["Item"])
+
+    def batch_get_item(self, RequestItems):
+        with self.lock:
+            responses = {
+                table: [self.items[self._key(key)] for key in request["Keys"] if self._key(key) in self.items]
+                for table, request in RequestItems.items()
+            }
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    @staticmethod
+    def _key(item):
+        return item["pk"]["S"], item["sk"]["S"]
+
+
+@pytest.fixture()
+def dynamodb():
+    return LocalDynamoDB()
+
+
+def scheduler(dynamodb, capacity=10, shards=4):
+    table = SimpleNamespace(name="city", meta=SimpleNamespace(client=dynamodb))
+    return BulkPickupScheduler(table, capacity=capacity, shards=shards, horizon_days=30)
+
+
+def test_concurrent_requests_never_overbook(dynamodb):
+    pickups = scheduler(dynamodb, capacity=10, shards=4)
+
+    def book(citizen_id):
+        try:
+            return pickups.schedule("Blue", "2024-06-10", citizen_id, today=TODAY)
+        except RouteDayFull as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(book, range(500)))
+
+    booked = [result for result in results if isinstance(result, dict)]
+    full = [result for result in results if isinstance(result, RouteDayFull)]
+    assert len(booked) == 10
+    assert len(full) == 490
+    assert pickups.booked("Blue", ["2024-06-10"]) == {"2024-06-10": 10}
+    assert full[0].suggestions == ["2024-06-11", "2024-06-12", "2024-06-13"]
+
+
+def test_full_day_suggests_next_days_with_capacity(dynamodb):
+    pickups = scheduler(dynamodb, capacity=1, shards=1)
+    for day, citizen_id in (("2024-06-10", 1), ("2024-06-11", 2), ("2024-06-13", 3)):
+        pickups.schedule("Red", day, citizen_id, today=TODAY)
+
+    with pytest.raises(RouteDayFull) as error:
+        pickups.schedule("red", "2024-06-10", 4, today=TODAY)
+
+    assert error.value.suggestions == ["2024-06-12", "2024-06-14", "2024-06-15"]
+
+
+def test_duplicate_and_invalid_requests_are_rejected(dynamodb):
+    pickups = scheduler(dynamodb)
+    pickups.schedule("Green", "2024-06-10", 7, today=TODAY)
+
+    with pytest.raises(AlreadyScheduled):
+        pickups.schedule("Green", "2024-06-10", 7, today=TODAY)
+    for route, pickup_date in (("Purple", "2024-06-10"), ("Green", "10/06/2024"), ("Green", "2024-05-30"), ("Green", "2024-08-30")):
+        with pytest.raises(PickupValidationError):
+            pickups.schedule(route, pickup_date, 8, today=TODAY)
+    assert pickups.booked("Green", ["2024-06-10"]) == {"2024-06-10": 1}
+
+
+def test_pickups_are_only_booked_on_collection_days(dynamodb):
+    table = SimpleNamespace(name="city", meta=SimpleNamespace(client=dynamodb))
+    pickups = BulkPickupScheduler(
+        table, capacity=1, shards=1, horizon_days=60, route_schedule=RouteSchedule(rules=DEFAULT_RULES)
+    )
+
+    # Blue is collected on Tuesdays
+    with pytest.raises(PickupValidationError, match=r"\['2024-06-11', '2024-06-18', '2024-06-25'\]"):
+        pickups.schedule("Blue", "2024-06-10", 1, today=TODAY)
+    # Green's Thursday collection moves off Independence Day
+    with pytest.raises(PickupValidationError):
+        pickups.schedule("Green", "2024-07-04", 1, today=TODAY)
+    pickups.schedule("Green", "2024-06-27", 1, today=TODAY)
+    pickups.schedule("Green", "2024-07-05", 2, today=TODAY)
+
+    with pytest.raises(RouteDayFull) as error:
+        pickups.schedule("Green", "2024-06-27", 3, today=TODAY)
+
+    assert error.value.suggestions == ["2024-07-11", "2024-07-18", "2024-07-25"]
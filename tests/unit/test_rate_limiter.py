@@ -0,0 +1,114 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'layers', 'model'))
+
+from rate_limiter import ToolRateLimiter, citizen_for_call  # noqa: E402
+
+
+class ConditionalCheckFailed(Exception):
+    def __init__(self, item):
+        super().__init__("The conditional request failed")
+        self.response = {"Error": {"Code": "ConditionalCheckFailedException"}, "Item": item}
+
+
+class LocalDynamoDB:
+    """
+    Stand in for the low level DynamoDB client covering the two bucket updates the limiter makes.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.updates = 0
+        self.lock = threading.Lock()
+
+    def update_item(self, TableName, Key, UpdateExpression, ConditionExpression, ExpressionAttributeNames,
+                    ExpressionAttributeValues, ReturnValuesOnConditionCheckFailure):
+        values = {name: int(value["N"]) for name, value in ExpressionAttributeValues.items()}
+        with self.lock:
+            self.updates += 1
+            key = (Key["pk"]["S"], Key["sk"]["S"])
+            item = self.items.get(key)
+            arrival = int(item["arrival"]["N"]) if item else None
+            if ConditionExpression.startswith("arrival BETWEEN"):
+                ok = arrival is not None and values[":now"] <= arrival <= values[":limit"]
+                new_arrival = (arrival or 0) + values[":interval"]
+            else:
+                ok = arrival is None or arrival < values[":now"]
+                new_arrival = values[":arrival"]
+            if not ok:
+                raise ConditionalCheckFailed(dict(item) if item else {})
+            self.items[key] = {**Key, "arrival": {"N": str(new_arrival)}, "expiration": {"N": str(values[":expiration"])}}
+
+
+def dynamodb_limiter(client, **kwargs):
+    table = SimpleNamespace(name="test-table", meta=SimpleNamespace(client=client))
+    return ToolRateLimiter(mode="dynamodb", table=table, **kwargs)
+
+
+@pytest.mark.parametrize("make_limiter", [
+    lambda **kwargs: ToolRateLimiter(mode="memory", **kwargs),
+    lambda **kwargs: dynamodb_limiter(LocalDynamoDB(), **kwargs),
+])
+def test_bucket_allows_burst_then_refills_at_rate(make_limiter):
+    limiter = make_limiter(session_per_minute=6, citizen_per_minute=0, burst=3)
+
+    assert [limiter.check("s1", now=1000) for _ in range(3)] == [None, None, None]
+    throttled = limiter.check("s1", now=1000)
+    assert throttled.scope == "session"
+    assert throttled.retry_after_seconds == pytest.approx(10)
+    assert limiter.check("s2", now=1000) is None
+
+    # one token every 10 seconds, and an idle bucket is full again without going over burst
+    assert limiter.check("s1", now=1010) is None
+    assert limiter.check("s1", now=1010) is not None
+    assert [limiter.check("s1", now=2000) for _ in range(4)][-1].scope == "session"
+
+
+def test_citizen_bucket_is_shared_across_sessions():
+    limiter = ToolRateLimiter(mode="memory", session_per_minute=60, citizen_per_minute=6, burst=2)
+
+    assert limiter.check("s1", "C1", now=1000) is None
+    assert limiter.check("s2", "C1", now=1000) is None
+    throttled = limiter.check("s3", "C1", now=1000)
+    assert throttled.scope == "citizen"
+    body = json.loads(throttled.response_body("book_park")["TEXT"]["body"])
+    assert body == {
+        "error": "rate_limited",
+        "function": "book_park",
+        "scope": "citizen",
+        "retry_after_seconds": 10,
+        "message": "Too many book_park requests for this citizen. Wait 10 seconds before trying again.",
+    }
+    assert citizen_for_call([{"name": "citizen_id", "value": "C9"}], {"citizenID": "C1"}) == "C1"
+    assert citizen_for_call([{"name": "citizen_id", "value": "C9"}], {}) == "C9"
+
+
+def test_dynamodb_buckets_admit_exactly_burst_under_concurrency():
+    client = LocalDynamoDB()
+    limiter = dynamodb_limiter(client, session_per_minute=1, citizen_per_minute=0, burst=10)
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        results = list(executor.map(lambda _: limiter.check("s1", now=1000), range(200)))
+
+    assert sum(result is None for result in results) == 10
+    assert client.items[("Lsession#s1#", "Lsession#s1#")]["arrival"]["N"] == str(1000 * 1000 + 10 * 60 * 1000)
+
+
+def test_dynamodb_bucket_keys_accept_any_citizen_id():
+    client = LocalDynamoDB()
+    limiter = dynamodb_limiter(client, session_per_minute=60, citizen_per_minute=6, burst=1)
+
+    assert limiter.check("s1", "C#1", now=1000) is None
+    assert limiter.check("s2", "C#1", now=1000).scope == "citizen"
+    assert limiter.check("s3", "C#2", now=1000) is None
+    assert all("#" not in pk[len("Lcitizen#"):-1] for pk, _ in client.items if pk.startswith("Lcitizen#"))
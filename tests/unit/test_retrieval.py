@@ -0,0 +1,92 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'agent', 'functions', 'retrieval'))
+
+from local_index import NumpyIndex  # noqa: E402
+from retrieval import EmbeddingCache, OpenSearchBackend, ResultCache, hybrid_search, parse_top_k  # noqa: E402
+
+
+VOCABULARY = ["park", "reservation", "trash", "pickup", "street", "closure"]
+
+
+def embed(text):
+    """ Bag of words over a tiny vocabulary, enough to rank the sample passages """
+    words = text.lower().split()
+    return [float(sum(word.startswith(term) for word in words)) for term in VOCABULARY]
+
+
+@pytest.fixture()
+def index():
+    documents = [
+        {"id": "1", "text": "Park reservation rules for picnic areas", "department": "Parks", "document_type": "policy"},
+        {"id": "2", "text": "Trash pickup happens weekly on your route", "department": "Sanitation", "document_type": "policy"},
+        {"id": "3", "text": "Bulk trash pickup must be scheduled in advance", "department": "Sanitation", "document_type": "faq"},
+        {"id": "4", "text": "Street closure permits for park events", "department": "Transportation", "document_type": "policy"},
+    ]
+    index = NumpyIndex()
+    index.add([{**document, "vector": embed(document["text"])} for document in documents])
+    return index
+
+
+def test_hybrid_search_ranks_relevant_passages(index):
+    passages = hybrid_search(index, EmbeddingCache(embed), "trash pickup", k=2)
+
+    assert {passage["id"] for passage in passages} == {"2", "3"}
+    assert all(0.0 <= passage["score"] <= 1.0 for passage in passages)
+
+
+def test_hybrid_search_applies_filters_before_ranking(index):
+    passages = hybrid_search(
+        index, EmbeddingCache(embed), "trash pickup", filters={"document_type": "faq"}, k=5
+    )
+
+    assert [passage["id"] for passage in passages] == ["3"]
+
+
+def test_results_and_embeddings_are_cached(index):
+    calls = []
+
+    def counting_embed(text):
+        calls.append(text)
+        return embed(text)
+
+    embedder = EmbeddingCache(counting_embed)
+    cache = ResultCache()
+
+    first = hybrid_search(index, embedder, "park reservation", k=3, cache=cache)
+    second = hybrid_search(index, embedder, "park reservation", k=3, cache=cache)
+    hybrid_search(index, embedder, "park reservation", k=1)
+
+    assert first == second
+    assert calls == ["park reservation"]
+
+
+def test_top_k_is_validated_and_clamped():
+    assert parse_top_k("3") == 3
+    assert parse_top_k(" 50 ") == 10
+    assert parse_top_k("0") == 1
+    assert parse_top_k("five") == 5
+    assert parse_top_k("2.5", default=4) == 4
+
+
+def test_opensearch_backend_filters_on_keyword_fields():
+    class Client:
+        def msearch(self, body):
+            self.body = body
+            hit = {"_id": "1", "_score": 2.0, "_source": {"text": "Picnic rules", "metadata": "{\"source\": \"parks.pdf\"}"}}
+            return {"responses": [{"hits": {"hits": [hit]}}, {"hits": {"hits": []}}]}
+
+    client = Client()
+    lexical_hits, vector_hits = OpenSearchBackend(client, "dev").search("picnic", [1.0], {"department": "Parks"}, 3)
+
+    term = {"term": {"department.keyword": "Parks"}}
+    assert client.body[1]["query"]["bool"]["filter"] == [term]
+    assert client.body[3]["query"]["knn"]["vector"]["filter"] == {"bool": {"filter": [term]}}
+    assert lexical_hits == [{"id": "1", "score": 2.0, "text": "Picnic rules", "metadata": "{\"source\": \"parks.pdf\"}"}]
+    assert vector_hits == []
@@ -0,0 +1,42 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'layers', 'model'))
+
+from session_cache import SessionToolCache  # noqa: E402
+
+
+PARAMETERS = [{"name": "park_id", "value": "1"}, {"name": "start_date", "value": "2024-12-01"}]
+DAYS = {"TEXT": {"body": "Available days: ['2024-12-01']"}}
+
+
+def test_a_write_in_one_container_reaches_the_others():
+    first, second = SessionToolCache(use_session_attributes=True), SessionToolCache(use_session_attributes=True)
+    attributes = {}
+
+    # both warm containers cache the read
+    first.put("s1", "get_available_park_days", PARAMETERS, DAYS, attributes)
+    assert second.get("s1", "get_available_park_days", PARAMETERS, dict(attributes)) == DAYS
+    second.put("s1", "get_garbage_pickup_day", [], DAYS, dict(attributes))
+
+    # the booking runs in the first container, the agent hands its attributes to the next call
+    first.invalidate("s1", attributes)
+
+    assert second.get("s1", "get_available_park_days", PARAMETERS, dict(attributes)) is None
+    assert second.get("s1", "get_garbage_pickup_day", [], dict(attributes)) is None
+    assert first.get("s1", "get_available_park_days", PARAMETERS, dict(attributes)) is None
+
+
+def test_entries_stay_in_the_container_without_mirroring():
+    cache = SessionToolCache(use_session_attributes=False)
+    attributes = {}
+
+    cache.put("s1", "get_available_park_days", PARAMETERS, DAYS, attributes)
+    assert cache.get("s1", "get_available_park_days", list(reversed(PARAMETERS)), attributes) == DAYS
+    assert attributes == {}
+
+    cache.invalidate("s1", attributes)
+    assert cache.get("s1", "get_available_park_days", PARAMETERS, attributes) is None
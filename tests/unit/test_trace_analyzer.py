@@ -0,0 +1,58 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'assets'))
+
+from trace_analyzer import aggregate, breakdown, build_timeline, read_turns  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def turns():
+    """ Three recorded turns: matched steps, orphaned events and overlapping lookups """
+    with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'agent_traces.jsonl')) as f:
+        return read_turns(f)
+
+
+def test_matched_steps_take_the_reported_or_measured_duration(turns):
+    steps = build_timeline(turns[0])
+
+    assert [(step["category"], step["start_ms"], step["duration_ms"]) for step in steps] == [
+        ("guardrail", 0.0, 0),
+        # the model reports its own time, the tool call is measured between its events
+        ("llm", 100.0, 1150),
+        ("tool", 1400.0, 500.0),
+        ("llm", 2000.0, 780),
+    ]
+    assert steps[2]["label"] == "ParkReservations.get_available_park_days"
+    assert breakdown(turns[0]) == pytest.approx(
+        {"llm": 1930.0, "tool": 500.0, "retrieval": 0.0, "guardrail": 0.0, "other": 0.0, "total_ms": 2780.0}
+    )
+
+
+def test_orphaned_events_do_not_pair_with_other_steps(turns):
+    steps = build_timeline(turns[1])
+
+    # the unanswered tool call stays open, the unmatched observation is a point in time
+    assert steps[1]["category"] == "tool" and steps[1]["duration_ms"] is None
+    assert (steps[2]["category"], steps[2]["start_ms"], steps[2]["duration_ms"]) == ("retrieval", 1500.0, 0)
+    assert breakdown(turns[1])["tool"] == 0.0
+
+
+def test_overlapping_calls_pair_by_trace_id(turns):
+    lookups = [step for step in build_timeline(turns[2]) if step["category"] == "retrieval"]
+
+    # t-1 opens first but closes last
+    assert [(step["start_ms"], step["duration_ms"]) for step in lookups] == [(600.0, 1000.0), (700.0, 300.0)]
+
+
+def test_aggregate_reports_percentiles_and_shares(turns):
+    report = aggregate(turns)
+
+    assert report["turns"] == 3
+    assert report["percentiles"]["total_ms"]["p50"] == pytest.approx(1600.0)
+    assert sum(report["share"].values()) == pytest.approx(1.0)